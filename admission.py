@@ -0,0 +1,238 @@
+import logging
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app, jsonify
+from sqlalchemy import case, delete, func, select, update
+from extensions import db
+from db_utils import insert_ignore
+from models import JudgeSlot, RateLimitBucket, SubmissionJob
+import metrics
+
+# Reasons of the rejected submissions, label of admission_rejected_total
+RATE_LIMITED = 'rate_limited'
+OVERLOADED = 'overloaded'
+QUEUE_FULL = 'queue_full'
+
+# Seconds between two removals of idle buckets and expired slots
+PRUNE_INTERVAL = 60
+
+
+class MemoryStore:
+    """Admission state of a single process."""
+
+    def __init__(self):
+        self._buckets = {}
+        self._slots = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst, now):
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated_at) * rate)
+            if tokens < 1:
+                self._buckets[key] = (tokens, now)
+                return False, (1 - tokens) / rate
+            self._buckets[key] = (tokens - 1, now)
+            return True, 0
+
+    def acquire(self, slot_id, limit, lease):
+        now = time.monotonic()
+        with self._lock:
+            self._slots = {key: expires for key, expires in self._slots.items() if expires > now}
+            if len(self._slots) >= limit:
+                return False
+            self._slots[slot_id] = now + lease
+            return True
+
+    def release(self, slot_id):
+        with self._lock:
+            self._slots.pop(slot_id, None)
+
+    def prune(self, idle_before):
+        with self._lock:
+            self._buckets = {key: value for key, value in self._buckets.items() if value[1] >= idle_before}
+
+
+class DatabaseStore:
+    """Admission state in the database, shared by every process.
+
+    A bucket is taken with a single conditional UPDATE that refills it
+    and removes a token, so concurrent requests of a user never overdraw
+    it. A slot is a row committed before counting the live ones: when
+    several requests race for the last slot, the last to commit sees all
+    of them and gives its slot back, so the cap is never exceeded.
+    """
+
+    def take(self, key, rate, burst, now):
+        refilled = RateLimitBucket.tokens + (now - RateLimitBucket.updated_at) * rate
+        available = case((refilled > burst, burst), else_=refilled)
+        taken = db.session.execute(
+            update(RateLimitBucket)
+            .where(RateLimitBucket.key == key, available >= 1)
+            .values(tokens=available - 1, updated_at=now)
+        ).rowcount
+        if not taken:
+            taken = self._insert_bucket(key, burst - 1, now)
+        if taken:
+            db.session.commit()
+            return True, 0
+
+        tokens = db.session.execute(select(available).where(RateLimitBucket.key == key)).scalar()
+        db.session.commit()
+        return False, (1 - (tokens or 0)) / rate
+
+    def _insert_bucket(self, key, tokens, now):
+        return insert_ignore(RateLimitBucket, dict(key=key, tokens=tokens, updated_at=now), ['key'])
+
+    def acquire(self, slot_id, limit, lease):
+        now = datetime.now()
+        db.session.add(JudgeSlot(execution_id=slot_id, expires_at=now + timedelta(seconds=lease)))
+        db.session.commit()
+        live = db.session.execute(
+            select(func.count()).select_from(JudgeSlot).where(JudgeSlot.expires_at > now)
+        ).scalar()
+        db.session.commit()
+        if live > limit:
+            self.release(slot_id)
+            return False
+        return True
+
+    def release(self, slot_id):
+        db.session.execute(delete(JudgeSlot).where(JudgeSlot.execution_id == slot_id))
+        db.session.commit()
+
+    def prune(self, idle_before):
+        db.session.execute(delete(RateLimitBucket).where(RateLimitBucket.updated_at < idle_before))
+        db.session.execute(delete(JudgeSlot).where(JudgeSlot.expires_at < datetime.now()))
+        db.session.commit()
+
+
+STORES = {
+    "memory": MemoryStore,
+    "database": DatabaseStore,
+}
+
+_store = None
+_store_lock = threading.Lock()
+_last_prune = 0
+
+
+def get_store():
+    """Get the admission store selected by ADMISSION_STORE."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = STORES[current_app.config["ADMISSION_STORE"]]()
+    return _store
+
+
+def _maybe_prune(store, rate, burst):
+    global _last_prune
+    if time.monotonic() - _last_prune < PRUNE_INTERVAL:
+        return
+    _last_prune = time.monotonic()
+    # A bucket idle for that long is full again, dropping it changes nothing
+    store.prune(time.time() - burst / rate)
+
+
+def reject(reason, retry_after):
+    """Response of a shed submission.
+
+    Args:
+        reason (str): RATE_LIMITED, OVERLOADED or QUEUE_FULL
+        retry_after (float): Seconds until the client should try again
+
+    Returns:
+        tuple: (response, 429, headers)
+    """
+    metrics.admission_rejected.inc(reason)
+    messages = {
+        RATE_LIMITED: "Too many submissions, slow down",
+        OVERLOADED: "The judge is overloaded, try again shortly",
+        QUEUE_FULL: "Too many queued submissions, try again shortly",
+    }
+    retry_after = max(1, math.ceil(retry_after))
+    return jsonify({"error": messages[reason], "retry_after": retry_after}), 429, {"Retry-After": str(retry_after)}
+
+
+def admit_user(user_key):
+    """Take a token from the submission bucket of a user.
+
+    Args:
+        user_key (str): Identity of the caller
+
+    Returns:
+        tuple: The 429 response if the user is over the limit, else None
+    """
+    config = current_app.config
+    rate, burst = config["ADMISSION_USER_RATE"], config["ADMISSION_USER_BURST"]
+    store = get_store()
+    try:
+        _maybe_prune(store, rate, burst)
+        allowed, retry_after = store.take(f"submit:{user_key}", rate, burst, time.time())
+    except Exception as e:
+        # The limiter must not take submissions down with it
+        db.session.rollback()
+        logging.error("Admission control failed, admitting the submission: %s", e, exc_info=True)
+        return None
+    if not allowed:
+        return reject(RATE_LIMITED, retry_after)
+    metrics.admission_admitted.inc()
+    return None
+
+
+def acquire_slot(execution_id):
+    """Count a submission about to be judged against ADMISSION_MAX_IN_FLIGHT.
+
+    Call ``release_slot`` once it is judged.
+
+    Args:
+        execution_id (str): UUID of the execution
+
+    Returns:
+        tuple: The 429 response if the judge is full, else None
+    """
+    config = current_app.config
+    if not config["ADMISSION_MAX_IN_FLIGHT"]:
+        return None
+    try:
+        acquired = get_store().acquire(execution_id, config["ADMISSION_MAX_IN_FLIGHT"], config["ADMISSION_SLOT_LEASE"])
+    except Exception as e:
+        db.session.rollback()
+        logging.error("Admission control failed, admitting the submission: %s", e, exc_info=True)
+        return None
+    if not acquired:
+        return reject(OVERLOADED, config["ADMISSION_RETRY_AFTER"])
+    return None
+
+
+def release_slot(execution_id):
+    """Free the slot taken by ``acquire_slot``."""
+    if not current_app.config["ADMISSION_MAX_IN_FLIGHT"]:
+        return
+    try:
+        get_store().release(execution_id)
+    except Exception as e:
+        # The lease expires on its own
+        db.session.rollback()
+        logging.error("Failed to release judge slot %s: %s", execution_id, e, exc_info=True)
+
+
+def check_queue():
+    """Refuse async submissions while ADMISSION_MAX_QUEUED jobs are waiting.
+
+    Returns:
+        tuple: The 429 response if the queue is full, else None
+    """
+    config = current_app.config
+    if not config["ADMISSION_MAX_QUEUED"]:
+        return None
+    queued = db.session.execute(
+        select(func.count()).select_from(SubmissionJob).where(SubmissionJob.status == SubmissionJob.QUEUED)
+    ).scalar()
+    if queued >= config["ADMISSION_MAX_QUEUED"]:
+        return reject(QUEUE_FULL, config["ADMISSION_RETRY_AFTER"])
+    return None
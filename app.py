@@ -22,7 +22,7 @@ def create_app():
         
     app.logger.setLevel(logging.INFO)
 
-    CORS(app, resources={r"/*": {"origins": "*"}})
+    CORS(app, resources={r"/*": {"origins": "*"}}, expose_headers=["X-Last-Write"])
     db.init_app(app)
     jwt.init_app(app)
     migrate.init_app(app, db)
@@ -30,15 +30,63 @@ def create_app():
     from quests_routes import quests_bp
     from comments_routes import comments_bp
     from quest_submisions_routes import quests_submissions_bp
+    from stats_routes import stats_bp
     app.register_blueprint(quests_bp)
     app.register_blueprint(comments_bp)
     app.register_blueprint(quests_submissions_bp)
+    app.register_blueprint(stats_bp)
 
-    with app.app_context():
-        db.create_all()
+    if app.config["METRICS_ENABLED"]:
+        import metrics
+        metrics.init_app(app, db)
+
+    from judge_worker import judge_worker_command
+    app.cli.add_command(judge_worker_command)
+
+    from xp_outbox import xp_dispatcher_command
+    app.cli.add_command(xp_dispatcher_command)
+
+    from judge import check_execution_command
+    app.cli.add_command(check_execution_command)
+
+    from query_plans import check_query_plans_command
+    app.cli.add_command(check_query_plans_command)
+
+    from quest_bulk import export_quests_command, import_quests_command
+    app.cli.add_command(import_quests_command)
+    app.cli.add_command(export_quests_command)
+
+    from stats import rebuild_stats_command
+    app.cli.add_command(rebuild_stats_command)
 
     return app
 
+
+def start_background_services(app):
+    """Start the in-process judge workers, XP dispatcher, execution pools and metrics sharing.
+
+    Only serving processes call this (gunicorn workers, see gunicorn.conf.py,
+    and the development server): ``create_app`` also runs for every CLI
+    command, where they would outlive or race the command.
+    """
+    if app.config["JUDGE_WORKERS"]:
+        from judge_worker import start_workers
+        start_workers(app, app.config["JUDGE_WORKERS"])
+
+    if app.config["XP_DISPATCHER_ENABLED"]:
+        from xp_outbox import start_dispatcher
+        start_dispatcher(app)
+
+    if app.config["EXECUTION_BACKENDS"]:
+        import execution_backends
+        execution_backends.prewarm()
+
+    if app.config["METRICS_ENABLED"] and app.config["METRICS_MULTIPROCESS_DIR"]:
+        import metrics
+        metrics.enable_multiprocess(app.config["METRICS_MULTIPROCESS_DIR"], app.config["METRICS_FLUSH_INTERVAL"])
+
+# Development server only, production runs gunicorn (see gunicorn.conf.py)
 if __name__ == "__main__":
     app = create_app()
-    app.run(host="0.0.0.0", port=5003, debug=True)
\ No newline at end of file
+    start_background_services(app)
+    app.run(host="0.0.0.0", port=5003, debug=os.getenv("FLASK_DEBUG", "false").lower() == "true")
\ No newline at end of file
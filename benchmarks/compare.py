@@ -0,0 +1,72 @@
+"""Compare two benchmark results and flag latency regressions.
+
+Usage:
+
+    python -m benchmarks.compare baseline.json candidate.json --threshold 0.2
+
+Writes one line per scenario endpoint with the p50/p95/p99 change and exits
+with status 1 if a p95 got slower than the threshold (a fraction), so it
+can gate a CI job.
+"""
+import argparse
+import json
+import sys
+
+PERCENTILES = ("p50_ms", "p95_ms", "p99_ms")
+
+
+def _change(before, after):
+    if not before or after is None:
+        return None
+    return (after - before) / before
+
+
+def compare(baseline, candidate, threshold):
+    """Compare the endpoints present in both results.
+
+    Returns:
+        tuple: (report lines, list of regressed "scenario endpoint" labels)
+    """
+    lines, regressions = [], []
+    for scenario, result in candidate["scenarios"].items():
+        base = baseline["scenarios"].get(scenario)
+        if base is None:
+            continue
+        for endpoint, stats in result["endpoints"].items():
+            base_stats = base["endpoints"].get(endpoint)
+            if base_stats is None:
+                continue
+            changes = {name: _change(base_stats[name], stats[name]) for name in PERCENTILES}
+            rendered = " ".join(
+                f"{name[:3]} {base_stats[name]}->{stats[name]}ms"
+                + (f" ({changes[name]:+.0%})" if changes[name] is not None else "")
+                for name in PERCENTILES
+            )
+            regressed = changes["p95_ms"] is not None and changes["p95_ms"] > threshold
+            if regressed:
+                regressions.append(f"{scenario} {endpoint}")
+            lines.append(f"{'REGRESSION ' if regressed else ''}{scenario} {endpoint}: {rendered}")
+    return lines, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare two benchmark results.")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed p95 slowdown (fraction)")
+    args = parser.parse_args(argv)
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    lines, regressions = compare(baseline, candidate, args.threshold)
+    sys.stdout.write("\n".join(lines) + "\n")
+    if regressions:
+        sys.stderr.write(f"{len(regressions)} endpoint(s) regressed by more than {args.threshold:.0%} at p95\n")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Local stand-ins for Piston and the auth, users and admin services.
+
+A single threaded HTTP server answers the endpoints this app calls, after a
+configurable delay per upstream:
+
+- POST /api/v2/execute (Piston): programs are not run. The output is the
+  sum of the integers of the test input, or 0 when the code contains
+  ``WRONG_ANSWER_MARKER``, which is enough to produce every verdict.
+- POST /internal/users/usernames (auth)
+- PUT /users/<id>/xp (users)
+- GET /admin/check (admin): every caller is an admin
+"""
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Submissions containing this marker get a wrong output
+WRONG_ANSWER_MARKER = "BENCH_WRONG_ANSWER"
+
+INTEGER = re.compile(r"-?\d+")
+
+
+class FakeServices:
+    """Fake upstream services on a local port.
+
+    Args:
+        delays (dict): Mean delay in seconds by upstream (piston, auth, users, admin)
+        jitter (float): Each delay varies randomly by up to this fraction
+    """
+
+    def __init__(self, delays=None, jitter=0.2):
+        self.delays = {"piston": 0.05, "auth": 0.005, "users": 0.005, "admin": 0.005, **(delays or {})}
+        self.jitter = jitter
+        self.calls = {upstream: 0 for upstream in self.delays}
+        self._lock = threading.Lock()
+        self._server = None
+
+    def start(self, host="127.0.0.1", port=0):
+        """Start serving in a daemon thread.
+
+        Returns:
+            str: Base URL of the fake services
+        """
+        services = self
+
+        class Handler(FakeHandler):
+            fake = services
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="fake-services", daemon=True).start()
+        return f"http://{host}:{self._server.server_address[1]}"
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def wait(self, upstream):
+        """Count a call and sleep for the delay of its upstream."""
+        with self._lock:
+            self.calls[upstream] += 1
+        delay = self.delays[upstream]
+        if delay:
+            time.sleep(max(0.0, delay * (1 + random.uniform(-self.jitter, self.jitter))))
+
+
+def fake_execute(payload):
+    """Simulated Piston run of one test case.
+
+    Args:
+        payload (dict): Piston execute payload
+
+    Returns:
+        dict: Piston response body
+    """
+    code = payload["files"][0]["content"]
+    test_input = payload.get("stdin", "") + " " + " ".join(payload.get("args", []))
+    total = sum(int(value) for value in INTEGER.findall(test_input))
+    stdout = "0" if WRONG_ANSWER_MARKER in code else str(total)
+    return {
+        "language": payload["language"],
+        "version": "0.0.0",
+        "run": {"stdout": stdout + "\n", "stderr": "", "code": 0, "signal": None},
+    }
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    """Request handler of ``FakeServices``, bound to it through ``fake``."""
+    protocol_version = "HTTP/1.1"
+    fake = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        body = self._read_json()
+        if self.path == "/api/v2/execute":
+            self.fake.wait("piston")
+            return self._send(200, fake_execute(body))
+        if self.path == "/internal/users/usernames":
+            self.fake.wait("auth")
+            return self._send(200, {user_id: f"user_{user_id}" for user_id in body.get("user_ids", [])})
+        self._send(404, {"error": "Not found"})
+
+    def do_PUT(self):
+        body = self._read_json()
+        if self.path.startswith("/users/") and self.path.endswith("/xp"):
+            self.fake.wait("users")
+            return self._send(200, {"message": "XP updated", "xp_points": body.get("xp_points")})
+        self._send(404, {"error": "Not found"})
+
+    def do_GET(self):
+        if self.path == "/admin/check":
+            self.fake.wait("admin")
+            return self._send(200, {"message": "User is an admin"})
+        self._send(404, {"error": "Not found"})
@@ -0,0 +1,114 @@
+"""Microbenchmarks of the hot pure-Python paths.
+
+Usage:
+
+    python -m benchmarks.micro --output micro.json
+
+Each benchmark is timed with timeit (best of --repeat runs) and reported as
+operations per second and microseconds per operation, in JSON.
+"""
+import argparse
+import json
+import sys
+import timeit
+from datetime import datetime
+from types import SimpleNamespace
+
+BENCHMARKS = {}
+
+
+def register_benchmark(name):
+    """Register a benchmark factory, returning the function to time."""
+    def register(factory):
+        BENCHMARKS[name] = factory
+        return factory
+    return register
+
+
+@register_benchmark("judge.format_test_input")
+def bench_format_test_input():
+    from judge import format_test_input
+    return lambda: format_test_input("python", "12, 34, [1, 2, 3], hello")
+
+
+@register_benchmark("judge_harness.build_python_batch")
+def bench_build_harness():
+    import judge_harness
+    harness = judge_harness.get_harness("python")
+    tests = [(f"{i}\n{i + 1}", []) for i in range(20)]
+    return lambda: harness.build("print(int(input()) + int(input()))", tests)
+
+
+@register_benchmark("judge_harness.split_output")
+def bench_split_output():
+    import judge_harness
+    marker = judge_harness.make_marker()
+    stdout = "".join(f"{marker} {i} {str(i).encode().hex()} \n" for i in range(20))
+    return lambda: judge_harness.split_output(stdout, marker, 20)
+
+
+@register_benchmark("judge_cache.make_key")
+def bench_make_key():
+    import judge_cache
+    quest = SimpleNamespace(id="bench-quest", last_modified=datetime(2024, 1, 1))
+    code = "def solve(a, b):\n    return a + b\n" * 20
+    return lambda: judge_cache.make_key(quest, "python", code)
+
+
+@register_benchmark("quest_listing.cursor_roundtrip")
+def bench_cursor():
+    from quest_listing import decode_cursor, encode_cursor
+    row = SimpleNamespace(date_added=datetime(2024, 1, 1), id="bench-quest")
+    return lambda: decode_cursor(encode_cursor(row))
+
+
+@register_benchmark("cache_utils.lru_get_set")
+def bench_lru():
+    from cache_utils import LRUCache
+    cache = LRUCache(1000, ttl=60)
+    keys = [f"key-{i}" for i in range(2000)]
+    state = {"i": 0}
+
+    def run():
+        key = keys[state["i"] % len(keys)]
+        state["i"] += 1
+        if cache.get(key) is None:
+            cache.set(key, key)
+    return run
+
+
+@register_benchmark("metrics.histogram_observe")
+def bench_histogram():
+    import metrics
+    histogram = metrics.Histogram("bench_seconds", "Benchmark", ("endpoint",))
+    return lambda: histogram.observe(0.042, "quests.get_quests")
+
+
+def run_benchmark(factory, number, repeat):
+    fn = factory()
+    best = min(timeit.repeat(fn, number=number, repeat=repeat))
+    per_op = best / number
+    return {"ops_per_s": round(1 / per_op, 1), "us_per_op": round(per_op * 1e6, 3), "number": number}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Microbenchmarks of the hot pure-Python paths.")
+    parser.add_argument("--number", type=int, default=10000, help="Calls per timing run")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing runs, the best one is kept")
+    parser.add_argument("--only", default=None, help="Comma separated benchmarks to run")
+    parser.add_argument("--output", default=None, help="Write the JSON result to this file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    names = args.only.split(",") if args.only else list(BENCHMARKS)
+    results = {name: run_benchmark(BENCHMARKS[name], args.number, args.repeat) for name in names}
+
+    output = json.dumps({"benchmarks": results}, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        sys.stdout.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
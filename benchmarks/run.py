@@ -0,0 +1,246 @@
+"""Load test of the app against local fake upstream services.
+
+Usage (from the repository root):
+
+    python -m benchmarks.run --duration 20 --concurrency 16 --output bench.json
+
+The runner starts the fake services (see ``benchmarks.fake_services``)
+and points the app at them and at a seeded database: a temporary SQLite
+file, or the empty database given with --database-url. It serves the app
+on a local port and runs each scenario of ``benchmarks.scenarios`` for
+--duration seconds from --concurrency client threads. The result is JSON:
+throughput and latency percentiles per scenario and endpoint, and the
+outcome of the scenario checks; the exit status is 1 if a check failed.
+Compare two results with ``python -m benchmarks.compare``.
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import requests
+
+from benchmarks.fake_services import FakeServices
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = math.ceil(fraction * len(sorted_values))
+    return sorted_values[max(0, min(len(sorted_values), rank) - 1)]
+
+
+def summarize(samples, duration):
+    """Throughput and latency percentiles of a list of (latency, ok) samples."""
+    latencies = sorted(latency for latency, _ in samples)
+    errors = sum(1 for _, ok in samples if not ok)
+    to_ms = lambda value: round(value * 1000, 3) if value is not None else None
+    return {
+        "count": len(samples),
+        "errors": errors,
+        "throughput_rps": round(len(samples) / duration, 2) if duration else None,
+        "mean_ms": to_ms(sum(latencies) / len(latencies)) if latencies else None,
+        "p50_ms": to_ms(percentile(latencies, 0.50)),
+        "p95_ms": to_ms(percentile(latencies, 0.95)),
+        "p99_ms": to_ms(percentile(latencies, 0.99)),
+        "max_ms": to_ms(latencies[-1]) if latencies else None,
+    }
+
+
+class Client:
+    """HTTP client of one load thread, recording the latency of every call.
+
+    Args:
+        base_url (str): URL of the app
+        token (str): JWT sent as bearer token
+        samples (dict): Shared ``{label: [(latency, ok)]}`` of the scenario
+        lock (threading.Lock): Guards ``samples``
+    """
+
+    def __init__(self, base_url, token, samples, lock):
+        self.base_url = base_url
+        self.session = requests.Session()
+        self.session.headers["Authorization"] = f"Bearer {token}"
+        self.samples = samples
+        self.lock = lock
+
+    def call(self, label, method, path, expected=None, **kwargs):
+        """Send a request and record it under ``label``.
+
+        Args:
+            label (str): Endpoint label in the results
+            method (str): HTTP method
+            path (str): Path of the app
+            expected (tuple): Successful status codes, any 2xx by default
+            **kwargs: Passed through to requests
+
+        Returns:
+            requests.Response: The response, or None if the request failed
+        """
+        started = time.perf_counter()
+        try:
+            response = self.session.request(method, self.base_url + path, timeout=60, **kwargs)
+            # Read the whole body, streamed responses included
+            response.content
+            ok = response.status_code in expected if expected else 200 <= response.status_code < 300
+        except requests.RequestException:
+            response, ok = None, False
+        latency = time.perf_counter() - started
+        with self.lock:
+            self.samples[label].append((latency, ok))
+        return response
+
+
+def run_scenario(scenario, base_url, tokens, data, duration, concurrency, seed):
+    """Run a scenario from ``concurrency`` threads for ``duration`` seconds.
+
+    Returns:
+        dict: Summary of the scenario and of each endpoint label
+    """
+    samples = defaultdict(list)
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+    actions = [0] * concurrency
+
+    def worker(index):
+        rng = random.Random(seed + index)
+        client = Client(base_url, tokens[index % len(tokens)], samples, lock)
+        while time.monotonic() < deadline:
+            scenario(client, data, rng)
+            actions[index] += 1
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    all_samples = [sample for label_samples in samples.values() for sample in label_samples]
+    return {
+        "duration_s": round(elapsed, 3),
+        "concurrency": concurrency,
+        "actions": sum(actions),
+        **summarize(all_samples, elapsed),
+        "endpoints": {label: summarize(label_samples, elapsed) for label, label_samples in sorted(samples.items())},
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scenarios", default=None, help="Comma separated scenarios to run (default: all)")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds per scenario")
+    parser.add_argument("--concurrency", type=int, default=8, help="Client threads per scenario")
+    parser.add_argument("--warmup", type=float, default=1, help="Unrecorded seconds before each scenario")
+    parser.add_argument("--database-url", default=None, help="Database to seed (default: temporary SQLite file)")
+    parser.add_argument("--quests", type=int, default=200)
+    parser.add_argument("--solutions", type=int, default=20000)
+    parser.add_argument("--comments", type=int, default=5000)
+    parser.add_argument("--piston-delay", type=float, default=0.05, help="Seconds per fake Piston execution")
+    parser.add_argument("--service-delay", type=float, default=0.005, help="Seconds per fake auth/users/admin call")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None, help="Write the JSON result to this file (default: stdout)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    fakes = FakeServices({
+        "piston": args.piston_delay,
+        "auth": args.service_delay,
+        "users": args.service_delay,
+        "admin": args.service_delay,
+    })
+    fake_url = fakes.start()
+
+    database_url = args.database_url or "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+    # The configuration is read when the app modules are imported
+    os.environ.update({
+        "PISTON_API_URL": fake_url,
+        "AUTH_SERVICE_URL": fake_url,
+        "USERS_SERVICE_URL": fake_url,
+        "ADMIN_SERVICE_URL": fake_url,
+        "DATABASE_URI": database_url,
+        "INTERNAL_SECRET": os.environ.get("INTERNAL_SECRET", "benchmark"),
+        "JWT_SECRET_KEY": os.environ.get("JWT_SECRET_KEY", "benchmark-secret-key-of-32-bytes!"),
+        # The load clients share a few identities, the rate limit would shed them
+        "ADMISSION_ENABLED": os.environ.get("ADMISSION_ENABLED", "false"),
+    })
+
+    from werkzeug.serving import make_server
+    from flask_jwt_extended import create_access_token
+    from app import create_app, start_background_services
+    from benchmarks.scenarios import CHECKS, SCENARIOS
+    from benchmarks.seed import seed_database
+
+    app = create_app()
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    with app.app_context():
+        data = seed_database(quests=args.quests, solutions=args.solutions, comments=args.comments, seed=args.seed)
+        tokens = [create_access_token(identity=user_id) for user_id in data["user_ids"][:args.concurrency]]
+    # Once the tables exist
+    start_background_services(app)
+
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="bench-app", daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    names = args.scenarios.split(",") if args.scenarios else list(SCENARIOS)
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(unknown)}")
+
+    results = {}
+    for name in names:
+        if args.warmup:
+            run_scenario(SCENARIOS[name], base_url, tokens, data, args.warmup, args.concurrency, args.seed)
+        results[name] = run_scenario(SCENARIOS[name], base_url, tokens, data, args.duration, args.concurrency, args.seed)
+        sys.stderr.write(f"{name}: {results[name]['throughput_rps']} req/s, p95 {results[name]['p95_ms']} ms\n")
+        if name in CHECKS:
+            with app.app_context():
+                errors = CHECKS[name](data)
+            results[name]["check"] = {"passed": not errors, "errors": errors}
+            for error in errors:
+                sys.stderr.write(f"{name}: check failed: {error}\n")
+
+    server.shutdown()
+    fakes.stop()
+
+    report = {
+        "commit": git_commit(),
+        "date": datetime.now(timezone.utc).isoformat(),
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "upstream_calls": fakes.calls,
+        "scenarios": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        sys.stdout.write(output + "\n")
+    if any(not result.get("check", {"passed": True})["passed"] for result in results.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
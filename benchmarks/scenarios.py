@@ -0,0 +1,136 @@
+"""Scripted load scenarios.
+
+A scenario is a function running one user action against the app, made of
+one or more HTTP calls timed by ``Client.call``. The runner calls it in a
+loop from several client threads for the duration of the scenario.
+
+A scenario can have a check, run by the runner in an app context once the
+scenario is over. It returns a list of errors, and the run fails if any.
+"""
+import uuid
+
+from benchmarks.fake_services import WRONG_ANSWER_MARKER
+
+SCENARIOS = {}
+CHECKS = {}
+
+CORRECT_CODE = "a = int(input())\nb = int(input())\nprint(a + b)\n"
+
+
+def register_scenario(name, check=None):
+    """Register a scenario under ``name``, with an optional ``check(data)``."""
+    def register(fn):
+        SCENARIOS[name] = fn
+        if check is not None:
+            CHECKS[name] = check
+        return fn
+    return register
+
+
+@register_scenario("catalog_browsing")
+def catalog_browsing(client, data, rng):
+    """Browse the catalog: a few listing pages, a language listing and a quest."""
+    response = client.call("GET /quests", "GET", "/quests", params={"limit": 50})
+    for _ in range(rng.randint(0, 2)):
+        cursor = response.headers.get("X-Next-Cursor") if response is not None else None
+        if not cursor:
+            break
+        response = client.call("GET /quests?cursor", "GET", "/quests", params={"limit": 50, "cursor": cursor})
+
+    client.call("GET /quests/<language>", "GET", f"/quests/{rng.choice(data['languages'])}")
+
+    quest_id = rng.choice(data["quest_ids"])
+    response = client.call("GET /quest/<quest_id>", "GET", f"/quest/{quest_id}")
+    if response is not None and response.headers.get("ETag"):
+        # Revalidation of a page the browser already has
+        client.call("GET /quest/<quest_id> (If-None-Match)", "GET", f"/quest/{quest_id}",
+                    headers={"If-None-Match": response.headers["ETag"]}, expected=(304,))
+
+
+@register_scenario("submission_burst")
+def submission_burst(client, data, rng):
+    """Submit a solution, mostly new code, sometimes a resubmission or a wrong answer."""
+    quest_id = rng.choice(data["quest_ids"])
+    roll = rng.random()
+    if roll < 0.2:
+        code = CORRECT_CODE
+    elif roll < 0.4:
+        code = f"# {WRONG_ANSWER_MARKER} {uuid.uuid4()}\nprint(0)\n"
+    else:
+        code = f"# {uuid.uuid4()}\n{CORRECT_CODE}"
+    client.call("POST /submit/<quest_id>", "POST", f"/submit/{quest_id}", json={
+        "code": code,
+        "language": "python",
+        "user_id": rng.choice(data["user_ids"]),
+    })
+
+
+@register_scenario("comment_heavy")
+def comment_heavy(client, data, rng):
+    """Read the comments of the hot quest, sometimes adding one."""
+    quest_id = data["hot_quest_id"]
+    client.call("GET /comments/<hot_quest_id>", "GET", f"/comments/{quest_id}")
+    if rng.random() < 0.1:
+        client.call("POST /comments/<hot_quest_id>", "POST", f"/comments/{quest_id}", json={
+            "comment": "Benchmark comment",
+            "user_id": rng.choice(data["user_ids"]),
+        }, expected=(201,))
+
+
+@register_scenario("solution_history")
+def solution_history(client, data, rng):
+    """Load the solution history of the heavy user and of a random user."""
+    client.call("GET /solutions/<heavy_user_id>", "GET", f"/solutions/{data['heavy_user_id']}")
+    client.call("GET /correct_solutions/<user_id>", "GET", f"/correct_solutions/{rng.choice(data['user_ids'])}")
+
+
+@register_scenario("admin_edits")
+def admin_edits(client, data, rng):
+    """Edit quests as an admin while the catalog is being read."""
+    quest_id = rng.choice(data["quest_ids"])
+    if rng.random() < 0.2:
+        client.call("GET /edit_quest/<quest_id>", "GET", f"/edit_quest/{quest_id}")
+        client.call("PUT /quests/<quest_id>", "PUT", f"/quests/{quest_id}", json={
+            "condition": f"Add the two numbers ({uuid.uuid4()}).",
+        })
+    else:
+        client.call("GET /quests", "GET", "/quests", params={"limit": 50})
+        client.call("GET /quest/<quest_id>", "GET", f"/quest/{quest_id}")
+
+
+def check_solved_times(data):
+    """Compare the solved counter of the hot quest to its solved solutions.
+
+    Solves buffered by the write-behind aggregator are flushed first.
+    """
+    from flask import current_app
+    from sqlalchemy import func
+    from extensions import db
+    from models import Quest, QuestSolution
+    from solve_counter import get_aggregator
+
+    if current_app.config["SOLVED_TIMES_FLUSH_INTERVAL"] > 0:
+        get_aggregator().flush()
+    quest_id = data["hot_quest_id"]
+    solved_times = db.session.get(Quest, quest_id).solved_times
+    solved = db.session.query(func.count(QuestSolution.id)).filter_by(quest_id=quest_id, is_solved=True).scalar()
+    if solved_times != solved:
+        return [f"solved_times of {quest_id} is {solved_times}, {solved} solutions are solved"]
+    return []
+
+
+@register_scenario("solve_burst", check=check_solved_times)
+def solve_burst(client, data, rng):
+    """Every client solves the hot quest at the same time.
+
+    The check fails if solves were lost or counted twice. Run it with both
+    counters (see ``solve_counter``)::
+
+        SOLVED_TIMES_FLUSH_INTERVAL=0 python -m benchmarks.run --scenarios solve_burst
+        SOLVED_TIMES_FLUSH_INTERVAL=1 python -m benchmarks.run --scenarios solve_burst
+    """
+    client.call("POST /submit/<hot_quest_id>", "POST", f"/submit/{data['hot_quest_id']}", json={
+        "code": f"# {uuid.uuid4()}\n{CORRECT_CODE}",
+        "language": "python",
+        "user_id": rng.choice(data["user_ids"]),
+    })
@@ -0,0 +1,119 @@
+"""Seeded database fixture of the benchmarks.
+
+Fills the tables with deterministic quests, test cases, solutions and
+comments using bulk inserts, so a run starts from the same data on every
+commit. One quest gets most of the comments and one user most of the
+solutions, for the comment-heavy and history scenarios.
+"""
+import random
+from datetime import datetime, timedelta
+from sqlalchemy import insert
+from extensions import db
+from models import CodeBlob, Quest, QuestComment, QuestSolution, QuestTestCase
+from code_store import blob_values
+from stats import rebuild_stats
+
+LANGUAGES = ("python", "javascript", "java", "c++")
+DIFFICULTIES = (("Easy", "30"), ("Medium", "60"), ("Hard", "100"))
+
+# Rows per INSERT statement
+CHUNK_SIZE = 1000
+
+
+def _insert_chunks(table, rows):
+    for start in range(0, len(rows), CHUNK_SIZE):
+        db.session.execute(insert(table), rows[start:start + CHUNK_SIZE])
+
+
+def seed_database(quests=200, tests_per_quest=5, users=1000, solutions=20000, comments=5000, hot_comments=2000,
+                  heavy_user_solutions=2000, seed=42):
+    """Create the tables if needed and fill them with benchmark data.
+
+    Test inputs are "a, b" pairs whose expected output is their sum, the
+    answer of the fake Piston.
+
+    Args:
+        quests (int): Number of quests
+        tests_per_quest (int): Test cases of each quest
+        users (int): Number of distinct users
+        solutions (int): Solutions spread over all users
+        comments (int): Comments spread over all quests
+        hot_comments (int): Extra comments of the hot quest
+        heavy_user_solutions (int): Extra solutions of the heavy user
+        seed (int): Random seed
+
+    Returns:
+        dict: IDs the scenarios use (quest_ids, languages, hot_quest_id, user_ids, heavy_user_id)
+    """
+    rng = random.Random(seed)
+    db.create_all(bind_key=None)
+    start = datetime(2024, 1, 1)
+
+    quest_rows, test_rows = [], []
+    for i in range(quests):
+        difficulty, xp = DIFFICULTIES[i % len(DIFFICULTIES)]
+        quest_id = f"bench-quest-{i}"
+        added = start + timedelta(hours=i)
+        quest_rows.append({
+            "id": quest_id, "language": LANGUAGES[i % len(LANGUAGES)], "difficulty": difficulty,
+            "quest_name": f"Benchmark quest {i}", "solved_times": 0, "quest_author": "bench",
+            "date_added": added, "last_modified": added, "condition": "Add the two numbers. " * 20,
+            "function_template": "def solve(a, b):\n    pass\n", "example_solution": "", "xp": xp,
+            "type": "Basic", "is_active": True, "quest_comments": [],
+        })
+        for position in range(tests_per_quest):
+            a, b = rng.randint(-1000, 1000), rng.randint(-1000, 1000)
+            test_rows.append({
+                "id": f"{quest_id}-test-{position}", "quest_id": quest_id, "position": position,
+                "input": f"{a}, {b}", "output": str(a + b), "weight": 1, "is_sample": position == 0,
+            })
+
+    quest_ids = [row["id"] for row in quest_rows]
+    user_ids = [f"bench-user-{i}" for i in range(users)]
+    hot_quest_id, heavy_user_id = quest_ids[0], user_ids[0]
+
+    # Few distinct codes: most submissions repeat a code stored once (see code_store.py)
+    blob_rows = [blob_values(f"def solve(a, b):\n    return a + b  # {i}\n" * 10) for i in range(100)]
+    solution_rows = []
+    for i in range(solutions + heavy_user_solutions):
+        quest = quest_rows[rng.randrange(quests)]
+        solved = rng.random() < 0.5
+        solution_rows.append({
+            "id": f"bench-solution-{i}", "quest_id": quest["id"],
+            "user_id": heavy_user_id if i >= solutions else rng.choice(user_ids),
+            "code_hash": blob_rows[i % len(blob_rows)]["hash"], "language": quest["language"],
+            "tests_passed": tests_per_quest if solved else 0, "tests_failed": 0 if solved else tests_per_quest,
+            "is_solved": solved, "date_added": start + timedelta(minutes=i),
+        })
+
+    # solved_times matches the solved solutions, the solve_burst check relies on it
+    by_id = {quest["id"]: quest for quest in quest_rows}
+    for solution in solution_rows:
+        if solution["is_solved"]:
+            by_id[solution["quest_id"]]["solved_times"] += 1
+
+    comment_rows = [
+        {
+            "id": f"bench-comment-{i}", "quest_id": hot_quest_id if i >= comments else rng.choice(quest_ids),
+            "user_id": rng.choice(user_ids), "comment": f"Benchmark comment {i}",
+            "date_added": start + timedelta(minutes=i),
+        }
+        for i in range(comments + hot_comments)
+    ]
+
+    _insert_chunks(Quest.__table__, quest_rows)
+    _insert_chunks(QuestTestCase.__table__, test_rows)
+    _insert_chunks(CodeBlob.__table__, blob_rows)
+    _insert_chunks(QuestSolution.__table__, solution_rows)
+    _insert_chunks(QuestComment.__table__, comment_rows)
+    db.session.commit()
+    # The solutions bypass the judge, the stats are computed from them
+    rebuild_stats()
+
+    return {
+        "quest_ids": quest_ids,
+        "languages": list(LANGUAGES),
+        "hot_quest_id": hot_quest_id,
+        "user_ids": user_ids,
+        "heavy_user_id": heavy_user_id,
+    }
@@ -0,0 +1,192 @@
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Thread-safe LRU cache with an optional time-to-live per entry.
+
+    Args:
+        maxsize (int): Maximum number of entries, the least recently used one is evicted first
+        ttl (float): Default time-to-live in seconds, None to keep entries until evicted
+    """
+
+    def __init__(self, maxsize, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Get a value and mark it as recently used.
+
+        Args:
+            key: Cache key
+            default: Returned when the key is missing or expired
+
+        Returns:
+            The cached value or ``default``
+        """
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=_MISSING):
+        """Store a value, evicting the least recently used entries if full.
+
+        Args:
+            key: Cache key
+            value: Value to store
+            ttl (float): Time-to-live override in seconds
+        """
+        ttl = self.ttl if ttl is _MISSING else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, _MISSING)
+        return default if entry is _MISSING else entry[0]
+
+    def discard_where(self, predicate):
+        """Remove every entry whose value matches ``predicate``.
+
+        Args:
+            predicate (callable): Called with each cached value
+
+        Returns:
+            int: Number of removed entries
+        """
+        with self._lock:
+            keys = [key for key, (value, _) in self._data.items() if predicate(value)]
+            for key in keys:
+                del self._data[key]
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+
+class SingleFlight:
+    """Coalesce identical concurrent calls into a single execution.
+
+    While a call for a key is in flight, other callers with the same key
+    wait for it and share its result (or exception).
+    """
+
+    class _Call:
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        """Run ``fn`` once for all concurrent callers of ``key``.
+
+        Args:
+            key: Identifies identical calls
+            fn (callable): The call to execute
+
+        Returns:
+            The result of ``fn``
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = self._Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+class BatchSingleFlight:
+    """Deduplicate concurrent batched lookups per key.
+
+    Each caller only fetches the keys no other caller is currently
+    fetching, in one batch, and waits for the in-flight keys of others.
+    """
+
+    class _Key:
+        def __init__(self):
+            self.done = threading.Event()
+            self.found = False
+            self.value = None
+
+    def __init__(self):
+        self._keys = {}
+        self._lock = threading.Lock()
+
+    def do(self, keys, fn, timeout=None):
+        """Look up ``keys`` with ``fn``, sharing in-flight lookups.
+
+        Args:
+            keys (iterable): Keys to look up
+            fn (callable): Takes a list of keys, returns a dict of the keys it found
+            timeout (float): Max seconds to wait for lookups of other callers
+
+        Returns:
+            dict: Values of the keys that were found
+        """
+        owned, waiting = [], {}
+        with self._lock:
+            for key in keys:
+                entry = self._keys.get(key)
+                if entry is None:
+                    self._keys[key] = self._Key()
+                    owned.append(key)
+                else:
+                    waiting[key] = entry
+
+        found = {}
+        if owned:
+            try:
+                found = fn(owned)
+            finally:
+                with self._lock:
+                    for key in owned:
+                        entry = self._keys.pop(key)
+                        if key in found:
+                            entry.found, entry.value = True, found[key]
+                        entry.done.set()
+
+        for key, entry in waiting.items():
+            if entry.done.wait(timeout) and entry.found:
+                found[key] = entry.value
+        return found
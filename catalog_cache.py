@@ -0,0 +1,86 @@
+import hashlib
+import time
+from flask import current_app, request
+from sqlalchemy import select, update
+from extensions import db
+from models import CatalogVersion
+from cache_utils import LRUCache
+
+# Primary key of the single catalog_version row
+VERSION_ROW_ID = 1
+
+_cache = None
+
+
+def _responses():
+    global _cache
+    if _cache is None:
+        _cache = LRUCache(current_app.config["CATALOG_CACHE_SIZE"])
+    return _cache
+
+
+def current_version():
+    """Cheap probe of the catalog version shared by all worker processes.
+
+    Returns:
+        int: Current catalog version
+    """
+    version = db.session.execute(
+        select(CatalogVersion.version).where(CatalogVersion.id == VERSION_ROW_ID)
+    ).scalar()
+    return version or 0
+
+
+def bump_catalog_version():
+    """Invalidate every cached catalog response, in every worker process.
+
+    Runs in the current transaction, so the new version becomes visible
+    together with the catalog write that caused it.
+    """
+    bumped = db.session.execute(
+        update(CatalogVersion)
+        .where(CatalogVersion.id == VERSION_ROW_ID)
+        .values(version=CatalogVersion.version + 1)
+    ).rowcount
+    if not bumped:
+        db.session.add(CatalogVersion(id=VERSION_ROW_ID, version=1))
+    _responses().clear()
+
+
+def cached_catalog_response(build):
+    """Serve a catalog read from the cache, with ETag revalidation.
+
+    A cached body is reused while the catalog version is unchanged and the
+    entry is younger than CATALOG_CACHE_MAX_AGE seconds. The max age bounds
+    the staleness of fields that change without a catalog write, such as
+    solved_times. Responses carry a strong ETag of the body and requests
+    with a matching If-None-Match get a 304.
+
+    Args:
+        build (callable): Builds the uncached response of the current request
+
+    Returns:
+        Response: The cached, fresh or 304 response
+    """
+    version = current_version()
+    key = (request.path, tuple(sorted(request.args.items(multi=True))))
+    entry = _responses().get(key)
+
+    if entry is None or entry["version"] != version or time.monotonic() - entry["created"] > current_app.config["CATALOG_CACHE_MAX_AGE"]:
+        response = current_app.make_response(build())
+        if response.status_code != 200:
+            return response
+        body = response.get_data()
+        entry = {
+            "version": version,
+            "created": time.monotonic(),
+            "body": body,
+            "etag": hashlib.sha256(body).hexdigest()[:32],
+            "headers": {name: response.headers[name] for name in ("X-Next-Cursor", "Link") if name in response.headers},
+        }
+        _responses().set(key, entry)
+
+    response = current_app.response_class(entry["body"], mimetype="application/json", headers=entry["headers"])
+    response.set_etag(entry["etag"])
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response.make_conditional(request)
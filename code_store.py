@@ -0,0 +1,51 @@
+import hashlib
+import zlib
+from datetime import datetime
+from db_utils import insert_ignore
+from models import CodeBlob
+
+# zlib level of the stored code: the gain of the higher levels is small on source code
+COMPRESSION_LEVEL = 6
+
+
+def blob_values(code):
+    """Column values of the code_blobs row of a source code.
+
+    The code is compressed with zlib, unless that does not make it smaller
+    (e.g. very short code), then it is stored as is.
+
+    Args:
+        code (str): Source code
+
+    Returns:
+        dict: hash, data, compression, size and date_added
+    """
+    raw = code.encode("utf-8")
+    compressed = zlib.compress(raw, COMPRESSION_LEVEL)
+    data, compression = (compressed, "zlib") if len(compressed) < len(raw) else (raw, "none")
+    return dict(hash=hashlib.sha256(raw).hexdigest(), data=data, compression=compression, size=len(raw),
+                date_added=datetime.now())
+
+
+def decode_blob(data, compression):
+    """Source code of a code_blobs row."""
+    if compression == "zlib":
+        data = zlib.decompress(data)
+    return bytes(data).decode("utf-8")
+
+
+def store_code(code):
+    """Store a source code once, in the current session's transaction.
+
+    Identical code, e.g. a resubmission, reuses the existing row.
+
+    Args:
+        code (str): Source code
+
+    Returns:
+        str: Hash of the code, for ``QuestSolution.code_hash``
+    """
+    values = blob_values(code)
+    insert_ignore(CodeBlob, values, ['hash'])
+    return values["hash"]
+
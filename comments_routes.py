@@ -1,34 +1,35 @@
-import requests, os
 import logging
 from flask import Blueprint, request, jsonify, send_file
 from extensions import db
-from services import token_required
+from services import token_required, resolve_usernames
 from sqlalchemy import text
 from models import QuestComment
+from streaming import stream_rows
+from db_routing import read_only
 
 comments_bp = Blueprint('comments', __name__)
 
-AUTH_SERVICE_URL = os.getenv("AUTH_SERVICE_URL")
-INTERNAL_SECRET = os.getenv("INTERNAL_SECRET")
-
 @comments_bp.route('/comments', methods=['GET'])
 @token_required
+@read_only
 def get_comments():
     """Get all comments from the database.
 
+    The comments are streamed from a server-side cursor, as NDJSON with
+    format=ndjson or an ``Accept: application/x-ndjson`` header.
+
     Returns:
         JSON: List of all comments
     """
     try:
-        comments = db.session.execute(text("SELECT * FROM quest_comments")).fetchall()
-        comments_list = [dict(row) for row in comments]
-        return jsonify(comments_list), 200
+        return stream_rows(text("SELECT * FROM quest_comments"))
     except Exception as e:
         logging.error("Error in get_comments: %s", e, exc_info=True)
         return jsonify({"error": "An internal error has occurred"}), 500
 
 @comments_bp.route('/comments/<quest_id>', methods=['GET'])
 @token_required
+@read_only
 def get_comments_by_quest(quest_id):
     try:
         # Step 1: Get comments from DB
@@ -39,25 +40,15 @@ def get_comments_by_quest(quest_id):
             ORDER BY date_added DESC
         """), {"quest_id": quest_id})
         comments = [dict(row._mapping) for row in result.fetchall()]
+        # Give the connection back to the pool before waiting on the auth service
+        db.session.close()
 
-        # Step 2: Extract unique user_ids
-        user_ids = list({c['user_id'] for c in comments})
-        
-        # Step 3: Call auth service to get usernames
-        auth_response = requests.post(
-            f"{AUTH_SERVICE_URL}/internal/users/usernames",
-            json={"user_ids": user_ids},
-            headers={"INTERNAL-SECRET": INTERNAL_SECRET}
-        )
-
-        if auth_response.status_code != 200:
-            return jsonify({"error": "Failed to fetch usernames"}), 500
-
-        user_data = auth_response.json()  # { user_id: username }
+        # Step 2: Resolve the usernames of the commenters (cached, misses in one batch)
+        usernames = resolve_usernames(c['user_id'] for c in comments)
 
-        # Step 4: Attach usernames to comments
+        # Step 3: Attach usernames to comments
         for comment in comments:
-            comment["username"] = user_data.get(comment["user_id"], "Unknown")
+            comment["username"] = usernames[comment["user_id"]]
 
         return jsonify(comments), 200
 
@@ -7,4 +7,173 @@ class Config:
     SECRET_KEY = os.getenv("SECRET_KEY")
     SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URI")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY")
\ No newline at end of file
+    JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY")
+
+    # Production server (gunicorn.conf.py): gevent worker processes, requests
+    # handled concurrently by each of them and request timeout (seconds)
+    SERVER_BIND = os.getenv("SERVER_BIND", "0.0.0.0:5003")
+    SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", os.cpu_count() or 1))
+    SERVER_WORKER_CONNECTIONS = int(os.getenv("SERVER_WORKER_CONNECTIONS", 500))
+    SERVER_TIMEOUT = int(os.getenv("SERVER_TIMEOUT", 60))
+
+    # Database connections of the whole service, split between the worker
+    # processes. Requests beyond the pool of a process wait up to
+    # DB_POOL_TIMEOUT seconds for a connection
+    DB_MAX_CONNECTIONS = int(os.getenv("DB_MAX_CONNECTIONS", 100))
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", max(2, DB_MAX_CONNECTIONS // SERVER_WORKERS)))
+    DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 10))
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": 0,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_pre_ping": True,
+    } if (SQLALCHEMY_DATABASE_URI or "").startswith("postgresql") else {}
+
+    # Optional read replicas (comma separated URIs), used by read_only views
+    SQLALCHEMY_BINDS = {
+        f"replica_{i}": uri.strip()
+        for i, uri in enumerate(os.getenv("DATABASE_REPLICA_URIS", "").split(","))
+        if uri.strip()
+    }
+    # Seconds between replica health checks, max replication lag (seconds, 0 = ignore)
+    # and how long a client's reads stay on the primary after a write (see
+    # db_routing.record_write)
+    REPLICA_CHECK_INTERVAL = float(os.getenv("REPLICA_CHECK_INTERVAL", 5))
+    REPLICA_MAX_LAG = float(os.getenv("REPLICA_MAX_LAG", 10))
+    REPLICA_READ_YOUR_WRITES_WINDOW = int(os.getenv("REPLICA_READ_YOUR_WRITES_WINDOW", 5))
+
+    # Max number of test cases of a single submission executed in parallel (1 = sequential)
+    JUDGE_MAX_CONCURRENCY = int(os.getenv("JUDGE_MAX_CONCURRENCY", 10))
+
+    # Outbound HTTP client: pool size per upstream (by default enough for the
+    # concurrent requests of a worker, up to 100), timeouts (seconds) and retries
+    HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", min(SERVER_WORKER_CONNECTIONS, 100)))
+    HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", 2))
+    HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", 5))
+    HTTP_READ_TIMEOUTS = {
+        "piston": float(os.getenv("PISTON_READ_TIMEOUT", 30)),
+    }
+    HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", 2))
+    HTTP_RETRY_BACKOFF = float(os.getenv("HTTP_RETRY_BACKOFF", 0.1))
+    HTTP_BREAKER_FAILURE_THRESHOLD = int(os.getenv("HTTP_BREAKER_FAILURE_THRESHOLD", 5))
+    HTTP_BREAKER_RESET_TIMEOUT = float(os.getenv("HTTP_BREAKER_RESET_TIMEOUT", 30))
+
+    # Execution backend per language ("python=local,javascript=local"), the
+    # others use the default backend. "piston" calls PISTON_API_URL, "local"
+    # runs Python and JavaScript in subprocesses of this host
+    EXECUTION_BACKENDS = dict(
+        item.strip().split("=", 1)
+        for item in os.getenv("EXECUTION_BACKENDS", "").split(",")
+        if "=" in item
+    )
+    EXECUTION_DEFAULT_BACKEND = os.getenv("EXECUTION_DEFAULT_BACKEND", "piston")
+    # Local backend: idle workers kept per language, CPU (seconds), memory (MB)
+    # and output (bytes) limits of a run, interpreters
+    LOCAL_EXEC_POOL_SIZE = int(os.getenv("LOCAL_EXEC_POOL_SIZE", 4))
+    LOCAL_EXEC_CPU_LIMIT = int(os.getenv("LOCAL_EXEC_CPU_LIMIT", 30))
+    LOCAL_EXEC_MEMORY_LIMIT = int(os.getenv("LOCAL_EXEC_MEMORY_LIMIT", 256))
+    LOCAL_EXEC_OUTPUT_LIMIT = int(os.getenv("LOCAL_EXEC_OUTPUT_LIMIT", 1024 * 1024))
+    LOCAL_EXEC_PYTHON = os.getenv("LOCAL_EXEC_PYTHON", "python3")
+    LOCAL_EXEC_NODE = os.getenv("LOCAL_EXEC_NODE", "node")
+
+    # Test execution mode: "per_test" (one Piston call per test) or "batched"
+    # (one Piston call per submission for languages with a harness)
+    JUDGE_EXECUTION_MODE = os.getenv("JUDGE_EXECUTION_MODE", "per_test")
+    JUDGE_HARNESS_TEST_TIMEOUT = int(os.getenv("JUDGE_HARNESS_TEST_TIMEOUT", 2))
+    JUDGE_BATCH_MAX_RUN_TIMEOUT = int(os.getenv("JUDGE_BATCH_MAX_RUN_TIMEOUT", 20000))
+    # Largest run_timeout (ms) accepted by the Piston instance, its
+    # PISTON_RUN_TIMEOUT setting (3000 in a stock install)
+    PISTON_MAX_RUN_TIMEOUT = int(os.getenv("PISTON_MAX_RUN_TIMEOUT", 3000))
+
+    # Judge mode of submissions that do not ask for one: "full", "fail_fast"
+    # (stop at the first failed test) or "sample" (sample tests only)
+    JUDGE_DEFAULT_MODE = os.getenv("JUDGE_DEFAULT_MODE", "full")
+
+    # Submission admission control: per-user token bucket (submissions per
+    # second and burst), cap on submissions judged at once by all processes
+    # (each runs up to JUDGE_MAX_CONCURRENCY executions) and on queued async
+    # submissions (0 = no cap), Retry-After (seconds) when overloaded, lease
+    # of a judge slot (seconds) and where the state lives: "database" (shared
+    # by every process) or "memory" (a single process)
+    ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+    ADMISSION_USER_RATE = float(os.getenv("ADMISSION_USER_RATE", 0.5))
+    ADMISSION_USER_BURST = float(os.getenv("ADMISSION_USER_BURST", 10))
+    ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", 100))
+    ADMISSION_MAX_QUEUED = int(os.getenv("ADMISSION_MAX_QUEUED", 1000))
+    ADMISSION_RETRY_AFTER = float(os.getenv("ADMISSION_RETRY_AFTER", 2))
+    ADMISSION_SLOT_LEASE = int(os.getenv("ADMISSION_SLOT_LEASE", 300))
+    ADMISSION_STORE = os.getenv("ADMISSION_STORE", "database")
+
+    # Asynchronous submissions: queue every submission by default, number of
+    # judge worker threads started inside each web process (0 = use the
+    # "flask judge-worker" entry point instead), polling and timeouts (seconds)
+    SUBMISSION_ASYNC = os.getenv("SUBMISSION_ASYNC", "false").lower() == "true"
+    JUDGE_WORKERS = int(os.getenv("JUDGE_WORKERS", 0))
+    JUDGE_WORKER_POLL_INTERVAL = float(os.getenv("JUDGE_WORKER_POLL_INTERVAL", 0.5))
+    JUDGE_JOB_TIMEOUT = int(os.getenv("JUDGE_JOB_TIMEOUT", 300))
+    JUDGE_JOB_MAX_ATTEMPTS = int(os.getenv("JUDGE_JOB_MAX_ATTEMPTS", 3))
+    JUDGE_SSE_TIMEOUT = int(os.getenv("JUDGE_SSE_TIMEOUT", 120))
+
+    # Judge result cache for byte-identical resubmissions, optionally shared
+    # between processes through the judge_results table
+    JUDGE_CACHE_ENABLED = os.getenv("JUDGE_CACHE_ENABLED", "true").lower() == "true"
+    JUDGE_CACHE_SIZE = int(os.getenv("JUDGE_CACHE_SIZE", 1000))
+    JUDGE_CACHE_SHARED = os.getenv("JUDGE_CACHE_SHARED", "false").lower() == "true"
+    JUDGE_CACHE_SHARED_TTL = int(os.getenv("JUDGE_CACHE_SHARED_TTL", 86400))
+
+    # Admin check cache (seconds), capped by the JWT expiry
+    ADMIN_CACHE_SIZE = int(os.getenv("ADMIN_CACHE_SIZE", 10000))
+    ADMIN_CACHE_TTL = int(os.getenv("ADMIN_CACHE_TTL", 300))
+    ADMIN_CACHE_NEGATIVE_TTL = int(os.getenv("ADMIN_CACHE_NEGATIVE_TTL", 30))
+
+    # Username cache (seconds) and the read timeout of batched username lookups
+    USERNAME_CACHE_SIZE = int(os.getenv("USERNAME_CACHE_SIZE", 50000))
+    USERNAME_CACHE_TTL = int(os.getenv("USERNAME_CACHE_TTL", 3600))
+    USERNAME_CACHE_NEGATIVE_TTL = int(os.getenv("USERNAME_CACHE_NEGATIVE_TTL", 60))
+    USERNAME_LOOKUP_TIMEOUT = float(os.getenv("USERNAME_LOOKUP_TIMEOUT", 1.5))
+
+    # Quest listing page sizes
+    QUESTS_PAGE_SIZE = int(os.getenv("QUESTS_PAGE_SIZE", 50))
+    QUESTS_MAX_PAGE_SIZE = int(os.getenv("QUESTS_MAX_PAGE_SIZE", 200))
+
+    # Catalog response cache: max cached responses and max age (seconds)
+    CATALOG_CACHE_SIZE = int(os.getenv("CATALOG_CACHE_SIZE", 1000))
+    CATALOG_CACHE_MAX_AGE = int(os.getenv("CATALOG_CACHE_MAX_AGE", 60))
+
+    # solved_times write-behind flush interval (seconds). 0 increments in SQL
+    # on every solve; above 0, solves buffered since the last flush are lost
+    # if the process crashes (see solve_counter.SolvedTimesAggregator)
+    SOLVED_TIMES_FLUSH_INTERVAL = float(os.getenv("SOLVED_TIMES_FLUSH_INTERVAL", 0))
+
+    # XP outbox dispatcher: in-process thread (or `flask xp-dispatcher`),
+    # batch size, poll interval and retry backoff (seconds)
+    XP_DISPATCHER_ENABLED = os.getenv("XP_DISPATCHER_ENABLED", "true").lower() == "true"
+    XP_DISPATCH_BATCH_SIZE = int(os.getenv("XP_DISPATCH_BATCH_SIZE", 500))
+    XP_DISPATCH_INTERVAL = float(os.getenv("XP_DISPATCH_INTERVAL", 1))
+    XP_DELIVERY_LEASE = int(os.getenv("XP_DELIVERY_LEASE", 60))
+    XP_RETRY_BACKOFF = float(os.getenv("XP_RETRY_BACKOFF", 1))
+    XP_RETRY_MAX_BACKOFF = float(os.getenv("XP_RETRY_MAX_BACKOFF", 300))
+
+    # Rows fetched per round trip by streamed list responses
+    STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", 500))
+
+    # Per quest and per language submission stats, updated with every
+    # solution (see stats.py, `flask rebuild-stats` recomputes them)
+    STATS_ENABLED = os.getenv("STATS_ENABLED", "true").lower() == "true"
+    # Rows the counters of each quest and language are spread over, so
+    # concurrent submissions of a popular quest or language do not all wait
+    # for the lock of a single row. Reads sum the rows
+    STATS_COUNTER_SHARDS = int(os.getenv("STATS_COUNTER_SHARDS", 8))
+
+    # Quests per transaction of bulk imports (/quests/import, `flask import-quests`)
+    BULK_IMPORT_CHUNK_SIZE = int(os.getenv("BULK_IMPORT_CHUNK_SIZE", 1000))
+
+    # Prometheus metrics at /metrics
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    # Directory where the gunicorn workers share their metrics, so a scrape
+    # answered by any of them returns the totals of all (emptied when the
+    # server starts, gunicorn.conf.py creates a temporary one when unset).
+    # Without it /metrics only shows the process answering it
+    METRICS_MULTIPROCESS_DIR = os.getenv("METRICS_MULTIPROCESS_DIR", "")
+    # Seconds between two writes of the metrics of a worker to that directory
+    METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", 1))
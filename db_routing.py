@@ -0,0 +1,224 @@
+import itertools
+import logging
+import threading
+import time
+from functools import wraps
+from flask import after_this_request, current_app, g, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, text
+
+# Bind keys of the read replicas start with this prefix, see Config.SQLALCHEMY_BINDS
+REPLICA_BIND_PREFIX = "replica_"
+
+# Cookie and header carrying the time of the client's last write (see record_write)
+LAST_WRITE_COOKIE = "sf_last_write"
+LAST_WRITE_HEADER = "X-Last-Write"
+
+
+class ReplicaSet:
+    """Health-aware round robin over the read replica engines.
+
+    A replica is checked with a cheap query at most every
+    ``check_interval`` seconds. It is skipped while the check fails, while
+    its replication lag is above ``max_lag`` seconds (Postgres only), and
+    after a disconnect error, until the next check.
+
+    Args:
+        engines (dict): Replica engines by bind key
+        check_interval (float): Seconds between two health checks of a replica
+        max_lag (float): Max replication lag in seconds, 0 to ignore the lag
+    """
+
+    def __init__(self, engines, check_interval, max_lag):
+        self.engines = engines
+        self.check_interval = check_interval
+        self.max_lag = max_lag
+        self._healthy = {key: False for key in engines}
+        self._checked_at = {key: float("-inf") for key in engines}
+        self._order = itertools.cycle(sorted(engines))
+        self._lock = threading.Lock()
+        for key, engine in engines.items():
+            event.listen(engine, "handle_error", self._on_error(key))
+
+    def _on_error(self, key):
+        def handle_error(context):
+            if context.is_disconnect:
+                self.mark_down(key)
+        return handle_error
+
+    def mark_down(self, key):
+        """Skip a replica until its next health check."""
+        with self._lock:
+            self._healthy[key] = False
+            self._checked_at[key] = time.monotonic()
+        logging.warning("Read replica %s marked as down", key)
+
+    def check(self, key):
+        """Run the health check of a replica.
+
+        Returns:
+            bool: True if the replica is reachable and not lagging too much
+        """
+        engine = self.engines[key]
+        try:
+            with engine.connect() as conn:
+                if engine.dialect.name != 'postgresql' or not self.max_lag:
+                    conn.execute(text("SELECT 1"))
+                    return True
+                lag = float(conn.execute(text(
+                    "SELECT COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)"
+                )).scalar())
+                if lag > self.max_lag:
+                    logging.warning("Read replica %s lags %.1fs behind", key, lag)
+                    return False
+                return True
+        except Exception as e:
+            logging.warning("Health check of read replica %s failed: %s", key, e)
+            return False
+
+    def is_healthy(self, key):
+        with self._lock:
+            due = time.monotonic() - self._checked_at[key] >= self.check_interval
+            if not due:
+                return self._healthy[key]
+            # Other threads keep the previous state while this one checks
+            self._checked_at[key] = time.monotonic()
+        healthy = self.check(key)
+        with self._lock:
+            self._healthy[key] = healthy
+        return healthy
+
+    def choose(self):
+        """Next healthy replica engine, or None if every replica is down."""
+        for _ in range(len(self.engines)):
+            with self._lock:
+                key = next(self._order)
+            if self.is_healthy(key):
+                return self.engines[key]
+        return None
+
+
+_replicas = {}
+_replicas_lock = threading.Lock()
+
+
+def get_replicas(db):
+    """The replica set of the current app, or None without replicas."""
+    app = current_app._get_current_object()
+    if app not in _replicas:
+        with _replicas_lock:
+            if app not in _replicas:
+                engines = {key: engine for key, engine in db.engines.items()
+                           if isinstance(key, str) and key.startswith(REPLICA_BIND_PREFIX)}
+                _replicas[app] = ReplicaSet(
+                    engines,
+                    app.config["REPLICA_CHECK_INTERVAL"],
+                    app.config["REPLICA_MAX_LAG"],
+                ) if engines else None
+    return _replicas[app]
+
+
+def _set_last_write(response):
+    window = current_app.config["REPLICA_READ_YOUR_WRITES_WINDOW"]
+    value = f"{g.db_wrote_at:.3f}"
+    response.set_cookie(LAST_WRITE_COOKIE, value, max_age=window, httponly=True, samesite="Lax")
+    response.headers[LAST_WRITE_HEADER] = value
+    return response
+
+
+def record_write():
+    """Keep the reads of the current client on the primary for a while.
+
+    Called after a commit that wrote something. The response carries the
+    time of the write in the LAST_WRITE_COOKIE cookie and the
+    LAST_WRITE_HEADER header. For REPLICA_READ_YOUR_WRITES_WINDOW seconds,
+    read-only requests sending either of them back use the primary, so they
+    see their own writes despite the replication lag, whatever server
+    process handles them.
+    """
+    if current_app.config["REPLICA_READ_YOUR_WRITES_WINDOW"] <= 0:
+        return
+    if "db_wrote_at" not in g:
+        after_this_request(_set_last_write)
+    g.db_wrote_at = time.time()
+
+
+def wrote_recently():
+    """Whether the client of the current request sent a recent write time."""
+    window = current_app.config["REPLICA_READ_YOUR_WRITES_WINDOW"]
+    value = request.headers.get(LAST_WRITE_HEADER) or request.cookies.get(LAST_WRITE_COOKIE)
+    if window <= 0 or not value:
+        return False
+    try:
+        wrote_at = float(value)
+    except ValueError:
+        return False
+    # Both ways, for the clock skew between servers: a forged value only
+    # sends the client's own reads to the primary, for one window at most
+    return abs(time.time() - wrote_at) < window
+
+
+def read_only(f):
+    """Decorator routing the queries of a read-only view to a read replica.
+
+    Falls back to the primary when no replica is configured or healthy, and
+    for clients that wrote recently (see ``record_write``).
+    """
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        g.db_read_only = True
+        return f(*args, **kwargs)
+    return decorated
+
+
+def replica_engine(db):
+    """Engine the reads of the current request should use, None for the primary."""
+    if not has_request_context() or not g.get("db_read_only"):
+        return None
+    if "db_replica" not in g:
+        replicas = get_replicas(db)
+        if replicas is None or wrote_recently():
+            g.db_replica = None
+        else:
+            g.db_replica = replicas.choose()
+    return g.db_replica
+
+
+def read_engine(db):
+    """Engine for reads outside the session, such as streamed responses."""
+    return replica_engine(db) or db.engine
+
+
+class RoutingSession(Session):
+    """Session sending the reads of read-only views to a read replica.
+
+    Flushes, INSERT/UPDATE/DELETE statements and everything outside a
+    ``read_only`` view go to the primary.
+    """
+
+    def __init__(self, db, **kwargs):
+        super().__init__(db, **kwargs)
+        event.listen(self, "after_flush", self._after_flush)
+        event.listen(self, "do_orm_execute", self._do_orm_execute)
+        event.listen(self, "after_commit", self._after_commit)
+
+    @staticmethod
+    def _after_flush(session, flush_context):
+        session.info["wrote"] = True
+
+    @staticmethod
+    def _do_orm_execute(orm_execute_state):
+        if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+            orm_execute_state.session.info["wrote"] = True
+
+    @staticmethod
+    def _after_commit(session):
+        if session.info.pop("wrote", False) and has_request_context():
+            record_write()
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and not getattr(clause, "is_dml", False):
+            engine = replica_engine(self._db)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
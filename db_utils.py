@@ -0,0 +1,34 @@
+from sqlalchemy import insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from extensions import db
+
+
+def insert_ignore(model, values, index_elements, connection=None):
+    """Insert a row unless one with the same key exists.
+
+    On Postgres and SQLite this is a single INSERT ... ON CONFLICT DO
+    NOTHING, so concurrent inserts of the same key do not fail. Other
+    databases look the key up first.
+
+    Args:
+        model: Model of the table
+        values (dict): Column values of the row
+        index_elements (list): Columns of the primary key or unique constraint
+        connection (Connection): Connection to use instead of the current session's transaction
+
+    Returns:
+        bool: True if the row was inserted
+    """
+    executor = db.session if connection is None else connection
+    dialect = (db.session.get_bind() if connection is None else connection).dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        insert_ = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        return executor.execute(
+            insert_(model).values(**values).on_conflict_do_nothing(index_elements=index_elements)
+        ).rowcount == 1
+    columns = model.__table__.c
+    key = [columns[name] for name in index_elements]
+    if executor.execute(select(*key).where(*[column == values[column.name] for column in key])).first():
+        return False
+    executor.execute(insert(model).values(**values))
+    return True
@@ -0,0 +1,398 @@
+import atexit
+import json
+import logging
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+import requests
+from config import Config
+import http_client
+
+logger = logging.getLogger(__name__)
+
+# Backend factories by name, see EXECUTION_BACKENDS in config.py
+BACKENDS = {}
+
+# Backend instances, created on first use
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+def register_backend(name):
+    """Register a backend factory under ``name``.
+
+    The factory is called once with the config class and returns an object
+    with ``supports(language)`` and ``execute(payload, cancel=None)``.
+    """
+    def decorator(factory):
+        BACKENDS[name] = factory
+        return factory
+    return decorator
+
+
+def get_backend(language):
+    """Get the execution backend configured for a language.
+
+    Languages missing from EXECUTION_BACKENDS, or mapped to a backend that
+    cannot run them, use EXECUTION_DEFAULT_BACKEND.
+
+    Args:
+        language (str): Piston language name of the submission
+
+    Returns:
+        object: The backend instance
+    """
+    name = Config.EXECUTION_BACKENDS.get(language, Config.EXECUTION_DEFAULT_BACKEND)
+    backend = _get_instance(name)
+    if not backend.supports(language):
+        return _get_instance(Config.EXECUTION_DEFAULT_BACKEND)
+    return backend
+
+
+def _get_instance(name):
+    backend = _instances.get(name)
+    if backend is None:
+        with _instances_lock:
+            backend = _instances.get(name)
+            if backend is None:
+                if name not in BACKENDS:
+                    raise ValueError(f"Unknown execution backend: {name}")
+                backend = _instances[name] = BACKENDS[name](Config)
+    return backend
+
+
+def prewarm():
+    """Start the worker pools of the languages mapped to the local backend."""
+    for language, name in Config.EXECUTION_BACKENDS.items():
+        backend = _get_instance(name)
+        if backend.supports(language) and hasattr(backend, "prewarm"):
+            backend.prewarm(language)
+
+
+def execute(payload, cancel=None):
+    """Run a single execution on the backend of its language.
+
+    Args:
+        payload (dict): Piston execute payload
+        cancel (threading.Event): Set when the result is no longer needed
+
+    Returns:
+        dict: ``{"stdout", "stderr", "code"}`` of the run, or ``{"error", "logs"}``
+        when the backend rejected the execution
+    """
+    return get_backend(payload["language"]).execute(payload, cancel)
+
+
+@register_backend("piston")
+class PistonBackend:
+    """Executions sent to the Piston API, every language.
+
+    Piston has no way to abort a run, a cancelled execution completes and
+    its result is discarded by the caller.
+    """
+
+    def __init__(self, config):
+        pass
+
+    def supports(self, language):
+        return True
+
+    def execute(self, payload, cancel=None):
+        exec_url = (os.getenv("PISTON_API_URL") or "") + '/api/v2/execute'
+        try:
+            response = http_client.post(http_client.PISTON, exec_url, json=payload, idempotent=True)
+            body = response.json()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            # Breaker open, timeout, connection error or a body that is not JSON
+            logger.warning("Piston execution failed: %s", e)
+            return {"error": "Execution service unavailable", "logs": {"backend": "piston", "message": str(e)}}
+
+        if not isinstance(body, dict):
+            return {"error": "Unknown error", "logs": body}
+        if response.status_code == 200 and isinstance(body.get('run'), dict):
+            run = body['run']
+            return {"stdout": run.get('stdout', ''), "stderr": run.get('stderr', ''), "code": run.get('code')}
+        return {
+            "error": body.get('message', 'Unknown error'),
+            "logs": body
+        }
+
+
+# Seconds between checks of the cancel event of a local run
+CANCEL_POLL_INTERVAL = 0.02
+
+# Sets the resource limits given as JSON in argv[1], then execs argv[2:]
+LAUNCHER = '''import json, os, resource, sys
+for name, value in json.loads(sys.argv[1]).items():
+    resource.setrlimit(getattr(resource, name), (value, value))
+os.execvp(sys.argv[2], sys.argv[2:])
+'''
+
+# The worker programs block on stdin until they receive a job: a JSON
+# header line with the sizes of the code and stdin that follow, the file
+# name and the args. They run the code as the main program, then exit.
+# The JavaScript worker leaves the job's stdin unread on fd 0, where
+# process.stdin and fs.readFileSync(0) find it (the pipe is closed after it).
+PYTHON_WORKER = '''import io, json, sys
+job = sys.stdin.buffer.readline()
+if not job:
+    sys.exit(0)
+job = json.loads(job)
+code = sys.stdin.buffer.read(job["code_len"]).decode("utf-8")
+sys.stdin = io.TextIOWrapper(io.BytesIO(sys.stdin.buffer.read(job["stdin_len"])), encoding="utf-8")
+sys.argv = [job["file_name"]] + job["args"]
+del io, json, job
+exec(compile(code, sys.argv[0], "exec"), {"__name__": "__main__", "__builtins__": __builtins__})
+'''
+
+JAVASCRIPT_WORKER = '''const fs = require('fs');
+const path = require('path');
+const Module = require('module');
+function read(size) {
+  const buf = Buffer.alloc(size);
+  let offset = 0;
+  while (offset < size) {
+    let n;
+    try { n = fs.readSync(0, buf, offset, size - offset, null); }
+    catch (e) { if (e.code === 'EAGAIN') continue; throw e; }
+    if (n === 0) break;
+    offset += n;
+  }
+  return buf.subarray(0, offset);
+}
+const header = [];
+for (let b = read(1); b.length && b[0] !== 10; b = read(1)) header.push(b[0]);
+if (!header.length) process.exit(0);
+const job = JSON.parse(Buffer.from(header).toString('utf8'));
+const code = read(job.code_len).toString('utf8');
+const filename = path.resolve(job.file_name);
+process.argv = [process.argv[0], filename, ...job.args];
+const m = new Module(filename, null);
+m.filename = filename;
+m.paths = Module._nodeModulePaths(path.dirname(filename));
+require.main = m;
+process.mainModule = m;
+m._compile(code, filename);
+'''
+
+
+class WorkerPool:
+    """Pre-started worker processes of one language.
+
+    Each process runs a single job and exits, so no state leaks between
+    submissions. Up to ``size`` idle processes are kept started so a job
+    does not pay the interpreter start-up; the pool is refilled after
+    each run.
+
+    Args:
+        command (list): Worker command, run through the limits launcher
+        limits (dict): ``resource`` limit names and values of the workers
+        output_limit (int): Max bytes of stdout and stderr
+        size (int): Number of idle workers to keep
+    """
+
+    def __init__(self, command, limits, output_limit, size):
+        self.command = command
+        self.limits = limits
+        self.output_limit = output_limit
+        self.size = size
+        self._idle = deque()
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _spawn(self):
+        workdir = tempfile.mkdtemp(prefix="sf-exec-")
+        stdout = tempfile.TemporaryFile(dir=workdir)
+        stderr = tempfile.TemporaryFile(dir=workdir)
+        env = {
+            "PATH": os.environ.get("PATH", "/usr/bin:/bin"),
+            "HOME": workdir,
+            "TMPDIR": workdir,
+            "LANG": "C.UTF-8",
+            "PYTHONIOENCODING": "utf-8",
+            "PYTHONDONTWRITEBYTECODE": "1",
+        }
+        process = subprocess.Popen(
+            [sys.executable, "-I", "-c", LAUNCHER, json.dumps(self.limits)] + self.command,
+            stdin=subprocess.PIPE, stdout=stdout, stderr=stderr,
+            cwd=workdir, env=env, start_new_session=True,
+        )
+        return process, stdout, stderr, workdir
+
+    def prewarm(self):
+        """Start idle workers until there are ``size`` of them."""
+        with self._lock:
+            while not self._closed and len(self._idle) < self.size:
+                self._idle.append(self._spawn())
+
+    def acquire(self):
+        """Take an idle worker, or start one if none is left."""
+        with self._lock:
+            while self._idle:
+                worker = self._idle.popleft()
+                if worker[0].poll() is None:
+                    return worker
+                self._discard(worker)
+        return self._spawn()
+
+    def _discard(self, worker):
+        process, stdout, stderr, workdir = worker
+        if process.poll() is None:
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            process.wait()
+        if process.stdin:
+            try:
+                process.stdin.close()
+            except OSError:
+                pass
+        stdout.close()
+        stderr.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    def _read(self, file):
+        file.seek(0)
+        return file.read(self.output_limit).decode("utf-8", "replace")
+
+    def run(self, code, stdin, args, file_name, timeout, cancel=None):
+        """Run a job on a worker.
+
+        Args:
+            code (str): Source of the program
+            stdin (str): Standard input of the program
+            args (list): Command line arguments
+            file_name (str): Name of the program file
+            timeout (float): Wall clock limit in seconds
+            cancel (threading.Event): Kills the run when set
+
+        Returns:
+            dict: ``{"stdout", "stderr"}`` of the run and its exit ``code``,
+            None if it was killed
+        """
+        code_bytes = code.encode("utf-8")
+        stdin_bytes = stdin.encode("utf-8")
+        header = json.dumps({
+            "code_len": len(code_bytes),
+            "stdin_len": len(stdin_bytes),
+            "file_name": os.path.basename(file_name) or "main",
+            "args": list(args),
+        }).encode("utf-8")
+
+        worker = self.acquire()
+        process, stdout, stderr, _ = worker
+        try:
+            try:
+                process.stdin.write(header + b"\n" + code_bytes + stdin_bytes)
+                process.stdin.close()
+            except BrokenPipeError:
+                # The worker died while idle (e.g. killed from outside)
+                pass
+            deadline = time.monotonic() + timeout
+            timed_out = cancelled = False
+            while process.poll() is None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or (cancel is not None and cancel.is_set()):
+                    timed_out, cancelled = remaining <= 0, remaining > 0
+                    os.killpg(process.pid, signal.SIGKILL)
+                    process.wait()
+                    break
+                try:
+                    process.wait(timeout=min(remaining, CANCEL_POLL_INTERVAL) if cancel is not None else remaining)
+                except subprocess.TimeoutExpired:
+                    pass
+
+            out, err = self._read(stdout), self._read(stderr)
+            code = None
+            if timed_out:
+                err += "Time limit exceeded"
+            elif cancelled:
+                err += "Cancelled"
+            elif process.returncode < 0:
+                err += f"Killed by {signal.Signals(-process.returncode).name}"
+            else:
+                code = process.returncode
+            return {"stdout": out, "stderr": err, "code": code}
+        finally:
+            self._discard(worker)
+            # Replace the worker once the run is over, its start-up does
+            # not compete with the run for the CPU
+            self.prewarm()
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            while self._idle:
+                self._discard(self._idle.popleft())
+
+
+@register_backend("local")
+class LocalBackend:
+    """Executions in resource-limited subprocesses of this host.
+
+    Supports Python and JavaScript (Node.js). Every run gets a fresh
+    worker process from a pre-started pool, its own temporary directory,
+    a minimal environment and limits on CPU time, memory, file size and
+    open files. This bounds resource usage but is not an isolation
+    boundary: enable it only where the app runs in a dedicated, locked
+    down container or VM.
+    """
+
+    def __init__(self, config):
+        self.pool_size = config.LOCAL_EXEC_POOL_SIZE
+        self.output_limit = config.LOCAL_EXEC_OUTPUT_LIMIT
+        memory = config.LOCAL_EXEC_MEMORY_LIMIT * 1024 * 1024
+        limits = {
+            "RLIMIT_CPU": config.LOCAL_EXEC_CPU_LIMIT,
+            "RLIMIT_FSIZE": self.output_limit,
+            "RLIMIT_NOFILE": 256,
+            "RLIMIT_CORE": 0,
+        }
+        commands = {
+            # The address space limit breaks the V8 heap reservations, node
+            # gets a heap limit instead
+            "python": ([config.LOCAL_EXEC_PYTHON, "-I", "-c", PYTHON_WORKER], {"RLIMIT_AS": memory}),
+            "javascript": (
+                [config.LOCAL_EXEC_NODE, f"--max-old-space-size={config.LOCAL_EXEC_MEMORY_LIMIT}",
+                 "-e", JAVASCRIPT_WORKER],
+                {},
+            ),
+        }
+        self.pools = {
+            language: WorkerPool(command, {**limits, **extra}, self.output_limit, self.pool_size)
+            for language, (command, extra) in commands.items()
+        }
+        self.aliases = {"python3": "python", "js": "javascript", "node": "javascript"}
+        atexit.register(self.close)
+
+    def supports(self, language):
+        return self.aliases.get(language, language) in self.pools
+
+    def prewarm(self, language):
+        self.pools[self.aliases.get(language, language)].prewarm()
+
+    def execute(self, payload, cancel=None):
+        pool = self.pools[self.aliases.get(payload["language"], payload["language"])]
+        try:
+            return pool.run(
+                payload["files"][0]["content"],
+                payload.get("stdin", ""),
+                payload.get("args", []),
+                payload["files"][0].get("name", "main"),
+                payload.get("run_timeout", 2000) / 1000,
+                cancel,
+            )
+        except OSError as e:
+            logger.exception("Local execution failed")
+            return {"error": str(e), "logs": {"backend": "local", "message": str(e)}}
+
+    def close(self):
+        for pool in self.pools.values():
+            pool.close()
@@ -1,8 +1,10 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_jwt_extended import JWTManager
 from flask_migrate import Migrate
+from db_routing import RoutingSession
 
 
-db = SQLAlchemy()
+# Reads of read_only views go to a replica, see db_routing
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 jwt = JWTManager()
 migrate = Migrate()
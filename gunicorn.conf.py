@@ -0,0 +1,72 @@
+"""Gunicorn settings of the production server.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Workers are gevent workers: outbound HTTP (Piston, auth, users, admin),
+database queries and subprocesses yield to other requests instead of
+blocking a thread, so a process holds up to SERVER_WORKER_CONNECTIONS
+requests in flight. Sizing comes from config.py (SERVER_*, DB_* and
+HTTP_POOL_MAXSIZE). Apply the migrations (``flask db upgrade``) before
+starting the server, the app does not create tables.
+
+Workers write their metrics to METRICS_MULTIPROCESS_DIR and /metrics
+returns the totals of all of them, whichever worker answers the scrape.
+"""
+import os
+import shutil
+import tempfile
+
+# Created here when unset, before the config is read
+_metrics_tempdir = None
+if not os.getenv("METRICS_MULTIPROCESS_DIR"):
+    _metrics_tempdir = os.environ["METRICS_MULTIPROCESS_DIR"] = tempfile.mkdtemp(prefix="sf-metrics-")
+
+from config import Config  # noqa: E402
+
+bind = Config.SERVER_BIND
+workers = Config.SERVER_WORKERS
+worker_class = "gevent"
+worker_connections = Config.SERVER_WORKER_CONNECTIONS
+timeout = Config.SERVER_TIMEOUT
+graceful_timeout = Config.SERVER_TIMEOUT
+keepalive = 5
+accesslog = "-"
+
+
+def on_starting(server):
+    if Config.METRICS_ENABLED:
+        import metrics
+        metrics.prepare_multiprocess_dir(Config.METRICS_MULTIPROCESS_DIR)
+
+
+def on_exit(server):
+    if _metrics_tempdir:
+        shutil.rmtree(_metrics_tempdir, ignore_errors=True)
+
+
+def post_fork(server, worker):
+    # psycopg2 is a C extension gevent cannot patch: make it wait for the
+    # database through the gevent hub
+    from psycogreen.gevent import patch_psycopg
+    patch_psycopg()
+
+
+def post_worker_init(worker):
+    # Judge workers, XP dispatcher and execution pools run in the serving
+    # processes only, not in every process that creates the app
+    from app import start_background_services
+    start_background_services(worker.wsgi)
+
+
+def worker_exit(server, worker):
+    # Last write of the metrics of the exiting worker
+    if Config.METRICS_ENABLED:
+        import metrics
+        metrics.flush()
+
+
+def child_exit(server, worker):
+    # Its counters stay in the totals, its gauges are gone with it
+    if Config.METRICS_ENABLED:
+        import metrics
+        metrics.mark_process_dead(Config.METRICS_MULTIPROCESS_DIR, worker.pid)
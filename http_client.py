@@ -0,0 +1,205 @@
+import logging
+import random
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from config import Config
+import metrics
+
+# Upstream services this app talks to
+PISTON = 'piston'
+AUTH = 'auth'
+USERS = 'users'
+ADMIN = 'admin'
+
+# Status codes worth retrying for idempotent calls
+RETRY_STATUSES = (502, 503, 504)
+
+_sessions = {}
+_breakers = {}
+_lock = threading.Lock()
+
+
+class UpstreamUnavailable(requests.exceptions.ConnectionError):
+    """Raised when the circuit breaker of an upstream is open."""
+
+
+class CircuitBreaker:
+    """Simple consecutive-failure circuit breaker.
+
+    After ``failure_threshold`` consecutive failures the breaker opens and
+    every call fails fast for ``reset_timeout`` seconds. After that a single
+    trial call is let through (half-open); its outcome closes or re-opens
+    the breaker.
+
+    Args:
+        failure_threshold (int): Consecutive failures before opening
+        reset_timeout (float): Seconds to stay open before a trial call
+    """
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow_request(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_timeout or self.trial_in_flight:
+                return False
+            self.trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+    def release_trial(self):
+        """End a trial call without an outcome, the next call becomes the trial."""
+        with self._lock:
+            self.trial_in_flight = False
+
+
+def get_session(upstream):
+    """Get the shared keep-alive session of an upstream.
+
+    Args:
+        upstream (str): Upstream name
+
+    Returns:
+        requests.Session: Session with a connection pool dedicated to the upstream
+    """
+    session = _sessions.get(upstream)
+    if session is None:
+        with _lock:
+            session = _sessions.get(upstream)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=Config.HTTP_POOL_MAXSIZE, max_retries=0)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                _sessions[upstream] = session
+    return session
+
+
+def get_breaker(upstream):
+    """Get the circuit breaker of an upstream.
+
+    Args:
+        upstream (str): Upstream name
+
+    Returns:
+        CircuitBreaker: Breaker shared by all calls to the upstream
+    """
+    breaker = _breakers.get(upstream)
+    if breaker is None:
+        with _lock:
+            breaker = _breakers.setdefault(
+                upstream,
+                CircuitBreaker(Config.HTTP_BREAKER_FAILURE_THRESHOLD, Config.HTTP_BREAKER_RESET_TIMEOUT)
+            )
+    return breaker
+
+
+def request(upstream, method, url, idempotent=None, timeout=None, **kwargs):
+    """Send a request to an upstream service through its pooled session.
+
+    Idempotent calls are retried with exponential backoff on connection
+    errors and 502/503/504 responses. Read timeouts are never retried so a
+    slow upstream fails fast instead of piling up blocked workers.
+
+    Args:
+        upstream (str): Upstream name (piston, auth, users or admin)
+        method (str): HTTP method
+        url (str): Absolute URL
+        idempotent (bool): Whether the call may be retried. Defaults to True for GET/HEAD/OPTIONS
+        timeout (tuple): (connect, read) timeout override
+        **kwargs: Passed through to requests
+
+    Returns:
+        requests.Response: Response of the upstream
+
+    Raises:
+        UpstreamUnavailable: If the circuit breaker of the upstream is open
+        requests.exceptions.RequestException: If the call failed
+    """
+    method = method.upper()
+    if idempotent is None:
+        idempotent = method in ('GET', 'HEAD', 'OPTIONS')
+    if timeout is None:
+        timeout = (Config.HTTP_CONNECT_TIMEOUT, Config.HTTP_READ_TIMEOUTS.get(upstream, Config.HTTP_READ_TIMEOUT))
+
+    session = get_session(upstream)
+    breaker = get_breaker(upstream)
+    attempts = 1 + (Config.HTTP_MAX_RETRIES if idempotent else 0)
+
+    for attempt in range(attempts):
+        if not breaker.allow_request():
+            metrics.upstream_errors.inc(upstream, "circuit_open")
+            raise UpstreamUnavailable(f"Circuit breaker for '{upstream}' is open")
+
+        last_attempt = attempt == attempts - 1
+        started = time.perf_counter()
+        try:
+            response = session.request(method, url, timeout=timeout, **kwargs)
+        except requests.exceptions.ReadTimeout:
+            metrics.upstream_request_duration.observe(time.perf_counter() - started, upstream, method)
+            metrics.upstream_errors.inc(upstream, "timeout")
+            breaker.record_failure()
+            raise
+        except requests.exceptions.ConnectionError:
+            metrics.upstream_request_duration.observe(time.perf_counter() - started, upstream, method)
+            metrics.upstream_errors.inc(upstream, "connection")
+            breaker.record_failure()
+            if last_attempt:
+                raise
+        except requests.exceptions.RequestException:
+            # Invalid URL, broken response body...: never retried
+            metrics.upstream_request_duration.observe(time.perf_counter() - started, upstream, method)
+            metrics.upstream_errors.inc(upstream, "request")
+            breaker.record_failure()
+            raise
+        except BaseException:
+            # Not an upstream failure (e.g. a greenlet timeout), but a
+            # half-open trial must not stay in flight forever
+            breaker.release_trial()
+            raise
+        else:
+            metrics.upstream_request_duration.observe(time.perf_counter() - started, upstream, method)
+            if response.status_code < 500:
+                breaker.record_success()
+                return response
+            metrics.upstream_errors.inc(upstream, f"http_{response.status_code}")
+            breaker.record_failure()
+            if last_attempt or response.status_code not in RETRY_STATUSES:
+                return response
+
+        delay = Config.HTTP_RETRY_BACKOFF * (2 ** attempt)
+        logging.warning("Retrying %s %s (%s) in %.2fs", method, url, upstream, delay)
+        time.sleep(delay + random.uniform(0, delay))
+
+
+def get(upstream, url, **kwargs):
+    return request(upstream, 'GET', url, **kwargs)
+
+
+def post(upstream, url, **kwargs):
+    return request(upstream, 'POST', url, **kwargs)
+
+
+def put(upstream, url, **kwargs):
+    return request(upstream, 'PUT', url, **kwargs)
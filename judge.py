@@ -0,0 +1,546 @@
+import threading
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy.exc import IntegrityError
+from extensions import db
+from models import QuestSolution
+from quest_tests import judged_test_cases
+from xp_outbox import add_xp_grant, notify_dispatcher
+from solve_counter import record_solve
+from stats import record_solution
+from code_store import store_code
+import execution_backends
+import judge_cache
+import judge_harness
+import metrics
+
+# Judge modes, see judge_submission
+JUDGE_MODES = ('full', 'fail_fast', 'sample')
+
+
+def format_test_input(language, test_input):
+    """Turn a stored test input into the stdin and args passed to the program.
+
+    JavaScript quests receive the whole input as a single argument, every
+    other language reads one value per line from stdin.
+
+    Args:
+        language (str): Programming language of the submission
+        test_input (str): Comma separated test input as stored on the quest
+
+    Returns:
+        tuple: (stdin, args) for the execution
+    """
+    input_values = [x for x in test_input.split(', ') if x.strip()]
+
+    if language != 'javascript':
+        return "\n".join(input_values), []
+    return "", [", ".join(input_values)]
+
+
+def build_execution_payload(language, code, file_name, test_input, execution_id):
+    """Build the Piston execute payload for a single test case.
+
+    Args:
+        language (str): Programming language of the submission
+        code (str): Submitted source code
+        file_name (str): Name of the source file sent to Piston
+        test_input (str): Comma separated test input as stored on the quest
+        execution_id (str): UUID of the current submission
+
+    Returns:
+        dict: Payload for the Piston /api/v2/execute endpoint
+    """
+    stdin, args = format_test_input(language, test_input)
+    payload = {
+        "language": language,
+        "version": "*",
+        "files": [
+            {
+                "name": file_name,
+                "content": code
+            }
+        ],
+        "stdin": stdin,
+        "args": args,
+        "compile_timeout": 5000,
+        "run_timeout": 2000,
+        "compile_memory_limit": -1,
+        "run_memory_limit": -1
+    }
+    if language == 'javascript':
+        payload["execution_id"] = execution_id
+    return payload
+
+
+def execute_test(payload, cancel=None):
+    """Run a single execution on the backend configured for its language.
+
+    Args:
+        payload (dict): Piston execute payload
+        cancel (threading.Event): Set when the result is no longer needed
+
+    Returns:
+        dict: ``{"stdout", "stderr", "code"}`` of the run, or ``{"error", "logs"}``
+        when the backend rejected the execution
+    """
+    return execution_backends.execute(payload, cancel)
+
+
+def run_test_cases(payloads, max_concurrency=1, on_result=None, stop=None):
+    """Execute the test cases of a submission, optionally in parallel.
+
+    At most ``max_concurrency`` executions are in flight at the same time.
+    The results are always returned in the order of ``payloads`` so the
+    caller can process them exactly as if they were executed one by one.
+
+    With ``stop``, the first test runs alone and every completed test allows
+    one more parallel execution (doubling per round trip, like TCP slow
+    start), so a submission failing early costs few executions. Once
+    ``stop`` returns True no more tests are started and the running ones
+    are cancelled.
+
+    Args:
+        payloads (list): Piston execute payloads, one per test case
+        max_concurrency (int): Upper bound of parallel Piston executions
+        on_result (callable): Called with ``(index, result)`` in completion order
+        stop (callable): Called with ``(index, result)`` after ``on_result``,
+            returns True to skip the remaining tests
+
+    Returns:
+        list: Results of ``execute_test`` in the same order as ``payloads``,
+        None for the tests skipped after ``stop``
+    """
+    results = [None] * len(payloads)
+    workers = max(1, min(max_concurrency, len(payloads)))
+    if workers == 1:
+        for i, payload in enumerate(payloads):
+            results[i] = execute_test(payload)
+            if on_result is not None:
+                on_result(i, results[i])
+            if stop is not None and stop(i, results[i]):
+                break
+        return results
+
+    cancel = threading.Event()
+    window = 1 if stop is not None else workers
+    running = {}
+    next_index = 0
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='judge')
+    try:
+        while next_index < len(payloads) or running:
+            while next_index < len(payloads) and len(running) < window:
+                running[executor.submit(execute_test, payloads[next_index], cancel)] = next_index
+                next_index += 1
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                i = running.pop(future)
+                results[i] = future.result()
+                if on_result is not None:
+                    on_result(i, results[i])
+                if stop is not None and stop(i, results[i]):
+                    cancel.set()
+                    return results
+                window = min(workers, window + 1)
+        return results
+    finally:
+        # Do not wait for cancelled executions, their results are discarded
+        executor.shutdown(wait=not cancel.is_set(), cancel_futures=True)
+
+
+def run_batched(language, code, file_name, test_inputs, execution_id):
+    """Execute all test cases of a submission in a single Piston invocation.
+
+    The code is wrapped in the harness registered for the language, which
+    runs it once per input and reports every run in a delimited frame.
+
+    Args:
+        language (str): Programming language of the submission
+        code (str): Submitted source code
+        file_name (str): Name of the source file sent to Piston
+        test_inputs (list): Stored test inputs
+        execution_id (str): UUID of the current submission
+
+    Returns:
+        list: One result per test input like ``execute_test``. Entries are
+        None for tests the harness did not report, and all of them when the
+        batch timed out, exited with an error or was rejected by Piston
+    """
+    harness = judge_harness.get_harness(language)
+    tests = [format_test_input(language, test_input) for test_input in test_inputs]
+    marker = judge_harness.make_marker()
+    source = harness.build(code, tests)
+
+    payload = build_execution_payload(language, source, file_name, "", execution_id)
+    payload["stdin"] = marker + "\n"
+    payload["args"] = []
+    payload["run_timeout"] = harness.run_timeout(len(tests))
+
+    result = execute_test(payload)
+    if "error" in result or result.get("code") != 0:
+        # The harness was rejected, killed or crashed: its frames cannot be
+        # trusted, let the caller fall back to per-test executions
+        return [None] * len(tests)
+    return judge_harness.split_output(result["stdout"], marker, len(tests))
+
+
+def execute_submission(language, code, file_name, test_inputs, execution_id, mode='per_test', max_concurrency=1, on_result=None, stop=None):
+    """Execute a submission against its test inputs.
+
+    In "batched" mode languages with a registered harness run all tests in
+    one Piston invocation; tests missing from the batched output are
+    re-executed one by one. Every other case uses per-test executions.
+
+    Args:
+        language (str): Programming language of the submission
+        code (str): Submitted source code
+        file_name (str): Name of the source file sent to Piston
+        test_inputs (list): Stored test inputs, in test order
+        execution_id (str): UUID of the current submission
+        mode (str): "per_test" or "batched"
+        max_concurrency (int): Upper bound of parallel per-test executions
+        on_result (callable): Called with ``(index, result)`` as each test completes
+        stop (callable): Called with ``(index, result)``, returns True to skip
+            the remaining per-test executions (see ``run_test_cases``)
+
+    Returns:
+        list: Results of ``execute_test`` in test order, None for skipped tests
+    """
+    results = [None] * len(test_inputs)
+    if mode == 'batched' and len(test_inputs) > 1 and judge_harness.get_harness(language):
+        results = run_batched(language, code, file_name, test_inputs, execution_id)
+        for i, result in enumerate(results):
+            if result is not None:
+                if on_result is not None:
+                    on_result(i, result)
+                if stop is not None and stop(i, result):
+                    # Do not re-execute the tests missing from the batch
+                    return results
+
+    pending = [i for i, result in enumerate(results) if result is None]
+    if pending:
+        payloads = [
+            build_execution_payload(language, code, file_name, test_inputs[i], execution_id)
+            for i in pending
+        ]
+
+        def report(index, result):
+            if on_result is not None:
+                on_result(pending[index], result)
+
+        def stop_pending(index, result):
+            return stop(pending[index], result)
+
+        for i, result in zip(pending, run_test_cases(payloads, max_concurrency, report,
+                                                     stop_pending if stop is not None else None)):
+            results[i] = result
+    return results
+
+
+def select_test_cases(judged_tests, mode):
+    """Test cases run by a judge mode.
+
+    Args:
+        judged_tests (list): ``QuestTestCase`` objects judged for the quest
+        mode (str): One of ``JUDGE_MODES``
+
+    Returns:
+        list: The sample tests (at least the null test) in "sample" mode,
+        every judged test otherwise
+    """
+    if mode == 'sample':
+        return [test_case for test_case in judged_tests if test_case.is_sample] or judged_tests[:1]
+    return judged_tests
+
+
+def solution_recorded(execution_id):
+    """Whether the solution of an execution is already stored."""
+    return db.session.query(QuestSolution.id).filter_by(execution_id=execution_id).first() is not None
+
+
+def judge_submission(quest, code, language, user_id, execution_id, on_progress=None, mode='full'):
+    """Run a submission against the tests of a quest and store the outcome.
+
+    Updates the solved counter and the user XP on a correct solution and
+    records the attempt as a ``QuestSolution``.
+
+    The judge mode decides which tests run and the possible verdicts:
+
+    - "full": every test runs. Verdict "accepted", "partial" or "wrong_answer".
+    - "fail_fast": no test starts after the first failed one (wrong output
+      or runtime error) and the running ones are cancelled. The tests that
+      did not run are counted as skipped. Verdict "accepted" or "wrong_answer".
+    - "sample": only the sample tests run, for quick feedback. Verdict
+      "sample_passed" or "sample_failed"; the quest is never solved by it.
+
+    Args:
+        quest (Quest): The quest being solved
+        code (str): Submitted source code
+        language (str): Programming language of the submission
+        user_id (str): UUID of the submitting user
+        execution_id (str): UUID of the execution
+        on_progress (callable): Called with ``(test number, passed)`` as each test completes
+        mode (str): One of ``JUDGE_MODES``
+
+    Returns:
+        tuple: (response body, HTTP status code)
+    """
+    quest_id = quest.id
+    quest_xp = quest.xp
+
+    # Hold all the results of the tests
+    all_results = {}
+    successful_tests = 0
+    unsuccessful_tests = 0
+    skipped_tests = 0
+    first_failed_test = None
+    grant_xp = False
+    zero_tests = [] # Hold the first example test input and putput
+    zero_tests_outputs = [] # Hold the first example after executing the user code (stdout & stderr)
+    
+    # Load the test cases of the quest, stopping at the first empty one
+    all_tests = judged_test_cases(quest)
+    judged_tests = select_test_cases(all_tests, mode)
+    test_cases = [(test_case.input, test_case.output) for test_case in judged_tests]
+    weights = [test_case.weight for test_case in judged_tests]
+    passed_weight = 0
+    total_weight = sum(weights)
+
+    def test_passed(index, result):
+        return "error" not in result and str(result['stdout'].strip()) == str(test_cases[index][1])
+
+    def report_progress(index, result):
+        # Report whether a single test passed as soon as it finished
+        if on_progress is not None:
+            on_progress(index + 1, test_passed(index, result))
+
+    def failed(index, result):
+        return not test_passed(index, result)
+
+    # Reuse the results of a byte-identical earlier submission if possible.
+    # Only complete runs of every test are cached, they serve all modes.
+    cache_key = None
+    results = None
+    if current_app.config["JUDGE_CACHE_ENABLED"]:
+        cache_key = judge_cache.make_key(quest, language, code)
+        results = judge_cache.get(cache_key)
+        if results is not None:
+            if mode == 'sample':
+                results = [results[all_tests.index(test_case)] for test_case in judged_tests]
+            for i, result in enumerate(results):
+                report_progress(i, result)
+
+    # Send the code to the Piston API for execution, either one call per test
+    # (up to JUDGE_MAX_CONCURRENCY at the same time) or one batched call
+    if results is None:
+        # End the read transaction so the pooled connection is not held
+        # while the code runs
+        db.session.commit()
+        results = execute_submission(
+            language,
+            code,
+            f"{user_id}_{quest_id}.{language}",
+            [input_attr for input_attr, _ in test_cases],
+            execution_id,
+            mode=current_app.config["JUDGE_EXECUTION_MODE"],
+            max_concurrency=current_app.config["JUDGE_MAX_CONCURRENCY"],
+            on_result=report_progress,
+            stop=failed if mode == 'fail_fast' else None,
+        )
+        metrics.judge_tests_executed.inc(language, amount=sum(1 for result in results if result is not None))
+        if cache_key and mode != 'sample' and all(result is not None and "error" not in result for result in results):
+            judge_cache.put(cache_key, quest_id, results)
+
+    for i, ((input_attr, output_attr), result) in enumerate(zip(test_cases, results)):
+        # Tests skipped by the fail-fast mode
+        if result is None:
+            skipped_tests += 1
+
+        # Check if the execution is successful and process the results
+        elif "error" not in result:
+            current_output = result['stdout'].strip()
+            current_error = result['stderr'].strip()
+        
+            if str(current_output) == str(output_attr):
+                successful_tests += 1
+                passed_weight += weights[i]
+            else:
+                unsuccessful_tests += 1
+                if first_failed_test is None:
+                    first_failed_test = i + 1
+            
+            if i == 0:
+                zero_tests.append(input_attr)
+                zero_tests.append(output_attr)
+                zero_tests_outputs.append(current_output)
+                zero_tests_outputs.append(current_error)
+            
+            all_results.update({f"Test {i+1}": {"input": input_attr, 
+                                                "output": current_output, 
+                                                "expected_output": output_attr, 
+                                                "error": current_error}})
+
+        # If the execution is not successful, handle the error    
+        else:
+            message = result['error']
+            logs_message = result['logs']
+            successful_tests = 0
+            unsuccessful_tests = i
+            zero_tests.append("")
+            zero_tests.append("")
+            zero_tests_outputs.append("")
+            zero_tests_outputs.append("")
+            metrics.submissions.inc(language, "error")
+            return {
+                "error": f"Execution failed: {message}",
+                "logs": logs_message
+            }, 500
+
+
+    # Check if there are any successful or unsuccessful tests
+    if mode == 'sample':
+        if not unsuccessful_tests:
+            message = 'Sample tests passed! Submit your solution to run all the tests.'
+            verdict = 'sample_passed'
+        else:
+            message = 'Your solution fails the sample tests! Try again!'
+            verdict = 'sample_failed'
+    elif not unsuccessful_tests and not skipped_tests:
+        message = 'Congratulations! Your solution is correct!'
+        verdict = 'accepted'
+        
+        # Grant XP if not already solved
+        # Check if the user has already solved this quest
+        existing_solution = db.session.query(QuestSolution).filter_by(
+            quest_id=quest_id,
+            user_id=user_id
+        ).first()
+        # Only grant XP if the quest was not solved before
+        grant_xp = existing_solution is None or not existing_solution.is_solved
+    elif successful_tests and unsuccessful_tests and mode == 'full':
+        message = 'Your solution is partially correct! Try again!'
+        verdict = 'partial'
+    else:
+        message = 'Your solution is incorrect! Try again!'
+        verdict = 'wrong_answer'
+
+    # Store the solution in the database, with the solved counter, the stats
+    # and the XP grant in the same transaction. A job requeued after its
+    # worker died may have been stored already: it is not counted twice.
+    try:
+        if solution_recorded(execution_id):
+            grant_xp = False
+        else:
+            if verdict == 'accepted':
+                record_solve(quest_id)
+            new_solution = QuestSolution(
+                quest_id=quest_id,
+                user_id=user_id,
+                code_hash=store_code(code),
+                language=language,
+                tests_passed=successful_tests,
+                tests_failed=unsuccessful_tests,
+                is_solved=(verdict == 'accepted'),
+                tests_skipped=skipped_tests,
+                mode=mode,
+                verdict=verdict,
+                execution_id=execution_id,
+            )
+            db.session.add(new_solution)
+            record_solution(new_solution)
+            # The XP grant is committed with the solution and delivered by the XP dispatcher
+            if grant_xp:
+                add_xp_grant(user_id, quest_id, quest_xp)
+        db.session.commit()
+    except IntegrityError:
+        # Stored meanwhile by another run of the same job
+        db.session.rollback()
+        if not solution_recorded(execution_id):
+            return {"error": "Failed to store solution in the database"}, 500
+        grant_xp = False
+    except Exception as e:
+        db.session.rollback()
+        return {"error": "Failed to store solution in the database"}, 500
+    if grant_xp:
+        notify_dispatcher()
+    
+    metrics.submissions.inc(language, verdict)
+
+    # Return the results of the submission
+    return {
+        "execution_id": execution_id,
+        "quest_id": quest_id,
+        "user_id": user_id,
+        "mode": mode,
+        "verdict": verdict,
+        "successful_tests": successful_tests,
+        "unsuccessful_tests": unsuccessful_tests,
+        "skipped_tests": skipped_tests,
+        "first_failed_test": first_failed_test,
+        "score": round(passed_weight / total_weight, 4) if total_weight else 0,
+        "message": message,
+        "zero_tests": zero_tests[0] if zero_tests else "",
+        "zero_tests_outputs": zero_tests_outputs[0] if zero_tests_outputs else "",
+    }, 200
+
+
+# Programs of check-execution by language: file name, a program echoing its
+# stdin and one printing its test input (see format_test_input)
+EXECUTION_CHECKS = {
+    "python": ("main.py", "import sys\nsys.stdout.write(sys.stdin.read())", "print(input())"),
+    "javascript": ("main.js", "process.stdout.write(require('fs').readFileSync(0, 'utf8'))",
+                   "process.stdout.write(process.argv[2] + '\\n')"),
+}
+
+
+def check_execution(language):
+    """Run the EXECUTION_CHECKS programs of a language on its backend.
+
+    Args:
+        language (str): Key of EXECUTION_CHECKS
+
+    Returns:
+        list: Problems found, empty if stdin and batched runs work
+    """
+    file_name, echo_code, batch_code = EXECUTION_CHECKS[language]
+    problems = []
+
+    payload = build_execution_payload(language, echo_code, file_name, "", str(uuid.uuid4()))
+    payload["stdin"] = "sf-check\n"
+    result = execute_test(payload)
+    if result.get("stdout") != "sf-check\n":
+        problems.append(f"the program did not get its stdin: {result}")
+
+    if judge_harness.get_harness(language):
+        test_inputs = ["1", "2"]
+        results = run_batched(language, batch_code, file_name, test_inputs, str(uuid.uuid4()))
+        if [result and result["stdout"] for result in results] != [f"{value}\n" for value in test_inputs]:
+            problems.append(f"the batched run was discarded or wrong: {results}")
+    return problems
+
+
+@click.command('check-execution')
+@click.argument('languages', nargs=-1)
+@with_appcontext
+def check_execution_command(languages):
+    """Check that the execution backends pass stdin and batched runs through.
+
+    Runs small programs of each language (every one of EXECUTION_CHECKS by
+    default) on the backend configured for it.
+    """
+    failed = False
+    for language in languages or EXECUTION_CHECKS:
+        if language not in EXECUTION_CHECKS:
+            raise click.BadParameter(f"no check for {language}", param_hint="LANGUAGES")
+        problems = check_execution(language)
+        for problem in problems:
+            click.echo(f"{language}: {problem}", err=True)
+        if problems:
+            failed = True
+        else:
+            click.echo(f"{language}: ok")
+    if failed:
+        raise click.ClickException("Execution checks failed")
@@ -0,0 +1,123 @@
+import hashlib
+import json
+import logging
+import threading
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import delete, select
+from extensions import db
+from db_utils import insert_ignore
+from models import JudgeResult
+from cache_utils import LRUCache
+import metrics
+
+_local = None
+_lock = threading.Lock()
+_puts = 0
+
+# Expired rows of the shared store are pruned every PRUNE_EVERY writes
+PRUNE_EVERY = 100
+
+
+def _local_cache():
+    global _local
+    if _local is None:
+        with _lock:
+            if _local is None:
+                _local = LRUCache(current_app.config["JUDGE_CACHE_SIZE"])
+    return _local
+
+
+def make_key(quest, language, code):
+    """Content address of a submission.
+
+    The quest version is part of the key, so editing a quest makes all of
+    its previous results unreachable.
+
+    Args:
+        quest (Quest): The quest being solved
+        language (str): Programming language of the submission
+        code (str): Submitted source code
+
+    Returns:
+        str: SHA-256 hex digest
+    """
+    last_modified = quest.last_modified.isoformat() if quest.last_modified else None
+    raw = json.dumps([quest.id, last_modified, language, code])
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def get(key):
+    """Get the cached per-test results of a submission.
+
+    Looks up the in-process LRU first and then the shared store, if enabled.
+
+    Args:
+        key (str): Key from ``make_key``
+
+    Returns:
+        list: Per-test ``{"stdout", "stderr"}`` results, or None on a miss
+    """
+    entry = _local_cache().get(key)
+    if entry is not None:
+        metrics.judge_cache_lookups.inc("hit")
+        return entry[1]
+
+    if current_app.config["JUDGE_CACHE_SHARED"]:
+        cutoff = datetime.now() - timedelta(seconds=current_app.config["JUDGE_CACHE_SHARED_TTL"])
+        try:
+            with db.engine.connect() as conn:
+                row = conn.execute(
+                    select(JudgeResult.quest_id, JudgeResult.results)
+                    .where(JudgeResult.key == key, JudgeResult.date_added >= cutoff)
+                ).first()
+        except Exception as e:
+            logging.error("Error reading the shared judge cache: %s", e, exc_info=True)
+            row = None
+        if row is not None:
+            metrics.judge_cache_lookups.inc("shared_hit")
+            _local_cache().set(key, (row.quest_id, row.results))
+            return row.results
+
+    metrics.judge_cache_lookups.inc("miss")
+    return None
+
+
+def put(key, quest_id, results):
+    """Store the per-test results of a submission.
+
+    Args:
+        key (str): Key from ``make_key``
+        quest_id (str): The ID of the quest, used for invalidation
+        results (list): Per-test ``{"stdout", "stderr"}`` results
+    """
+    global _puts
+    _local_cache().set(key, (quest_id, results))
+
+    if not current_app.config["JUDGE_CACHE_SHARED"]:
+        return
+
+    try:
+        with db.engine.begin() as conn:
+            insert_ignore(JudgeResult, dict(key=key, quest_id=quest_id, results=results, date_added=datetime.now()),
+                          ['key'], connection=conn)
+            with _lock:
+                _puts += 1
+                prune = _puts % PRUNE_EVERY == 0
+            if prune:
+                cutoff = datetime.now() - timedelta(seconds=current_app.config["JUDGE_CACHE_SHARED_TTL"])
+                conn.execute(delete(JudgeResult).where(JudgeResult.date_added < cutoff))
+    except Exception as e:
+        logging.error("Error writing the shared judge cache: %s", e, exc_info=True)
+
+
+def invalidate_quest(quest_id):
+    """Drop every cached result of a quest, e.g. after its tests changed.
+
+    Args:
+        quest_id (str): The ID of the quest
+    """
+    _local_cache().discard_where(lambda entry: entry[0] == quest_id)
+
+    if current_app.config["JUDGE_CACHE_SHARED"]:
+        db.session.execute(delete(JudgeResult).where(JudgeResult.quest_id == quest_id))
@@ -0,0 +1,170 @@
+import json
+import secrets
+from string import Template
+from config import Config
+
+# Registered harnesses by Piston language name. A harness must run the user
+# code in a child process: code sharing the harness process (e.g. C++ global
+# constructors compiled into it) could read the marker and forge frames.
+HARNESSES = {}
+
+
+class Harness:
+    """Language specific wrapper that runs submitted code once per test input.
+
+    The generated program reads the frame marker from the first line of its
+    stdin, so the marker is not in any file the user code can read, then
+    writes one line per test to stdout, in test order::
+
+        <marker> <test index> <hex encoded stdout> <hex encoded stderr>
+
+    Hex encoding keeps the frames intact whatever the user code prints.
+
+    Args:
+        template (str): ``string.Template`` source of the harness program
+        encode_code (callable): Turns the user code into a literal of the harness language
+        encode_tests (callable): Turns the ``(stdin, args)`` tests into a literal of the harness language
+    """
+
+    def __init__(self, template, encode_code, encode_tests):
+        self.template = Template(template)
+        self.encode_code = encode_code
+        self.encode_tests = encode_tests
+
+    def build(self, code, tests):
+        """Build the harness program for a submission.
+
+        Args:
+            code (str): Submitted source code
+            tests (list): ``(stdin, args)`` tuples, one per test
+
+        Returns:
+            str: Source of the harness program
+        """
+        return self.template.substitute(
+            code=self.encode_code(code),
+            tests=self.encode_tests(tests),
+            count=len(tests),
+            timeout=Config.JUDGE_HARNESS_TEST_TIMEOUT,
+        )
+
+    def run_timeout(self, test_count):
+        """Piston run timeout (ms) for a batch of ``test_count`` tests.
+
+        Capped by JUDGE_BATCH_MAX_RUN_TIMEOUT and by PISTON_MAX_RUN_TIMEOUT,
+        the largest run_timeout the Piston instance accepts (3000 ms in a
+        stock install): Piston rejects a larger value and every test would
+        then be executed on its own.
+        """
+        return min(Config.JUDGE_HARNESS_TEST_TIMEOUT * 1000 * test_count,
+                   Config.JUDGE_BATCH_MAX_RUN_TIMEOUT, Config.PISTON_MAX_RUN_TIMEOUT)
+
+
+def register_harness(*languages):
+    """Register a harness for one or more Piston language names.
+
+    Args:
+        *languages (str): Language names handled by the harness
+
+    Returns:
+        function: Decorator taking a factory that returns a ``Harness``
+    """
+    def decorator(factory):
+        harness = factory()
+        for language in languages:
+            HARNESSES[language] = harness
+        return factory
+    return decorator
+
+
+def get_harness(language):
+    """Get the harness of a language, or None if it has to run per test."""
+    return HARNESSES.get(language)
+
+
+def make_marker():
+    """Random frame marker of one harness run.
+
+    It is sent to the harness on stdin and never derived from anything the
+    user sees (like the execution id), so user code cannot forge frames.
+    """
+    return f"@@SF-{secrets.token_hex(16)}@@"
+
+
+def split_output(stdout, marker, count):
+    """Split the stdout of a harness run back into per-test results.
+
+    Frames must come once per test, in test order. A frame out of order,
+    repeated or malformed means something else wrote to the harness
+    stdout: the whole batch is discarded.
+
+    Args:
+        stdout (str): Raw stdout of the harness program
+        marker (str): Frame marker of the execution
+        count (int): Number of tests in the batch
+
+    Returns:
+        list: ``{"stdout", "stderr"}`` per test, None for missing frames
+    """
+    results = [None] * count
+    expected = 0
+    for line in stdout.splitlines():
+        if marker not in line:
+            continue
+        parts = line.split(' ')
+        if len(parts) != 4 or parts[0] != marker or parts[1] != str(expected) or expected >= count:
+            return [None] * count
+        try:
+            test_stdout = bytes.fromhex(parts[2]).decode('utf-8', 'replace')
+            test_stderr = bytes.fromhex(parts[3]).decode('utf-8', 'replace')
+        except ValueError:
+            return [None] * count
+        results[expected] = {"stdout": test_stdout, "stderr": test_stderr}
+        expected += 1
+    return results
+
+
+@register_harness('python', 'python3')
+def python_harness():
+    return Harness(
+        '''import subprocess, sys
+MARKER = sys.stdin.readline().strip()
+CODE = $code
+TESTS = $tests
+with open('sf_solution.py', 'w') as f:
+    f.write(CODE)
+for i, (stdin, args) in enumerate(TESTS):
+    try:
+        p = subprocess.run([sys.executable, 'sf_solution.py'] + args, input=stdin.encode(), capture_output=True, timeout=$timeout)
+        out, err = p.stdout, p.stderr
+    except subprocess.TimeoutExpired as e:
+        out, err = e.stdout or b'', (e.stderr or b'') + b'Time limit exceeded'
+    sys.stdout.write('\\n%s %d %s %s\\n' % (MARKER, i, out.hex(), err.hex()))
+    sys.stdout.flush()
+''',
+        encode_code=repr,
+        encode_tests=lambda tests: repr([[stdin, args] for stdin, args in tests]),
+    )
+
+
+@register_harness('javascript', 'js', 'node')
+def javascript_harness():
+    return Harness(
+        '''const { spawnSync } = require('child_process');
+const fs = require('fs');
+const MARKER = fs.readFileSync(0, 'utf8').split('\\n')[0].trim();
+const CODE = $code;
+const TESTS = $tests;
+fs.writeFileSync('sf_solution.js', CODE);
+TESTS.forEach(([stdin, args], i) => {
+  const p = spawnSync(process.execPath, ['sf_solution.js', ...args], { input: stdin, timeout: $timeout * 1000 });
+  const out = p.stdout || Buffer.alloc(0);
+  let err = p.stderr || Buffer.alloc(0);
+  if (p.error) err = Buffer.concat([err, Buffer.from(String(p.error))]);
+  process.stdout.write('\\n' + MARKER + ' ' + i + ' ' + out.toString('hex') + ' ' + err.toString('hex') + '\\n');
+});
+''',
+        encode_code=json.dumps,
+        encode_tests=json.dumps,
+    )
+
@@ -0,0 +1,183 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import update
+from extensions import db
+from models import Quest, SubmissionJob
+from judge import judge_submission
+
+# Wakes up in-process workers as soon as a job is queued
+_wakeup = threading.Event()
+
+
+def enqueue_submission(execution_id, quest_id, user_id, code, language, mode='full'):
+    """Persist a submission as a queued job for the judge workers.
+
+    Args:
+        execution_id (str): UUID of the execution, used as the job key
+        quest_id (str): The ID of the coding quest
+        user_id (str): UUID of the submitting user
+        code (str): Submitted source code
+        language (str): Programming language of the submission
+        mode (str): Judge mode, see ``judge.judge_submission``
+
+    Returns:
+        SubmissionJob: The queued job
+    """
+    job = SubmissionJob(
+        execution_id=execution_id,
+        quest_id=quest_id,
+        user_id=user_id,
+        code=code,
+        language=language,
+        mode=mode
+    )
+    db.session.add(job)
+    db.session.commit()
+    _wakeup.set()
+    return job
+
+
+def requeue_stale_jobs():
+    """Put back jobs whose worker died while running them.
+
+    Jobs running longer than JUDGE_JOB_TIMEOUT are queued again, or marked
+    as failed once they reached JUDGE_JOB_MAX_ATTEMPTS.
+    """
+    cutoff = datetime.now() - timedelta(seconds=current_app.config["JUDGE_JOB_TIMEOUT"])
+    stale = (SubmissionJob.status == SubmissionJob.RUNNING) & (SubmissionJob.date_started < cutoff)
+    max_attempts = current_app.config["JUDGE_JOB_MAX_ATTEMPTS"]
+
+    db.session.execute(
+        update(SubmissionJob)
+        .where(stale, SubmissionJob.attempts >= max_attempts)
+        .values(status=SubmissionJob.FAILED, date_finished=datetime.now(), status_code=500,
+                result={"error": "Submission could not be judged"})
+    )
+    db.session.execute(
+        update(SubmissionJob)
+        .where(stale, SubmissionJob.attempts < max_attempts)
+        .values(status=SubmissionJob.QUEUED, progress=[])
+    )
+    db.session.commit()
+
+
+def claim_next_job():
+    """Claim the oldest queued job.
+
+    The claim is a conditional UPDATE, so several workers (threads or
+    processes) polling the same table never judge a job twice.
+
+    Returns:
+        SubmissionJob: The claimed job, or None if the queue is empty
+    """
+    candidates = db.session.query(SubmissionJob.execution_id).filter_by(
+        status=SubmissionJob.QUEUED
+    ).order_by(SubmissionJob.date_added).limit(10).all()
+
+    for (execution_id,) in candidates:
+        claimed = db.session.execute(
+            update(SubmissionJob)
+            .where(SubmissionJob.execution_id == execution_id, SubmissionJob.status == SubmissionJob.QUEUED)
+            .values(status=SubmissionJob.RUNNING, date_started=datetime.now(), attempts=SubmissionJob.attempts + 1)
+        ).rowcount
+        db.session.commit()
+        if claimed:
+            return db.session.get(SubmissionJob, execution_id)
+    return None
+
+
+def process_job(job):
+    """Judge a claimed job and store its final result.
+
+    Args:
+        job (SubmissionJob): A job in the running state
+    """
+    def on_progress(test, passed):
+        job.progress = (job.progress or []) + [{"test": test, "passed": passed}]
+        db.session.commit()
+
+    quest = db.session.get(Quest, job.quest_id)
+    if not quest:
+        result, status_code = {"error": "Quest not found"}, 404
+    else:
+        try:
+            result, status_code = judge_submission(
+                quest, job.code, job.language, job.user_id, job.execution_id, on_progress, job.mode
+            )
+        except Exception as e:
+            db.session.rollback()
+            logging.error("Error occurred while judging submission %s: %s", job.execution_id, e, exc_info=True)
+            result, status_code = {"error": "An internal error has occurred."}, 500
+
+    job.result = result
+    job.status_code = status_code
+    job.status = SubmissionJob.COMPLETED if status_code < 500 else SubmissionJob.FAILED
+    job.date_finished = datetime.now()
+    db.session.commit()
+
+
+def run_worker(app, stop_event=None):
+    """Judge queued jobs until ``stop_event`` is set.
+
+    Args:
+        app (Flask): The application whose database holds the queue
+        stop_event (threading.Event): Stops the loop when set
+    """
+    stop_event = stop_event or threading.Event()
+    poll_interval = app.config["JUDGE_WORKER_POLL_INTERVAL"]
+    last_requeue = 0
+
+    while not stop_event.is_set():
+        job = None
+        with app.app_context():
+            try:
+                if time.monotonic() - last_requeue > app.config["JUDGE_JOB_TIMEOUT"] / 2:
+                    requeue_stale_jobs()
+                    last_requeue = time.monotonic()
+                job = claim_next_job()
+                if job:
+                    process_job(job)
+            except Exception as e:
+                db.session.rollback()
+                logging.error("Judge worker error: %s", e, exc_info=True)
+            finally:
+                db.session.remove()
+
+        if job is None:
+            _wakeup.wait(poll_interval)
+            _wakeup.clear()
+
+
+def start_workers(app, count, stop_event=None):
+    """Start ``count`` judge workers as daemon threads of this process.
+
+    Args:
+        app (Flask): The application whose database holds the queue
+        count (int): Number of worker threads
+        stop_event (threading.Event): Stops the workers when set
+
+    Returns:
+        list: The started threads
+    """
+    threads = []
+    for i in range(count):
+        thread = threading.Thread(target=run_worker, args=(app, stop_event), name=f"judge-worker-{i}", daemon=True)
+        thread.start()
+        threads.append(thread)
+    return threads
+
+
+@click.command('judge-worker')
+@click.option('--workers', default=1, show_default=True, help='Number of judge worker threads.')
+@with_appcontext
+def judge_worker_command(workers):
+    """Run judge workers that process queued submissions."""
+    app = current_app._get_current_object()
+    app.logger.info("Starting %d judge worker(s)", workers)
+    for thread in start_workers(app, workers):
+        thread.join()
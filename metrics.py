@@ -0,0 +1,406 @@
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+import weakref
+from flask import Response, g, request
+from sqlalchemy import event
+
+# Default latency buckets (seconds)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+# Buckets of single SQL queries and pool checkouts (seconds)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Values of the operation label of db_query_duration_seconds, anything else is "other"
+SQL_OPERATIONS = ("select", "insert", "update", "delete")
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """Base of the metrics, a family of series keyed by label values.
+
+    The series of several processes are combined with ``merge`` (see
+    ``enable_multiprocess``).
+
+    Args:
+        name (str): Metric name
+        documentation (str): HELP text
+        labelnames (tuple): Label names, their values are given in order
+    """
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def snapshot(self):
+        """Copy of the series of this process, ``{labelvalues tuple: value}``."""
+        with self._lock:
+            return dict(self._series)
+
+    @staticmethod
+    def merge(value, other):
+        """Combine the values of one series from two processes."""
+        return value + other
+
+    def _samples(self, series):
+        return [(self.name, _format_labels(self.labelnames, key), value) for key, value in series.items()]
+
+    def render(self, series=None):
+        """Exposition text of the metric.
+
+        Args:
+            series (dict): Series to render, the ones of this process by default
+        """
+        series = self.snapshot() if series is None else series
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        lines += [f"{name}{labels} {_format_value(value)}" for name, labels, value in self._samples(series)]
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    """Monotonic counter."""
+    type = "counter"
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._series[labelvalues] = self._series.get(labelvalues, 0) + amount
+
+
+class Histogram(Metric):
+    """Cumulative histogram with fixed buckets.
+
+    Args:
+        buckets (tuple): Sorted upper bounds, +Inf is added
+    """
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labelvalues):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                # Per-bucket counts, cumulated when rendering, then the sum
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def snapshot(self):
+        with self._lock:
+            return {key: [list(counts), total] for key, (counts, total) in self._series.items()}
+
+    @staticmethod
+    def merge(value, other):
+        return [[a + b for a, b in zip(value[0], other[0])], value[1] + other[1]]
+
+    def _samples(self, series):
+        samples = []
+        for key, (counts, total) in series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound) if bound == float("inf") else bound}"'
+                samples.append((f"{self.name}_bucket", _format_labels(self.labelnames, key, le), cumulative))
+            samples.append((f"{self.name}_sum", _format_labels(self.labelnames, key), total))
+            samples.append((f"{self.name}_count", _format_labels(self.labelnames, key), cumulative))
+        return samples
+
+
+class Gauge(Metric):
+    """Gauge read from a callback when the metrics are scraped.
+
+    The values of several processes are summed.
+
+    Args:
+        collect (callable): Returns ``{labelvalues tuple: value}``
+    """
+    type = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), collect=None):
+        super().__init__(name, documentation, labelnames)
+        self.collect = collect
+
+    def snapshot(self):
+        return dict(self.collect())
+
+
+REGISTRY = []
+
+
+def _register(metric):
+    REGISTRY.append(metric)
+    return metric
+
+
+http_request_duration = _register(Histogram(
+    "http_request_duration_seconds", "Time to handle a request, up to the first byte of streamed responses.",
+    ("endpoint", "method", "status"),
+))
+upstream_request_duration = _register(Histogram(
+    "upstream_request_duration_seconds", "Duration of a single call to an upstream service, per attempt.",
+    ("upstream", "method"),
+))
+upstream_errors = _register(Counter(
+    "upstream_errors_total", "Failed calls to an upstream service.", ("upstream", "reason"),
+))
+db_query_duration = _register(Histogram(
+    "db_query_duration_seconds", "Duration of a SQL statement.", ("bind", "operation"), buckets=DB_BUCKETS,
+))
+db_pool_checkout_duration = _register(Histogram(
+    "db_pool_checkout_duration_seconds", "Time waited for a connection from the pool.", ("bind",), buckets=DB_BUCKETS,
+))
+judge_tests_executed = _register(Counter(
+    "judge_tests_executed_total", "Test cases executed, not counting cached results.", ("language",),
+))
+judge_cache_lookups = _register(Counter(
+    "judge_cache_lookups_total", "Judge cache lookups by result: hit, shared_hit or miss.", ("result",),
+))
+submissions = _register(Counter(
+    "submissions_total", "Judged submissions by verdict.", ("language", "verdict"),
+))
+admission_admitted = _register(Counter(
+    "admission_admitted_total", "Submissions admitted by the per-user rate limit.",
+))
+admission_rejected = _register(Counter(
+    "admission_rejected_total", "Submissions shed with a 429 by the admission control.", ("reason",),
+))
+
+# Instrumented engines, by bind label for the pool gauges
+_engines = {}
+_instrumented = weakref.WeakSet()
+
+
+def _pool_gauge(method):
+    def collect():
+        values = {}
+        for bind, engine in list(_engines.items()):
+            value = getattr(engine.pool, method, None)
+            if callable(value):
+                values[(bind,)] = value()
+        return values
+    return collect
+
+
+db_pool_size = _register(Gauge("db_pool_size", "Size of the connection pool.", ("bind",), _pool_gauge("size")))
+db_pool_checked_out = _register(Gauge(
+    "db_pool_checked_out", "Connections currently checked out of the pool.", ("bind",), _pool_gauge("checkedout"),
+))
+db_pool_overflow = _register(Gauge(
+    "db_pool_overflow", "Connections opened beyond the pool size.", ("bind",), _pool_gauge("overflow"),
+))
+
+
+# Directory where every server process writes its series, None when the
+# metrics of this process are served alone (see enable_multiprocess)
+_multiprocess_dir = None
+
+
+def _process_file(directory, pid):
+    return os.path.join(directory, f"{pid}.json")
+
+
+def _read_process_file(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        # Removed or being replaced meanwhile
+        return None
+
+
+def _write_process_file(path, data):
+    temporary = f"{path}.tmp"
+    with open(temporary, "w") as f:
+        json.dump(data, f)
+    os.replace(temporary, path)
+
+
+def flush():
+    """Write the series of this process to the multiprocess directory."""
+    if _multiprocess_dir is None:
+        return
+    data = {
+        metric.name: [[list(key), value] for key, value in metric.snapshot().items()]
+        for metric in REGISTRY
+    }
+    _write_process_file(_process_file(_multiprocess_dir, os.getpid()), data)
+
+
+def _run_flusher(interval):
+    while True:
+        time.sleep(interval)
+        try:
+            flush()
+        except Exception:
+            logging.exception("Failed to write the metrics of this process")
+
+
+def enable_multiprocess(directory, interval):
+    """Serve the metrics of every server process from any of them.
+
+    Each process writes its series to ``<directory>/<pid>.json`` every
+    ``interval`` seconds and when it is scraped; a scrape sums the files of
+    all processes, so counters do not depend on the process that answers.
+    The files of exited processes are kept, their counters stay in the
+    totals (see ``mark_process_dead``). Call it once per serving process.
+
+    Args:
+        directory (str): Directory shared by the processes, see ``prepare_multiprocess_dir``
+        interval (float): Seconds between two writes
+    """
+    global _multiprocess_dir
+    _multiprocess_dir = directory
+    flush()
+    threading.Thread(target=_run_flusher, args=(interval,), name="metrics-flusher", daemon=True).start()
+
+
+def prepare_multiprocess_dir(directory):
+    """Create the multiprocess directory, removing the files of a previous run."""
+    os.makedirs(directory, exist_ok=True)
+    for name in os.listdir(directory):
+        if name.endswith((".json", ".tmp")):
+            os.remove(os.path.join(directory, name))
+
+
+def mark_process_dead(directory, pid):
+    """Drop the gauges of an exited process, its counters and histograms stay."""
+    path = _process_file(directory, pid)
+    data = _read_process_file(path)
+    if data is None:
+        return
+    for metric in REGISTRY:
+        if isinstance(metric, Gauge):
+            data.pop(metric.name, None)
+    _write_process_file(path, data)
+
+
+def _merged_series():
+    flush()
+    merged = {metric.name: {} for metric in REGISTRY}
+    for name in sorted(os.listdir(_multiprocess_dir)):
+        if not name.endswith(".json"):
+            continue
+        data = _read_process_file(os.path.join(_multiprocess_dir, name))
+        if data is None:
+            continue
+        for metric in REGISTRY:
+            series = merged[metric.name]
+            for key, value in data.get(metric.name, ()):
+                key = tuple(key)
+                series[key] = metric.merge(series[key], value) if key in series else value
+    return merged
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    if _multiprocess_dir is None:
+        return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+    merged = _merged_series()
+    return "\n".join(metric.render(merged[metric.name]) for metric in REGISTRY) + "\n"
+
+
+def _time_pool_checkouts(bind, pool):
+    do_get = pool._do_get
+
+    def timed_do_get():
+        started = time.perf_counter()
+        try:
+            return do_get()
+        finally:
+            db_pool_checkout_duration.observe(time.perf_counter() - started, bind)
+
+    pool._do_get = timed_do_get
+
+
+def instrument_engine(bind, engine):
+    """Time the SQL statements and pool checkouts of an engine.
+
+    Args:
+        bind (str): Label of the engine ("primary" or a replica bind key)
+        engine (Engine): The engine to instrument
+    """
+    _engines[bind] = engine
+    if engine in _instrumented:
+        return
+    _instrumented.add(engine)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        operation = statement.lstrip()[:6].lower()
+        if operation not in SQL_OPERATIONS:
+            operation = "other"
+        db_query_duration.observe(time.perf_counter() - started, bind, operation)
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        if context.connection is not None and context.connection.info.get("query_started"):
+            context.connection.info["query_started"].pop()
+
+    @event.listens_for(engine, "engine_disposed")
+    def engine_disposed(engine):
+        # dispose() replaces the pool
+        _time_pool_checkouts(bind, engine.pool)
+
+    _time_pool_checkouts(bind, engine.pool)
+
+
+def init_app(app, db):
+    """Instrument the requests and database engines of an app and serve /metrics.
+
+    Args:
+        app (Flask): The application
+        db (SQLAlchemy): Its database extension
+    """
+    @app.before_request
+    def start_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def observe_request(response):
+        started = g.pop("request_started", None)
+        if started is not None:
+            http_request_duration.observe(
+                time.perf_counter() - started, request.endpoint or "unmatched", request.method, response.status_code
+            )
+        return response
+
+    with app.app_context():
+        for bind, engine in db.engines.items():
+            instrument_engine(bind or "primary", engine)
+
+    def metrics_view():
+        return Response(render(), content_type=CONTENT_TYPE)
+
+    app.add_url_rule("/metrics", "metrics", metrics_view)
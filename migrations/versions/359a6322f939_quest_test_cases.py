@@ -0,0 +1,100 @@
+"""quest test cases
+
+Moves the fixed input_0..input_9 / output_0..output_9 columns of
+coding_quests into the quest_test_cases table. Like the judge, tests are
+copied up to the first one without input and output; input_0 (the null
+test) becomes a sample.
+
+Revision ID: 359a6322f939
+Revises: 81c29690d379
+Create Date: 2026-10-16 22:33:39.252362
+
+"""
+import uuid
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '359a6322f939'
+down_revision = '81c29690d379'
+branch_labels = None
+depends_on = None
+
+# Number of legacy test columns
+LEGACY_TESTS = 10
+
+
+def _legacy_columns():
+    return [f'input_{i}' for i in range(LEGACY_TESTS)] + [f'output_{i}' for i in range(LEGACY_TESTS)]
+
+
+def upgrade():
+    bind = op.get_bind()
+
+    # db.create_all() may already have created the table
+    if not sa.inspect(bind).has_table('quest_test_cases'):
+        op.create_table('quest_test_cases',
+        sa.Column('id', sa.String(length=36), nullable=False),
+        sa.Column('quest_id', sa.String(length=256), nullable=False),
+        sa.Column('position', sa.Integer(), nullable=False),
+        sa.Column('input', sa.Text(), nullable=True),
+        sa.Column('output', sa.Text(), nullable=True),
+        sa.Column('weight', sa.Integer(), nullable=False),
+        sa.Column('is_sample', sa.Boolean(), nullable=False),
+        sa.ForeignKeyConstraint(['quest_id'], ['coding_quests.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('quest_id', 'position', name='uq_quest_test_cases_quest_id_position')
+        )
+
+    quests = sa.table('coding_quests', sa.column('id'), *[sa.column(name) for name in _legacy_columns()])
+    test_cases = sa.table(
+        'quest_test_cases',
+        sa.column('id'), sa.column('quest_id'), sa.column('position'), sa.column('input'),
+        sa.column('output'), sa.column('weight'), sa.column('is_sample'),
+    )
+
+    rows = []
+    for quest in bind.execute(sa.select(quests)).mappings():
+        for i in range(LEGACY_TESTS):
+            test_input, test_output = quest[f'input_{i}'], quest[f'output_{i}']
+            if not test_input and not test_output:
+                break
+            rows.append({
+                'id': str(uuid.uuid4()),
+                'quest_id': quest['id'],
+                'position': i,
+                'input': test_input,
+                'output': test_output,
+                'weight': 1,
+                'is_sample': i == 0,
+            })
+    if rows:
+        op.bulk_insert(test_cases, rows)
+
+    with op.batch_alter_table('coding_quests', schema=None) as batch_op:
+        for name in _legacy_columns():
+            batch_op.drop_column(name)
+
+
+def downgrade():
+    bind = op.get_bind()
+
+    with op.batch_alter_table('coding_quests', schema=None) as batch_op:
+        for name in _legacy_columns():
+            batch_op.add_column(sa.Column(name, sa.Text(), nullable=True))
+
+    quests = sa.table('coding_quests', sa.column('id'), *[sa.column(name) for name in _legacy_columns()])
+    test_cases = sa.table('quest_test_cases', sa.column('quest_id'), sa.column('position'),
+                          sa.column('input'), sa.column('output'))
+
+    # Only the first LEGACY_TESTS tests fit in the legacy columns
+    for test_case in bind.execute(sa.select(test_cases).where(test_cases.c.position < LEGACY_TESTS)).mappings():
+        bind.execute(
+            quests.update()
+            .where(quests.c.id == test_case['quest_id'])
+            .values({f"input_{test_case['position']}": test_case['input'],
+                     f"output_{test_case['position']}": test_case['output']})
+        )
+
+    op.drop_table('quest_test_cases')
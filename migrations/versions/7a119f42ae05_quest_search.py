@@ -0,0 +1,51 @@
+"""quest search
+
+Generated tsvector column of the quest name and condition with a GIN
+index, for GET /quests/search. Postgres only: other databases search
+without an index (see quest_search.py).
+
+Adding a stored generated column rewrites coding_quests under an ACCESS
+EXCLUSIVE lock: reads and writes of the quests wait until the rewrite is
+over, which takes as long as copying the catalog. Run it when the traffic
+is low. The index is then built concurrently, without blocking writes.
+
+Revision ID: 7a119f42ae05
+Revises: 4f8d9b7f5876
+Create Date: 2026-10-16 23:12:05.418210
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '7a119f42ae05'
+down_revision = '4f8d9b7f5876'
+branch_labels = None
+depends_on = None
+
+# Same expression as models.QUEST_SEARCH_VECTOR, frozen at this revision
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('english', coalesce(quest_name, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(condition, '')), 'B')"
+)
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute(
+        "ALTER TABLE coding_quests ADD COLUMN IF NOT EXISTS search_vector tsvector "
+        f"GENERATED ALWAYS AS ({SEARCH_VECTOR}) STORED"
+    )
+    with op.get_context().autocommit_block():
+        op.create_index('ix_coding_quests_search_vector', 'coding_quests', ['search_vector'], unique=False,
+                        if_not_exists=True, postgresql_using='gin', postgresql_concurrently=True)
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_coding_quests_search_vector', table_name='coding_quests', if_exists=True,
+                      postgresql_concurrently=True)
+    op.execute("ALTER TABLE coding_quests DROP COLUMN IF EXISTS search_vector")
@@ -0,0 +1,132 @@
+"""code blobs
+
+Moves the code of the solutions into code_blobs: one zlib-compressed row
+per distinct code, keyed by its SHA-256, referenced by
+quest_solutions.code_hash (see code_store.py). The existing solutions are
+backfilled in batches. On Postgres the space of the dropped code column
+is only given back to the system by VACUUM FULL (or pg_repack) of
+quest_solutions.
+
+Revision ID: 7cc79793a3cb
+Revises: b60a913d374e
+Create Date: 2026-10-16 23:07:00.992116
+
+"""
+import hashlib
+import zlib
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7cc79793a3cb'
+down_revision = 'b60a913d374e'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+solutions = sa.table(
+    'quest_solutions',
+    sa.column('id', sa.String),
+    sa.column('code', sa.Text),
+    sa.column('code_hash', sa.String),
+)
+blobs = sa.table(
+    'code_blobs',
+    sa.column('hash', sa.String),
+    sa.column('data', sa.LargeBinary),
+    sa.column('compression', sa.String),
+    sa.column('size', sa.Integer),
+    sa.column('date_added', sa.DateTime),
+)
+
+
+def blob_values(code):
+    # Same format as code_store.blob_values, frozen at this revision
+    raw = code.encode('utf-8')
+    compressed = zlib.compress(raw, 6)
+    data, compression = (compressed, 'zlib') if len(compressed) < len(raw) else (raw, 'none')
+    return dict(hash=hashlib.sha256(raw).hexdigest(), data=data, compression=compression, size=len(raw),
+                date_added=datetime.now())
+
+
+def batches(conn, column):
+    """Yield the (id, value) rows of quest_solutions in id order, BATCH_SIZE at a time."""
+    last_id = ''
+    while True:
+        rows = conn.execute(
+            sa.select(solutions.c.id, solutions.c[column])
+            .where(solutions.c.id > last_id)
+            .order_by(solutions.c.id)
+            .limit(BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+
+
+def upgrade():
+    op.create_table('code_blobs',
+    sa.Column('hash', sa.String(length=64), nullable=False),
+    sa.Column('data', sa.LargeBinary(), nullable=False),
+    sa.Column('compression', sa.String(length=10), nullable=False),
+    sa.Column('size', sa.Integer(), nullable=False),
+    sa.Column('date_added', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('hash')
+    )
+    with op.batch_alter_table('quest_solutions', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('code_hash', sa.String(length=64), nullable=True))
+
+    conn = op.get_bind()
+    for rows in batches(conn, 'code'):
+        values = {}
+        updates = []
+        for solution_id, code in rows:
+            blob = blob_values(code)
+            values[blob['hash']] = blob
+            updates.append({'solution_id': solution_id, 'blob_hash': blob['hash']})
+        existing = set(conn.execute(sa.select(blobs.c.hash).where(blobs.c.hash.in_(list(values)))).scalars())
+        new_blobs = [blob for blob_hash, blob in values.items() if blob_hash not in existing]
+        if new_blobs:
+            conn.execute(blobs.insert(), new_blobs)
+        conn.execute(
+            solutions.update()
+            .where(solutions.c.id == sa.bindparam('solution_id'))
+            .values(code_hash=sa.bindparam('blob_hash')),
+            updates,
+        )
+
+    with op.batch_alter_table('quest_solutions', schema=None) as batch_op:
+        batch_op.alter_column('code_hash', existing_type=sa.String(length=64), nullable=False)
+        batch_op.create_foreign_key('quest_solutions_code_hash_fkey', 'code_blobs', ['code_hash'], ['hash'])
+        batch_op.drop_column('code')
+
+
+def downgrade():
+    with op.batch_alter_table('quest_solutions', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('code', sa.TEXT(), nullable=True))
+
+    conn = op.get_bind()
+    for rows in batches(conn, 'code_hash'):
+        hashes = {blob_hash for _, blob_hash in rows}
+        codes = {}
+        for blob_hash, data, compression in conn.execute(
+            sa.select(blobs.c.hash, blobs.c.data, blobs.c.compression).where(blobs.c.hash.in_(hashes))
+        ):
+            codes[blob_hash] = bytes(zlib.decompress(data) if compression == 'zlib' else data).decode('utf-8')
+        conn.execute(
+            solutions.update()
+            .where(solutions.c.id == sa.bindparam('solution_id'))
+            .values(code=sa.bindparam('solution_code')),
+            [{'solution_id': solution_id, 'solution_code': codes[blob_hash]} for solution_id, blob_hash in rows],
+        )
+
+    with op.batch_alter_table('quest_solutions', schema=None) as batch_op:
+        batch_op.alter_column('code', existing_type=sa.TEXT(), nullable=False)
+        batch_op.drop_constraint('quest_solutions_code_hash_fkey', type_='foreignkey')
+        batch_op.drop_column('code_hash')
+
+    op.drop_table('code_blobs')
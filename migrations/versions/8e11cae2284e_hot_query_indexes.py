@@ -0,0 +1,42 @@
+"""hot query indexes
+
+Composite indexes for the hot lookups: solutions of a user, the already
+solved check, comments of a quest and the catalog pages (by language).
+On Postgres they are built concurrently so the tables stay writable.
+
+Revision ID: 8e11cae2284e
+Revises: 359a6322f939
+Create Date: 2026-10-16 22:34:42.122804
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '8e11cae2284e'
+down_revision = '359a6322f939'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_coding_quests_date_added_id', 'coding_quests', ['date_added', 'id']),
+    ('ix_coding_quests_language_date_added_id', 'coding_quests', ['language', 'date_added', 'id']),
+    ('ix_quest_comments_quest_id_date_added', 'quest_comments', ['quest_id', 'date_added']),
+    ('ix_quest_solutions_quest_id_user_id', 'quest_solutions', ['quest_id', 'user_id']),
+    ('ix_quest_solutions_user_id_is_solved', 'quest_solutions', ['user_id', 'is_solved']),
+]
+
+
+def upgrade():
+    postgres = op.get_bind().dialect.name == 'postgresql'
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, unique=False, if_not_exists=True,
+                            postgresql_concurrently=postgres)
+
+
+def downgrade():
+    postgres = op.get_bind().dialect.name == 'postgresql'
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=postgres)
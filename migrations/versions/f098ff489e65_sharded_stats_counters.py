@@ -0,0 +1,57 @@
+"""sharded stats counters
+
+Adds the shard column to the primary key of quest_stats and
+language_stats (see STATS_COUNTER_SHARDS). The existing counters become
+shard 0. The downgrade sums the shards back into one row.
+
+Revision ID: f098ff489e65
+Revises: 65dc203e97da
+Create Date: 2026-10-16 23:22:54.236150
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f098ff489e65'
+down_revision = '65dc203e97da'
+branch_labels = None
+depends_on = None
+
+# Table and key column of the sharded counters
+TABLES = (('quest_stats', 'quest_id'), ('language_stats', 'language'))
+COUNTERS = ('attempts', 'accepted', 'tests_passed', 'tests_failed', 'attempters', 'solvers')
+
+
+def _replace_primary_key(batch_op, table, columns):
+    # SQLite recreates the table in batch mode, there is nothing to drop
+    if op.get_context().dialect.name != 'sqlite':
+        batch_op.drop_constraint(f'{table}_pkey', type_='primary')
+    batch_op.create_primary_key(f'{table}_pkey', columns)
+
+
+def upgrade():
+    sqlite = op.get_context().dialect.name == 'sqlite'
+    for table, key in TABLES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('shard', sa.SmallInteger(), server_default='0', nullable=False,
+                                          primary_key=sqlite))
+            _replace_primary_key(batch_op, table, [key, 'shard'])
+
+
+def downgrade():
+    counters = ", ".join(COUNTERS)
+    sums = ", ".join(f"SUM({name}) AS {name}" for name in COUNTERS)
+    for table, key in TABLES:
+        # One row per key holding the sum of its shards
+        op.execute(f"CREATE TABLE {table}_merged AS SELECT {key}, {sums}, MAX(updated_at) AS updated_at "
+                   f"FROM {table} GROUP BY {key}")
+        op.execute(f"DELETE FROM {table}")
+        op.execute(f"INSERT INTO {table} ({key}, shard, {counters}, updated_at) "
+                   f"SELECT {key}, 0, {counters}, updated_at FROM {table}_merged")
+        op.execute(f"DROP TABLE {table}_merged")
+
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            _replace_primary_key(batch_op, table, [key])
+            batch_op.drop_column('shard')
@@ -1,6 +1,7 @@
 import uuid
 from extensions import db
 from datetime import datetime
+from sqlalchemy import DDL, event
 from sqlalchemy.dialects.postgresql import JSON
 
 
@@ -11,6 +12,10 @@ class Quest(db.Model):
         db (): SQLAlchemy instance
     """
     __tablename__ = 'coding_quests'
+    __table_args__ = (
+        db.Index('ix_coding_quests_date_added_id', 'date_added', 'id'),  # Catalog pages
+        db.Index('ix_coding_quests_language_date_added_id', 'language', 'date_added', 'id'),  # Catalog pages by language
+    )
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     language = db.Column(db.String(50), nullable=False)
     difficulty = db.Column(db.String(50), nullable=False)
@@ -22,35 +27,15 @@ class Quest(db.Model):
     condition = db.Column(db.Text, nullable=False)
     function_template = db.Column(db.Text, nullable=False)
     
-    # Quest inputs, where input_0 is the null test
-    input_0 = db.Column(db.Text, nullable=True)  # Input for the quest
-    input_1 = db.Column(db.Text, nullable=True)  # Input for the quest
-    input_2 = db.Column(db.Text, nullable=True)  # Input for the quest
-    input_3 = db.Column(db.Text, nullable=True)  # Input for the quest
-    input_4 = db.Column(db.Text, nullable=True)  # Input for the quest
-    input_5 = db.Column(db.Text, nullable=True)  # Input for the quest
-    input_6 = db.Column(db.Text, nullable=True)  # Input for the quest
-    input_7 = db.Column(db.Text, nullable=True)  # Input for the quest
-    input_8 = db.Column(db.Text, nullable=True)  # Input for the quest
-    input_9 = db.Column(db.Text, nullable=True)  # Input for the quest
-    
-    # Quest outputs, where output_0 is the null test
-    output_0 = db.Column(db.Text, nullable=True)  # Output for the quest
-    output_1 = db.Column(db.Text, nullable=True)  # Output for the quest
-    output_2 = db.Column(db.Text, nullable=True)  # Output for the quest
-    output_3 = db.Column(db.Text, nullable=True)  # Output for the quest
-    output_4 = db.Column(db.Text, nullable=True)  # Output for the quest
-    output_5 = db.Column(db.Text, nullable=True)  # Output for the quest
-    output_6 = db.Column(db.Text, nullable=True)  # Output for the quest
-    output_7 = db.Column(db.Text, nullable=True)  # Output for the quest
-    output_8 = db.Column(db.Text, nullable=True)  # Output for the quest
-    output_9 = db.Column(db.Text, nullable=True)  # Output for the quest
-    
     example_solution = db.Column(db.Text, nullable=True)  # Example solution for the quest
     xp = db.Column(db.Enum('30', '60', '100', name='xp_points'), nullable=False)
     type = db.Column(db.String(20), nullable=True)
     is_active = db.Column(db.Boolean, default=True, nullable=True)
     quest_comments = db.Column(JSON, default = [], nullable=True) # Store comments for the submited quests
+
+    # Test cases are only loaded when accessed, e.g. by the judge or the quest editor
+    test_cases = db.relationship('QuestTestCase', order_by='QuestTestCase.position', lazy='select',
+                                 cascade='all, delete-orphan')
     
     
     
@@ -66,6 +51,54 @@ class Quest(db.Model):
         self.type = type
 
 
+# Full-text search document of a quest: the name ranks above the condition.
+# Postgres only, so the column is not mapped: it is a generated column kept
+# up to date by the database, read by quest_search.py.
+QUEST_SEARCH_VECTOR = (
+    "setweight(to_tsvector('english', coalesce(quest_name, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(condition, '')), 'B')"
+)
+event.listen(Quest.__table__, 'after_create', DDL(
+    f"ALTER TABLE %(table)s ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ({QUEST_SEARCH_VECTOR}) STORED"
+).execute_if(dialect='postgresql'))
+event.listen(Quest.__table__, 'after_create', DDL(
+    "CREATE INDEX ix_coding_quests_search_vector ON %(table)s USING gin (search_vector)"
+).execute_if(dialect='postgresql'))
+
+class QuestTestCase(db.Model):
+    """QuestTestCase model for the test cases of a coding quest.
+
+    Args:
+        db (): SQLAlchemy instance
+    """
+    __tablename__ = 'quest_test_cases'
+    __table_args__ = (
+        db.UniqueConstraint('quest_id', 'position', name='uq_quest_test_cases_quest_id_position'),
+    )
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    quest_id = db.Column(db.String(256), db.ForeignKey('coding_quests.id'), nullable=False)
+    position = db.Column(db.Integer, nullable=False)  # Test order, where position 0 is the null test
+    input = db.Column(db.Text, nullable=True)  # Input for the quest
+    output = db.Column(db.Text, nullable=True)  # Output for the quest
+    weight = db.Column(db.Integer, default=1, nullable=False)  # Weight of the test in the score
+    is_sample = db.Column(db.Boolean, default=False, nullable=False)  # Shown to the user as an example
+
+    def __init__(self, position, input, output, weight=1, is_sample=False):
+        self.position = position
+        self.input = input
+        self.output = output
+        self.weight = weight
+        self.is_sample = is_sample
+
+    def to_dict(self):
+        return {
+            "input": self.input,
+            "output": self.output,
+            "weight": self.weight,
+            "is_sample": self.is_sample,
+        }
+
+
 class ReportedQuest(db.Model):
     """ReportedQuest model for the coding quests database.
 
@@ -85,6 +118,19 @@ class ReportedQuest(db.Model):
         self.reason = reason
 
 
+class CodeBlob(db.Model):
+    """CodeBlob model, a submitted source code stored once, keyed by its hash.
+
+    Args:
+        db (): SQLAlchemy instance
+    """
+    __tablename__ = 'code_blobs'
+    hash = db.Column(db.String(64), primary_key=True)  # SHA-256 of the UTF-8 code
+    data = db.Column(db.LargeBinary, nullable=False)
+    compression = db.Column(db.String(10), nullable=False)  # "zlib" or "none"
+    size = db.Column(db.Integer, nullable=False)  # Bytes of the uncompressed code
+    date_added = db.Column(db.DateTime, default=datetime.now, nullable=False)
+
 class QuestSolution(db.Model):
     """QuestSolution model for the coding quests database.
 
@@ -92,25 +138,39 @@ class QuestSolution(db.Model):
         db (): SQLAlchemy instance
     """
     __tablename__ = 'quest_solutions'
+    __table_args__ = (
+        db.Index('ix_quest_solutions_user_id_is_solved', 'user_id', 'is_solved'),  # Solutions of a user
+        db.Index('ix_quest_solutions_quest_id_user_id', 'quest_id', 'user_id'),  # Already solved check
+        db.Index('ix_quest_solutions_execution_id', 'execution_id', unique=True),  # Recorded once per execution
+    )
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     quest_id = db.Column(db.String(256), db.ForeignKey('coding_quests.id'), nullable=False)
     user_id = db.Column(db.String(256), nullable=False)  # User UUID
-    code = db.Column(db.Text, nullable=False)
+    code_hash = db.Column(db.String(64), db.ForeignKey('code_blobs.hash'), nullable=False)  # See code_store.py
     language = db.Column(db.String(50), nullable=False)
     tests_passed = db.Column(db.Integer, default=0, nullable=False)
     tests_failed = db.Column(db.Integer, default=0, nullable=False)
     is_solved = db.Column(db.Boolean, default=False, nullable=False)
+    tests_skipped = db.Column(db.Integer, default=0, server_default='0', nullable=False)  # Not run by fail-fast
+    mode = db.Column(db.String(20), default='full', server_default='full', nullable=False)  # Judge mode
+    verdict = db.Column(db.String(20), nullable=True)  # NULL for solutions judged before the modes
+    execution_id = db.Column(db.String(36), nullable=True)  # NULL for solutions judged before it was stored
     date_added = db.Column(db.DateTime, default=datetime.now, nullable=False)
 
 
-    def __init__(self, quest_id, user_id, code, language, tests_passed=0, tests_failed=0, is_solved=False):
+    def __init__(self, quest_id, user_id, code_hash, language, tests_passed=0, tests_failed=0, is_solved=False,
+                 tests_skipped=0, mode='full', verdict=None, execution_id=None):
         self.quest_id = quest_id
         self.user_id = user_id
-        self.code = code
+        self.code_hash = code_hash
         self.language = language
         self.tests_passed = tests_passed
         self.tests_failed = tests_failed
         self.is_solved = is_solved
+        self.tests_skipped = tests_skipped
+        self.mode = mode
+        self.verdict = verdict
+        self.execution_id = execution_id
 
 
 class QuestComment(db.Model):
@@ -120,6 +180,9 @@ class QuestComment(db.Model):
         db (): SQLAlchemy instance
     """
     __tablename__ = 'quest_comments'
+    __table_args__ = (
+        db.Index('ix_quest_comments_quest_id_date_added', 'quest_id', 'date_added'),  # Comments of a quest
+    )
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     quest_id = db.Column(db.String(256), db.ForeignKey('coding_quests.id'), nullable=False)
     user_id = db.Column(db.String(256), nullable=False)  # User UUID
@@ -129,4 +192,206 @@ class QuestComment(db.Model):
     def __init__(self, quest_id, user_id, comment):
         self.quest_id = quest_id
         self.user_id = user_id
-        self.comment = comment
\ No newline at end of file
+        self.comment = comment
+
+class SubmissionJob(db.Model):
+    """SubmissionJob model for submissions judged asynchronously.
+
+    Args:
+        db (): SQLAlchemy instance
+    """
+    __tablename__ = 'submission_jobs'
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    COMPLETED = 'completed'
+    FAILED = 'failed'
+
+    execution_id = db.Column(db.String(36), primary_key=True)
+    quest_id = db.Column(db.String(256), db.ForeignKey('coding_quests.id'), nullable=False)
+    user_id = db.Column(db.String(256), nullable=False)  # User UUID
+    code = db.Column(db.Text, nullable=False)
+    language = db.Column(db.String(50), nullable=False)
+    mode = db.Column(db.String(20), default='full', server_default='full', nullable=False)  # Judge mode
+    status = db.Column(db.String(20), default=QUEUED, nullable=False, index=True)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    progress = db.Column(JSON, default=[], nullable=True)  # Per-test results as they complete
+    result = db.Column(JSON, nullable=True)  # Final submission result
+    status_code = db.Column(db.Integer, nullable=True)  # HTTP status of the final result
+    date_added = db.Column(db.DateTime, default=datetime.now, nullable=False)
+    date_started = db.Column(db.DateTime, nullable=True)
+    date_finished = db.Column(db.DateTime, nullable=True)
+
+    def __init__(self, execution_id, quest_id, user_id, code, language, mode='full'):
+        self.execution_id = execution_id
+        self.quest_id = quest_id
+        self.user_id = user_id
+        self.code = code
+        self.language = language
+        self.mode = mode
+        self.status = self.QUEUED
+        self.progress = []
+
+    @property
+    def is_finished(self):
+        return self.status in (self.COMPLETED, self.FAILED)
+
+    def to_dict(self):
+        return {
+            "execution_id": self.execution_id,
+            "quest_id": self.quest_id,
+            "user_id": self.user_id,
+            "mode": self.mode,
+            "status": self.status,
+            "progress": self.progress or [],
+            "result": self.result,
+            "status_code": self.status_code,
+            "date_added": self.date_added.isoformat() if self.date_added else None,
+            "date_finished": self.date_finished.isoformat() if self.date_finished else None,
+        }
+
+
+class JudgeResult(db.Model):
+    """JudgeResult model, the shared store of the judge result cache.
+
+    Args:
+        db (): SQLAlchemy instance
+    """
+    __tablename__ = 'judge_results'
+    key = db.Column(db.String(64), primary_key=True)  # SHA-256 of quest, version, language and code
+    quest_id = db.Column(db.String(256), db.ForeignKey('coding_quests.id'), nullable=False, index=True)
+    results = db.Column(JSON, nullable=False)  # Per-test stdout/stderr
+    date_added = db.Column(db.DateTime, default=datetime.now, nullable=False)
+
+
+class CatalogVersion(db.Model):
+    """CatalogVersion model, a single row bumped on every quest catalog write.
+
+    Args:
+        db (): SQLAlchemy instance
+    """
+    __tablename__ = 'catalog_version'
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, default=0, nullable=False)
+
+
+class XpGrant(db.Model):
+    """XpGrant model, the outbox of XP grants delivered to the users service.
+
+    Grants are written in the transaction of the solution that earned them
+    and delivered by the XP dispatcher. A user earns the XP of a quest once.
+
+    Args:
+        db (): SQLAlchemy instance
+    """
+    __tablename__ = 'xp_outbox'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'quest_id', name='uq_xp_outbox_user_id_quest_id'),
+        db.Index('ix_xp_outbox_status_next_attempt_at', 'status', 'next_attempt_at'),  # Due grants
+    )
+    PENDING = 'pending'
+    DELIVERED = 'delivered'
+    FAILED = 'failed'
+
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    user_id = db.Column(db.String(256), nullable=False)  # User UUID
+    quest_id = db.Column(db.String(256), db.ForeignKey('coding_quests.id'), nullable=False)
+    xp = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(20), default=PENDING, nullable=False)
+    batch_key = db.Column(db.String(36), nullable=True, index=True)  # Idempotency key of the delivery
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.now, nullable=False)
+    locked_until = db.Column(db.DateTime, nullable=True)  # Lease of the dispatcher delivering it
+    last_error = db.Column(db.Text, nullable=True)
+    date_added = db.Column(db.DateTime, default=datetime.now, nullable=False)
+    date_delivered = db.Column(db.DateTime, nullable=True)
+
+
+class RateLimitBucket(db.Model):
+    """RateLimitBucket model, a token bucket of the submission admission control.
+
+    Args:
+        db (): SQLAlchemy instance
+    """
+    __tablename__ = 'rate_limit_buckets'
+    key = db.Column(db.String(256), primary_key=True)  # e.g. "submit:<user UUID>"
+    tokens = db.Column(db.Float, nullable=False)
+    updated_at = db.Column(db.Float, nullable=False, index=True)  # Unix time of the last refill
+
+
+class JudgeSlot(db.Model):
+    """JudgeSlot model, a submission being judged, counted against the in-flight cap.
+
+    Args:
+        db (): SQLAlchemy instance
+    """
+    __tablename__ = 'judge_slots'
+    execution_id = db.Column(db.String(36), primary_key=True)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)  # Lease, in case the process dies
+
+
+class QuestStats(db.Model):
+    """QuestStats model, submission counters of a quest, see stats.py.
+
+    The counters of a quest are split over several rows (shards), their
+    sum is the value.
+
+    Args:
+        db (): SQLAlchemy instance
+    """
+    __tablename__ = 'quest_stats'
+    quest_id = db.Column(db.String(256), db.ForeignKey('coding_quests.id'), primary_key=True)
+    shard = db.Column(db.SmallInteger, primary_key=True, default=0, server_default='0')  # See STATS_COUNTER_SHARDS
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    accepted = db.Column(db.Integer, default=0, nullable=False)
+    tests_passed = db.Column(db.BigInteger, default=0, nullable=False)  # Sum over the attempts
+    tests_failed = db.Column(db.BigInteger, default=0, nullable=False)
+    attempters = db.Column(db.Integer, default=0, nullable=False)  # Distinct users
+    solvers = db.Column(db.Integer, default=0, nullable=False)  # Distinct users with an accepted attempt
+    updated_at = db.Column(db.DateTime, default=datetime.now, nullable=False)
+
+
+class LanguageStats(db.Model):
+    """LanguageStats model, submission counters of a language, see stats.py.
+
+    Sharded like QuestStats.
+
+    Args:
+        db (): SQLAlchemy instance
+    """
+    __tablename__ = 'language_stats'
+    language = db.Column(db.String(50), primary_key=True)  # Language of the submissions
+    shard = db.Column(db.SmallInteger, primary_key=True, default=0, server_default='0')
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    accepted = db.Column(db.Integer, default=0, nullable=False)
+    tests_passed = db.Column(db.BigInteger, default=0, nullable=False)
+    tests_failed = db.Column(db.BigInteger, default=0, nullable=False)
+    attempters = db.Column(db.Integer, default=0, nullable=False)
+    solvers = db.Column(db.Integer, default=0, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.now, nullable=False)
+
+
+class QuestUserStats(db.Model):
+    """QuestUserStats model, whether a user attempted and solved a quest.
+
+    Tells the stats whether an attempt comes from a new attempter or solver.
+
+    Args:
+        db (): SQLAlchemy instance
+    """
+    __tablename__ = 'quest_user_stats'
+    quest_id = db.Column(db.String(256), db.ForeignKey('coding_quests.id'), primary_key=True)
+    user_id = db.Column(db.String(256), primary_key=True)  # User UUID
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    solved = db.Column(db.Boolean, default=False, nullable=False)
+
+
+class LanguageUserStats(db.Model):
+    """LanguageUserStats model, whether a user attempted and solved a quest in a language.
+
+    Args:
+        db (): SQLAlchemy instance
+    """
+    __tablename__ = 'language_user_stats'
+    language = db.Column(db.String(50), primary_key=True)
+    user_id = db.Column(db.String(256), primary_key=True)  # User UUID
+    solved = db.Column(db.Boolean, default=False, nullable=False)
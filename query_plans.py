@@ -0,0 +1,215 @@
+import json
+import logging
+import time
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import create_engine, text
+from sqlalchemy.dialects import postgresql
+from werkzeug.datastructures import MultiDict
+from extensions import db
+from quest_listing import build_listing_query
+from quest_search import build_search_query
+
+# Schema the check seeds and drops, so it never touches the application tables
+CHECK_SCHEMA = "query_plan_check"
+
+# Hot queries of the routes: (name, table that must be read through an index, SQL, parameters)
+HOT_QUERIES = [
+    (
+        "user solutions",
+        "quest_solutions",
+        "SELECT * FROM quest_solutions WHERE user_id = :user_id",
+        {"user_id": "user-42"},
+    ),
+    (
+        "correct solutions",
+        "quest_solutions",
+        "SELECT * FROM quest_solutions WHERE user_id = :user_id AND is_solved = true",
+        {"user_id": "user-42"},
+    ),
+    (
+        "user solutions with code",
+        "code_blobs",
+        "SELECT s.*, b.data, b.compression FROM quest_solutions s JOIN code_blobs b ON b.hash = s.code_hash "
+        "WHERE s.user_id = :user_id",
+        {"user_id": "user-42"},
+    ),
+    (
+        "already solved check",
+        "quest_solutions",
+        "SELECT id FROM quest_solutions WHERE quest_id = :quest_id AND user_id = :user_id LIMIT 1",
+        {"quest_id": "quest-7", "user_id": "user-42"},
+    ),
+    (
+        "comments of a quest",
+        "quest_comments",
+        "SELECT comment, date_added, user_id FROM quest_comments WHERE quest_id = :quest_id ORDER BY date_added DESC",
+        {"quest_id": "quest-7"},
+    ),
+]
+
+# Listing pages, built by the same code as the routes: (name, query parameters, language)
+LISTING_QUERIES = [
+    ("catalog first page", {}, None),
+    ("catalog page by language", {}, "Python"),
+    ("catalog page by language after a cursor", {"cursor": "WyIyMDI0LTA2LTAxVDAwOjAwOjAwIiwgInF1ZXN0LTUwMCJd"}, "Python"),
+]
+
+# Search pages, built by the same code as the route: (name, query parameters)
+SEARCH_QUERIES = [
+    ("quest search", {"q": "quest 4242"}),
+    ("quest search by language", {"q": "quest 4242", "language": "Python"}),
+]
+
+SEED_SQL = [
+    """
+    INSERT INTO coding_quests (id, language, difficulty, quest_name, solved_times, quest_author,
+                               date_added, last_modified, condition, function_template, xp, type, is_active)
+    SELECT 'quest-' || i,
+           (ARRAY['Python', 'JavaScript', 'C++', 'Java'])[1 + i % 4],
+           (ARRAY['Easy', 'Medium', 'Hard'])[1 + i % 3],
+           'Quest ' || i, 0, 'author', TIMESTAMP '2024-01-01' + i * INTERVAL '1 hour',
+           TIMESTAMP '2024-01-01' + i * INTERVAL '1 hour', 'condition', 'template',
+           (ARRAY['30', '60', '100'])[1 + i % 3]::xp_points, 'Basic', true
+    FROM generate_series(1, :quests) AS i
+    """,
+    """
+    INSERT INTO code_blobs (hash, data, compression, size, date_added)
+    SELECT 'blob-' || i, convert_to('def solve(): return ' || i, 'UTF8'), 'none', 20 + length(i::text),
+           TIMESTAMP '2024-01-01'
+    FROM generate_series(1, :blobs) AS i
+    """,
+    """
+    INSERT INTO quest_solutions (id, quest_id, user_id, code_hash, language, tests_passed, tests_failed,
+                                 is_solved, date_added)
+    SELECT 'solution-' || i, 'quest-' || (1 + i % :quests), 'user-' || (i % :users),
+           'blob-' || (1 + i % :blobs), 'Python', i % 5, 5 - i % 5, i % 5 = 0,
+           TIMESTAMP '2024-01-01' + i * INTERVAL '1 second'
+    FROM generate_series(1, :solutions) AS i
+    """,
+    """
+    INSERT INTO quest_comments (id, quest_id, user_id, comment, date_added)
+    SELECT 'comment-' || i, 'quest-' || (1 + i % :quests), 'user-' || (i % :users), 'comment',
+           TIMESTAMP '2024-01-01' + i * INTERVAL '1 minute'
+    FROM generate_series(1, :comments) AS i
+    """,
+]
+
+
+def plan_nodes(plan):
+    """Yield every node of an EXPLAIN (FORMAT JSON) plan tree."""
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+def check_plan(plan, table):
+    """Check that a plan reads ``table`` through an index.
+
+    Args:
+        plan (dict): Root node of the plan
+        table (str): Table that must not be scanned sequentially
+
+    Returns:
+        str: Description of the problem, or None if the plan is fine
+    """
+    scans = [node for node in plan_nodes(plan) if node.get("Relation Name") == table]
+    if not scans:
+        return f"{table} is not read"
+    for node in scans:
+        if node["Node Type"] == "Seq Scan":
+            return f"sequential scan on {table}"
+    return None
+
+
+def explain(conn, sql, params):
+    """Root node of the EXPLAIN (FORMAT JSON) plan of a query."""
+    result = conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"), params).scalar()
+    if isinstance(result, str):
+        result = json.loads(result)
+    return result[0]["Plan"]
+
+
+def listing_sql(args, language):
+    """SQL of a listing page, with its parameters rendered inline."""
+    query, _, _ = build_listing_query(MultiDict(args), language)
+    return str(query.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+def search_sql(args):
+    """SQL of a search page, with its parameters rendered inline."""
+    query, _ = build_search_query(MultiDict(args), 'postgresql')
+    return str(query.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+def run_checks(conn):
+    """EXPLAIN every hot query and collect the plans that scan sequentially.
+
+    Returns:
+        list: (query name, problem, plan) of the failed checks
+    """
+    checks = [(name, table, sql, params) for name, table, sql, params in HOT_QUERIES]
+    checks += [(name, "coding_quests", listing_sql(args, language), {}) for name, args, language in LISTING_QUERIES]
+    checks += [(name, "coding_quests", search_sql(args), {}) for name, args in SEARCH_QUERIES]
+
+    failures = []
+    for name, table, sql, params in checks:
+        plan = explain(conn, sql, params)
+        problem = check_plan(plan, table)
+        if problem:
+            failures.append((name, problem, plan))
+        else:
+            logging.info("Query plan of %s: %s", name, plan["Node Type"])
+    return failures
+
+
+@click.command('check-query-plans')
+@click.option('--database-url', default=None, help='Postgres database to seed (defaults to the app database).')
+@click.option('--quests', default=5000, show_default=True, help='Number of seeded quests.')
+@click.option('--users', default=100000, show_default=True, help='Number of distinct seeded users.')
+@click.option('--solutions', default=2000000, show_default=True, help='Number of seeded solutions.')
+@click.option('--comments', default=200000, show_default=True, help='Number of seeded comments.')
+@with_appcontext
+def check_query_plans_command(database_url, quests, users, solutions, comments):
+    """Seed a Postgres schema and fail if a hot query plans a sequential scan.
+
+    The tables are created from the models in a separate schema, filled with
+    generate_series and analyzed, so the planner sees realistic statistics.
+    The schema is dropped afterwards.
+    """
+    engine = create_engine(database_url) if database_url else db.engine
+    if engine.dialect.name != 'postgresql':
+        raise click.ClickException("check-query-plans needs a Postgres database")
+
+    # Resubmissions share their code, a quarter of the solutions have distinct code
+    counts = {"quests": quests, "users": users, "solutions": solutions, "comments": comments,
+              "blobs": max(1, solutions // 4)}
+    failures = []
+    with engine.connect() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {CHECK_SCHEMA} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {CHECK_SCHEMA}"))
+        conn.commit()
+        try:
+            conn.execute(text(f"SET search_path TO {CHECK_SCHEMA}"))
+            db.metadata.create_all(conn)
+
+            started = time.monotonic()
+            for sql in SEED_SQL:
+                conn.execute(text(sql), counts)
+            conn.commit()
+            conn.execute(text("ANALYZE coding_quests, code_blobs, quest_solutions, quest_comments"))
+            click.echo(f"Seeded {solutions} solutions in {time.monotonic() - started:.1f}s")
+
+            failures = run_checks(conn)
+        finally:
+            conn.rollback()
+            # The connection goes back to the pool, restore its search path
+            conn.execute(text("RESET search_path"))
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {CHECK_SCHEMA} CASCADE"))
+            conn.commit()
+
+    for name, problem, plan in failures:
+        click.echo(f"FAIL {name}: {problem}\n{json.dumps(plan, indent=2)}", err=True)
+    if failures:
+        raise SystemExit(1)
+    click.echo(f"All {len(HOT_QUERIES) + len(LISTING_QUERIES) + len(SEARCH_QUERIES)} hot queries use indexes")
@@ -0,0 +1,375 @@
+import io
+import json
+import logging
+import sys
+import uuid
+from datetime import datetime
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import insert, select
+from extensions import db
+from models import Quest, QuestTestCase
+from catalog_cache import bump_catalog_version
+from quest_tests import TestCaseError, parse_test_cases
+from services import resolve_usernames
+from streaming import open_stream
+
+# Fields every imported quest must have, as in add_new_quest. The text
+# fields may be empty strings, like in the model and the export.
+REQUIRED_FIELDS = ("language", "difficulty", "quest_name", "quest_author")
+REQUIRED_TEXT_FIELDS = ("condition", "function_template")
+
+# Columns written by an import, in COPY order
+QUEST_COLUMNS = (
+    "id", "language", "difficulty", "quest_name", "solved_times", "quest_author", "date_added",
+    "last_modified", "condition", "function_template", "example_solution", "xp", "type", "is_active",
+    "quest_comments",
+)
+TEST_CASE_COLUMNS = ("id", "quest_id", "position", "input", "output", "weight", "is_sample")
+
+# Max errors listed in an import summary, the others are only counted
+MAX_REPORTED_ERRORS = 100
+
+# XP of each difficulty, as in add_new_quest
+XP_BY_DIFFICULTY = {"Easy": "30", "Medium": "60"}
+DEFAULT_XP = "100"
+
+
+class QuestImportError(ValueError):
+    """An NDJSON line that cannot be imported."""
+
+
+def _parse_datetime(value, field):
+    if value is None:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise QuestImportError(f"Invalid {field}")
+
+
+def parse_quest(data):
+    """Validate one imported quest and turn it into table rows.
+
+    Accepts the fields of ``add_new_quest`` (test cases as a ``tests`` list
+    or ``input_<i>``/``output_<i>`` keys) plus the optional ``id``,
+    ``date_added``, ``last_modified``, ``solved_times``, ``is_active`` (a
+    JSON boolean) and ``xp`` (one of the difficulty XP values, derived from
+    the difficulty when missing) written by the export.
+
+    Args:
+        data (dict): Decoded NDJSON line
+
+    Returns:
+        tuple: (quest row, test case rows); ``quest_author`` is still the raw value
+
+    Raises:
+        QuestImportError: If the quest is invalid
+    """
+    if not isinstance(data, dict):
+        raise QuestImportError("Expected a JSON object")
+    missing = [field for field in REQUIRED_FIELDS if not isinstance(data.get(field), str) or not data[field]]
+    missing += [field for field in REQUIRED_TEXT_FIELDS if not isinstance(data.get(field), str)]
+    if missing:
+        raise QuestImportError(f"Missing or invalid fields: {', '.join(missing)}")
+    if data.get("tests") is not None and not isinstance(data["tests"], list):
+        raise QuestImportError("Invalid tests")
+
+    try:
+        test_cases = parse_test_cases(data)
+    except TestCaseError as e:
+        raise QuestImportError(str(e))
+
+    try:
+        solved_times = int(data.get("solved_times") or 0)
+    except (TypeError, ValueError):
+        raise QuestImportError("Invalid solved_times")
+
+    is_active = data.get("is_active", True)
+    if not isinstance(is_active, bool):
+        raise QuestImportError("Invalid is_active")
+
+    difficulty = data["difficulty"]
+    xp = data.get("xp")
+    if xp is None:
+        xp = XP_BY_DIFFICULTY.get(difficulty, DEFAULT_XP)
+    elif isinstance(xp, bool) or str(xp) not in (*XP_BY_DIFFICULTY.values(), DEFAULT_XP):
+        raise QuestImportError("Invalid xp")
+    date_added = _parse_datetime(data.get("date_added"), "date_added") or datetime.now()
+    quest_id = data.get("id") or str(uuid.uuid4())
+    quest = {
+        "id": str(quest_id),
+        "language": data["language"],
+        "difficulty": difficulty,
+        "quest_name": data["quest_name"],
+        "solved_times": solved_times,
+        "quest_author": data["quest_author"],
+        "date_added": date_added,
+        "last_modified": _parse_datetime(data.get("last_modified"), "last_modified") or date_added,
+        "condition": data["condition"],
+        "function_template": data["function_template"],
+        "example_solution": data.get("example_solution", ""),
+        "xp": str(xp),
+        "type": data.get("type", "Basic"),
+        "is_active": is_active,
+        "quest_comments": [],
+    }
+    tests = [
+        {
+            "id": str(uuid.uuid4()),
+            "quest_id": quest["id"],
+            "position": test_case.position,
+            "input": test_case.input,
+            "output": test_case.output,
+            "weight": test_case.weight,
+            "is_sample": test_case.is_sample,
+        }
+        for test_case in test_cases
+    ]
+    return quest, tests
+
+
+def _copy_value(value):
+    # CSV for COPY: unquoted empty is NULL, everything else is quoted
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        value = "t" if value else "f"
+    elif isinstance(value, datetime):
+        value = value.isoformat()
+    elif isinstance(value, (list, dict)):
+        value = json.dumps(value)
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def _copy_rows(cursor, table, columns, rows):
+    buffer = "".join(",".join(_copy_value(row[column]) for column in columns) + "\n" for row in rows)
+    cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", io.StringIO(buffer))
+
+
+def insert_chunk(quests, tests):
+    """Insert quests and their test cases in the current transaction.
+
+    Uses COPY on PostgreSQL and a multi-row INSERT elsewhere.
+
+    Args:
+        quests (list): Quest rows
+        tests (list): Test case rows
+    """
+    connection = db.session.connection()
+    if connection.dialect.name == 'postgresql':
+        cursor = connection.connection.dbapi_connection.cursor()
+        try:
+            _copy_rows(cursor, Quest.__tablename__, QUEST_COLUMNS, quests)
+            if tests:
+                _copy_rows(cursor, QuestTestCase.__tablename__, TEST_CASE_COLUMNS, tests)
+        finally:
+            cursor.close()
+        return
+    db.session.execute(insert(Quest.__table__), quests)
+    if tests:
+        db.session.execute(insert(QuestTestCase.__table__), tests)
+
+
+def _import_chunk(chunk, resolve_authors, summary):
+    """Import one chunk of parsed quests in a single transaction.
+
+    Quests whose id is repeated in the chunk or already stored are reported
+    and skipped. If the insert still fails, the quests are inserted one by
+    one to report the lines at fault and keep the others.
+    """
+    if resolve_authors:
+        # One batched lookup for all the authors of the chunk
+        usernames = resolve_usernames([quest["quest_author"] for _, quest, _ in chunk], default=None)
+        resolved = []
+        for line, quest, tests in chunk:
+            username = usernames[quest["quest_author"]]
+            if username:
+                resolved.append((line, {**quest, "quest_author": username}, tests))
+            else:
+                _add_error(summary, line, "User lookup failed")
+        chunk = resolved
+
+    ids = {quest["id"] for _, quest, _ in chunk}
+    existing = set(db.session.scalars(select(Quest.id).where(Quest.id.in_(ids)))) if ids else set()
+    unique = []
+    for line, quest, tests in chunk:
+        if quest["id"] in existing:
+            _add_error(summary, line, f"Duplicate id {quest['id']}")
+        else:
+            existing.add(quest["id"])
+            unique.append((line, quest, tests))
+    chunk = unique
+    if not chunk:
+        db.session.rollback()
+        return
+
+    try:
+        insert_chunk([quest for _, quest, _ in chunk], [test for _, _, tests in chunk for test in tests])
+        bump_catalog_version()
+        db.session.commit()
+        summary["imported"] += len(chunk)
+        return
+    except Exception as e:
+        db.session.rollback()
+        logging.warning("Failed to import quests of lines %d-%d, retrying one by one: %s",
+                        chunk[0][0], chunk[-1][0], e)
+
+    for line, quest, tests in chunk:
+        try:
+            insert_chunk([quest], tests)
+            bump_catalog_version()
+            db.session.commit()
+            summary["imported"] += 1
+        except Exception as e:
+            db.session.rollback()
+            logging.error("Failed to import the quest of line %d: %s", line, e, exc_info=True)
+            _add_error(summary, line, "Failed to insert the quest")
+
+
+def _add_error(summary, line, error):
+    summary["failed"] += 1
+    if len(summary["errors"]) < MAX_REPORTED_ERRORS:
+        summary["errors"].append({"line": line, "error": error})
+
+
+def import_quests(lines, resolve_authors=True, chunk_size=None):
+    """Import quests from NDJSON lines.
+
+    Lines are validated as they are read and inserted in chunks of
+    ``chunk_size`` quests, one transaction per chunk. Errors are reported by
+    line: a quest that cannot be inserted does not fail the rest of its
+    chunk. Blank lines are skipped.
+
+    Args:
+        lines (iterable): NDJSON lines (str or bytes), e.g. a file or a request stream
+        resolve_authors (bool): Resolve ``quest_author`` user IDs to usernames
+            like ``add_new_quest``, or store them as given (e.g. from an export)
+        chunk_size (int): Quests per transaction, BULK_IMPORT_CHUNK_SIZE by default
+
+    Returns:
+        dict: ``imported`` and ``failed`` counts and the first ``errors``
+    """
+    chunk_size = chunk_size or current_app.config["BULK_IMPORT_CHUNK_SIZE"]
+    summary = {"imported": 0, "failed": 0, "errors": []}
+    chunk = []
+    for number, line in enumerate(lines, start=1):
+        if isinstance(line, bytes):
+            line = line.decode("utf-8", "replace")
+        if not line.strip():
+            continue
+        try:
+            quest, tests = parse_quest(json.loads(line))
+        except json.JSONDecodeError:
+            _add_error(summary, number, "Invalid JSON")
+            continue
+        except QuestImportError as e:
+            _add_error(summary, number, str(e))
+            continue
+        chunk.append((number, quest, tests))
+        if len(chunk) >= chunk_size:
+            _import_chunk(chunk, resolve_authors, summary)
+            chunk = []
+    if chunk:
+        _import_chunk(chunk, resolve_authors, summary)
+    return summary
+
+
+def export_query():
+    """Quests joined with their test cases, ordered so each quest's rows are consecutive."""
+    return (
+        select(Quest.__table__, QuestTestCase.input.label("test_input"), QuestTestCase.output.label("test_output"),
+               QuestTestCase.weight.label("test_weight"), QuestTestCase.is_sample.label("test_is_sample"),
+               QuestTestCase.position.label("test_position"))
+        .outerjoin(QuestTestCase.__table__, QuestTestCase.quest_id == Quest.id)
+        .order_by(Quest.id, QuestTestCase.position)
+    )
+
+
+def _export_object(row):
+    mapping = row._mapping
+    return {
+        "id": mapping["id"],
+        "language": mapping["language"],
+        "difficulty": mapping["difficulty"],
+        "quest_name": mapping["quest_name"],
+        "quest_author": mapping["quest_author"],
+        "condition": mapping["condition"],
+        "function_template": mapping["function_template"],
+        "example_solution": mapping["example_solution"],
+        "xp": mapping["xp"],
+        "type": mapping["type"],
+        "is_active": mapping["is_active"],
+        "solved_times": mapping["solved_times"],
+        "date_added": mapping["date_added"].isoformat() if mapping["date_added"] else None,
+        "last_modified": mapping["last_modified"].isoformat() if mapping["last_modified"] else None,
+        "tests": [],
+    }
+
+
+def export_lines(chunk_size=None):
+    """Export every quest and its test cases as NDJSON lines.
+
+    The rows are read through a server-side cursor (see
+    ``streaming.open_stream``), so memory does not grow with the catalog.
+    The query runs when this is called; the lines are produced lazily.
+
+    Args:
+        chunk_size (int): Rows fetched per round trip, STREAM_CHUNK_SIZE by default
+
+    Returns:
+        tuple: (generator of str lines, connection to close once consumed)
+    """
+    chunk_size = chunk_size or current_app.config["STREAM_CHUNK_SIZE"]
+    conn, result = open_stream(export_query(), chunk_size=chunk_size)
+
+    def generate():
+        quest = None
+        for chunk in result.partitions(chunk_size):
+            lines = []
+            for row in chunk:
+                if quest is None or quest["id"] != row.id:
+                    if quest is not None:
+                        lines.append(json.dumps(quest) + "\n")
+                    quest = _export_object(row)
+                if row.test_position is not None:
+                    quest["tests"].append({
+                        "input": row.test_input,
+                        "output": row.test_output,
+                        "weight": row.test_weight,
+                        "is_sample": row.test_is_sample,
+                    })
+            if lines:
+                yield "".join(lines)
+        if quest is not None:
+            yield json.dumps(quest) + "\n"
+
+    return generate(), conn
+
+
+@click.command('import-quests')
+@click.argument('source', type=click.File('rb'), default='-')
+@click.option('--resolve-authors/--raw-authors', default=True, show_default=True,
+              help='Resolve quest_author user IDs to usernames, or keep them as given (exports).')
+@click.option('--chunk-size', type=int, default=None, help='Quests per transaction (default BULK_IMPORT_CHUNK_SIZE).')
+@with_appcontext
+def import_quests_command(source, resolve_authors, chunk_size):
+    """Import quests from an NDJSON file (or stdin)."""
+    summary = import_quests(source, resolve_authors=resolve_authors, chunk_size=chunk_size)
+    sys.stdout.write(json.dumps(summary, indent=2) + "\n")
+    if summary["failed"]:
+        sys.exit(1)
+
+
+@click.command('export-quests')
+@click.argument('target', type=click.File('w'), default='-')
+@with_appcontext
+def export_quests_command(target):
+    """Export every quest as NDJSON to a file (or stdout)."""
+    lines, conn = export_lines()
+    try:
+        for chunk in lines:
+            target.write(chunk)
+    finally:
+        conn.close()
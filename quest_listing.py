@@ -0,0 +1,195 @@
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import and_, or_, select
+from models import Quest
+
+# Columns returned by default when listing quests
+SUMMARY_FIELDS = (
+    "id", "language", "difficulty", "quest_name", "solved_times", "quest_author",
+    "date_added", "last_modified", "xp", "type", "is_active",
+)
+
+# Columns that can be requested with fields=
+LISTABLE_FIELDS = tuple(column.name for column in Quest.__table__.columns)
+
+# Filters pushed into SQL, by query parameter
+FILTERS = ("difficulty", "type", "is_active")
+
+
+class ListingError(ValueError):
+    """Raised for invalid listing parameters."""
+
+
+def parse_fields(value):
+    """Parse the fields= parameter of a listing.
+
+    Args:
+        value (str): "summary" (default), "full" or a comma separated list of columns
+
+    Returns:
+        tuple: Column names to select
+
+    Raises:
+        ListingError: If an unknown column is requested
+    """
+    if not value or value == "summary":
+        return SUMMARY_FIELDS
+    if value == "full":
+        return LISTABLE_FIELDS
+
+    fields = tuple(dict.fromkeys(field.strip() for field in value.split(",") if field.strip()))
+    unknown = [field for field in fields if field not in LISTABLE_FIELDS]
+    if unknown:
+        raise ListingError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+
+def parse_limit(value, default, maximum):
+    """Parse the limit= parameter of a listing.
+
+    Raises:
+        ListingError: If the limit is not a positive integer
+    """
+    if value is None:
+        return default
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ListingError("limit must be an integer")
+    if limit < 1:
+        raise ListingError("limit must be positive")
+    return min(limit, maximum)
+
+
+def encode_cursor(row):
+    """Opaque cursor pointing after ``row`` in (date_added, id) order."""
+    raw = json.dumps([row.date_added.isoformat(), row.id])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Decode a cursor from ``encode_cursor``.
+
+    Returns:
+        tuple: (date_added, id) of the last row of the previous page
+
+    Raises:
+        ListingError: If the cursor is malformed
+    """
+    try:
+        date_added, quest_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(date_added), quest_id
+    except (ValueError, TypeError):
+        raise ListingError("Invalid cursor")
+
+
+def build_filters(args, language=None):
+    """Build the WHERE clauses of a listing from its query parameters.
+
+    Args:
+        args (MultiDict): Request query parameters
+        language (str): Only list quests of this language
+
+    Returns:
+        list: SQLAlchemy filter expressions
+    """
+    table = Quest.__table__
+    clauses = []
+    if language is not None:
+        clauses.append(table.c.language == language)
+    for name in FILTERS:
+        value = args.get(name)
+        if value is None:
+            continue
+        if name == "is_active":
+            if value.lower() not in ("true", "false"):
+                raise ListingError("is_active must be true or false")
+            value = value.lower() == "true"
+        clauses.append(table.c[name] == value)
+    return clauses
+
+
+def build_full_listing_query(args, language=None):
+    """Build the query of a whole quest listing, without pagination.
+
+    Takes the fields and filters of a listing page, in the same order.
+
+    Args:
+        args (MultiDict): Request query parameters (fields and filters)
+        language (str): Only list quests of this language
+
+    Returns:
+        tuple: (select statement, selected field names)
+
+    Raises:
+        ListingError: If a parameter is invalid
+    """
+    table = Quest.__table__
+    fields = parse_fields(args.get("fields"))
+    query = (
+        select(*[table.c[name] for name in fields])
+        .where(*build_filters(args, language))
+        .order_by(table.c.date_added, table.c.id)
+    )
+    return query, fields
+
+
+def build_listing_query(args, language=None, default_limit=50, max_limit=200):
+    """Build the query of a quest listing page.
+
+    Pages are ordered by (date_added, id), which is stable while quests are
+    added, and continued with the cursor of the previous page. One extra
+    row is selected to know whether there is a next page.
+
+    Args:
+        args (MultiDict): Request query parameters (fields, limit, cursor and filters)
+        language (str): Only list quests of this language
+        default_limit (int): Page size when no limit is given
+        max_limit (int): Upper bound of the page size
+
+    Returns:
+        tuple: (select statement, selected field names, page size)
+
+    Raises:
+        ListingError: If a parameter is invalid
+    """
+    table = Quest.__table__
+    fields = parse_fields(args.get("fields"))
+    limit = parse_limit(args.get("limit"), default_limit, max_limit)
+
+    # The cursor columns are always selected, but only returned if requested
+    columns = list(dict.fromkeys(fields + ("date_added", "id")))
+    query = select(*[table.c[name] for name in columns]).where(*build_filters(args, language))
+
+    cursor = args.get("cursor")
+    if cursor:
+        date_added, quest_id = decode_cursor(cursor)
+        query = query.where(or_(
+            table.c.date_added > date_added,
+            and_(table.c.date_added == date_added, table.c.id > quest_id),
+        ))
+
+    query = query.order_by(table.c.date_added, table.c.id).limit(limit + 1)
+    return query, fields, limit
+
+
+def fetch_page(session, args, language=None, default_limit=50, max_limit=200):
+    """Fetch one page of a quest listing.
+
+    Args:
+        session (Session): Database session
+        args (MultiDict): Request query parameters
+        language (str): Only list quests of this language
+        default_limit (int): Page size when no limit is given
+        max_limit (int): Upper bound of the page size
+
+    Returns:
+        tuple: (list of quest dicts, cursor of the next page or None)
+    """
+    query, fields, limit = build_listing_query(args, language, default_limit, max_limit)
+    rows = session.execute(query).fetchall()
+
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    quests = [{name: row._mapping[name] for name in fields} for row in rows[:limit]]
+    return quests, next_cursor
@@ -0,0 +1,148 @@
+import base64
+import json
+import re
+from sqlalchemy import Float, and_, case, cast, func, literal_column, or_, select
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from models import Quest
+from quest_listing import SUMMARY_FIELDS, ListingError, build_filters, parse_limit
+
+# Text search configuration of the search_vector column (see models.py)
+SEARCH_CONFIG = "english"
+
+# Longest accepted search string, and most terms used by the fallback search
+MAX_QUERY_LENGTH = 200
+MAX_FALLBACK_TERMS = 8
+
+
+def encode_search_cursor(rank, quest_id):
+    """Opaque cursor pointing after a result in (rank desc, id) order."""
+    raw = json.dumps([rank, quest_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_search_cursor(cursor):
+    """Decode a cursor from ``encode_search_cursor``.
+
+    Returns:
+        tuple: (rank, id) of the last result of the previous page
+
+    Raises:
+        ListingError: If the cursor is malformed
+    """
+    try:
+        rank, quest_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(rank), str(quest_id)
+    except (ValueError, TypeError):
+        raise ListingError("Invalid cursor")
+
+
+def parse_query(value):
+    """Parse the q= parameter of a search.
+
+    Raises:
+        ListingError: If the search string is missing, too long or has no words
+    """
+    value = (value or "").strip()
+    if not value:
+        raise ListingError("q is required")
+    if len(value) > MAX_QUERY_LENGTH:
+        raise ListingError(f"q must be at most {MAX_QUERY_LENGTH} characters")
+    terms = re.findall(r"\w+", value.lower())
+    if not terms:
+        raise ListingError("q must contain a word")
+    return value, terms
+
+
+def match_and_rank(dialect, value, terms):
+    """Match condition and rank expression of a search.
+
+    On Postgres the search_vector column is matched against a web search
+    query (quoted phrases, ``or`` and ``-word``) through its GIN index and
+    ranked with ts_rank. Elsewhere every term must appear in the name or the
+    condition, and a term found in the name counts twice: a scan, good
+    enough for SQLite test runs.
+
+    Args:
+        dialect (str): Name of the database dialect
+        value (str): Search string
+        terms (list): Lowercase words of the search string
+
+    Returns:
+        tuple: (match condition, rank expression)
+    """
+    table = Quest.__table__
+    if dialect == 'postgresql':
+        vector = literal_column(f"{table.name}.search_vector", TSVECTOR)
+        query = func.websearch_to_tsquery(literal_column(f"'{SEARCH_CONFIG}'"), value)
+        return vector.op("@@")(query), cast(func.ts_rank(vector, query), Float)
+
+    name, condition = func.lower(table.c.quest_name), func.lower(table.c.condition)
+    terms = list(dict.fromkeys(terms))[:MAX_FALLBACK_TERMS]
+    match = and_(*[
+        or_(name.contains(term, autoescape=True), condition.contains(term, autoescape=True))
+        for term in terms
+    ])
+    rank = sum(
+        case((name.contains(term, autoescape=True), 2), else_=0)
+        + case((condition.contains(term, autoescape=True), 1), else_=0)
+        for term in terms
+    )
+    return match, cast(rank, Float)
+
+
+def build_search_query(args, dialect, default_limit=50, max_limit=200):
+    """Build the query of a page of search results.
+
+    Results are ordered by rank, best first, then by id, and continued
+    with the cursor of the previous page. One extra row is selected to know
+    whether there is a next page. Only the summary fields are returned.
+
+    Args:
+        args (MultiDict): Request query parameters (q, limit, cursor, language and the listing filters)
+        dialect (str): Name of the database dialect
+        default_limit (int): Page size when no limit is given
+        max_limit (int): Upper bound of the page size
+
+    Returns:
+        tuple: (select statement, page size)
+
+    Raises:
+        ListingError: If a parameter is invalid
+    """
+    table = Quest.__table__
+    value, terms = parse_query(args.get("q"))
+    limit = parse_limit(args.get("limit"), default_limit, max_limit)
+    match, rank = match_and_rank(dialect, value, terms)
+
+    query = (
+        select(*[table.c[name] for name in SUMMARY_FIELDS], rank.label("rank"))
+        .where(match, *build_filters(args, args.get("language")))
+    )
+
+    cursor = args.get("cursor")
+    if cursor:
+        last_rank, quest_id = decode_search_cursor(cursor)
+        query = query.where(or_(rank < last_rank, and_(rank == last_rank, table.c.id > quest_id)))
+
+    query = query.order_by(rank.desc(), table.c.id).limit(limit + 1)
+    return query, limit
+
+
+def fetch_search_page(session, args, default_limit=50, max_limit=200):
+    """Fetch one page of search results.
+
+    Args:
+        session (Session): Database session
+        args (MultiDict): Request query parameters
+        default_limit (int): Page size when no limit is given
+        max_limit (int): Upper bound of the page size
+
+    Returns:
+        tuple: (list of quest summaries with their rank, cursor of the next page or None)
+    """
+    query, limit = build_search_query(args, session.get_bind().dialect.name, default_limit, max_limit)
+    rows = session.execute(query).fetchall()
+
+    next_cursor = encode_search_cursor(rows[limit - 1].rank, rows[limit - 1].id) if len(rows) > limit else None
+    quests = [{name: row._mapping[name] for name in SUMMARY_FIELDS + ("rank",)} for row in rows[:limit]]
+    return quests, next_cursor
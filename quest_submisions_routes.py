@@ -1,13 +1,20 @@
+import json
 import logging
-import uuid, os, requests
+import time
+import uuid
 from dotenv import load_dotenv
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context, url_for
+from flask_jwt_extended import get_jwt_identity
 from extensions import db
 from services import token_required
 from sqlalchemy import text
-from models import Quest, QuestSolution
-
-from user_progress_func import update_xp
+from models import Quest, SubmissionJob
+from judge import JUDGE_MODES, judge_submission
+from judge_worker import enqueue_submission
+from streaming import stream_rows
+from db_routing import read_only
+from admission import acquire_slot, admit_user, check_queue, release_slot
+from code_store import decode_blob
 
 load_dotenv()
 
@@ -30,6 +37,7 @@ def quest_solution(quest_id):
     Raises:
         500: If there is an error during the submission process.
         400: If the request data is invalid or missing required fields.
+        429: If the user submits too fast or the judge is overloaded (see Retry-After).
         
     """
     
@@ -40,166 +48,157 @@ def quest_solution(quest_id):
     if not quest:
         return jsonify({"error": "Quest not found"}), 404
     
-    quest_xp = quest.xp
     user_id = request.json.get('user_id')
-    
-    # Max number of tests to run
-    MAX_TESTS = 10
-
-    # Hold all the results of the tests and generate UUID for execution
-    all_results = {}
-    successful_tests = 0
-    unsuccessful_tests = 0
-    zero_tests = [] # Hold the first example test input and putput
-    zero_tests_outputs = [] # Hold the first example after executing the user code (stdout & stderr)
     execution_id = str(uuid.uuid4())
-    
-    for i in range(MAX_TESTS):
-        input_attr = getattr(quest, f'input_{i}', None)
-        output_attr = getattr(quest, f"output_{i}", None)
-        
-        if not input_attr and not output_attr:
-            # If both input and output are None, break the loop
-            break
-        
-        if language != 'javascript':
-            data = {
-                "language": language,
-                "version": "*",
-                "files": [
-                    {
-                        "name": f"{user_id}_{quest_id}.{language}",
-                        "content": code
-                    }
-                ],
-                "stdin": "\n". join([x for x in input_attr.split(', ') if x.strip()]),
-                "args": [],
-                "compile_timeout": 5000,
-                "run_timeout": 2000,
-                "compile_memory_limit": -1,
-                "run_memory_limit": -1
-            }
-        else:
-            data = {
-                "language": language,
-                "version": "*",
-                "files": [
-                    {
-                        "name": f"{user_id}_{quest_id}.{language}",
-                        "content": code
-                    }
-                ],
-                "stdin": "",
-                "args": [", ".join([x for x in input_attr.split(', ') if x.strip()])],
-                "compile_timeout": 5000,
-                "run_timeout": 2000,
-                "compile_memory_limit": -1,
-                "run_memory_limit": -1,
-                "execution_id": execution_id
-            }
-            
-        
-        # Send the code to the Piston API for execution
-        exec_url = os.getenv("PISTON_API_URL") + '/api/v2/execute'
-        response = requests.post(exec_url, json=data)
-        
-        # Check if the response is successful and process the results
-        if response.status_code == 200:
-            current_output = response.json()['run']['stdout'].strip()
-            current_error = response.json()['run']['stderr'].strip()
-        
-            if str(current_output) == str(output_attr):
-                successful_tests += 1
-            else:
-                unsuccessful_tests += 1
-            
-            if i == 0:
-                zero_tests.append(input_attr)
-                zero_tests.append(output_attr)
-                zero_tests_outputs.append(current_output)
-                zero_tests_outputs.append(current_error)
-            
-            all_results.update({f"Test {i+1}": {"input": input_attr, 
-                                                "output": current_output, 
-                                                "expected_output": output_attr, 
-                                                "error": current_error}})
-
-        # If the response is not successful, handle the error    
-        else:
-            message = response.json().get('message', 'Unknown error')
-            logs_message = response.json()
-            successful_tests = 0
-            unsuccessful_tests = i
-            zero_tests.append("")
-            zero_tests.append("")
-            zero_tests_outputs.append("")
-            zero_tests_outputs.append("")
-            return jsonify({
-                "error": f"Execution failed: {message}",
-                "logs": logs_message
-            }), 500
-
-
-    # Check if there are any successful or unsuccessful tests
-    if not unsuccessful_tests:
-        message = 'Congratulations! Your solution is correct!'
-        
-        # Update the quest solved times
+
+    # Judge mode: "full", "fail_fast" or "sample" (only the sample tests)
+    mode = request.json.get('mode', current_app.config["JUDGE_DEFAULT_MODE"])
+    if mode not in JUDGE_MODES:
+        return jsonify({"error": f"Invalid mode, expected one of: {', '.join(JUDGE_MODES)}"}), 400
+
+    # Admission control: shed the submissions of users over their rate limit
+    admission_enabled = current_app.config["ADMISSION_ENABLED"]
+    if admission_enabled:
+        rejected = admit_user(get_jwt_identity())
+        if rejected:
+            return rejected
+
+    # Queue the submission for the judge workers and return immediately
+    if request.json.get('async', current_app.config["SUBMISSION_ASYNC"]):
+        rejected = check_queue() if admission_enabled else None
+        if rejected:
+            return rejected
         try:
-            quest.solved_times = (quest.solved_times or 0) + 1
-            db.session.commit()
+            enqueue_submission(execution_id, quest_id, user_id, code, language, mode)
         except Exception as e:
             db.session.rollback()
-        
-        # Update user XP if not already solved
-        # Check if the user has already solved this quest
-        existing_solution = db.session.query(QuestSolution).filter_by(
-            quest_id=quest_id,
-            user_id=user_id
-        ).first()
-        if existing_solution is None or not existing_solution.is_solved:
-            # Only update XP if the quest was not solved before
-            update_xp(user_id, quest_xp) 
-    elif successful_tests and unsuccessful_tests:
-        message = 'Your solution is partially correct! Try again!'
-    else:
-        message = 'Your solution is incorrect! Try again!'
-
-    # Store the solution in the database
+            logging.error("Error occurred while queueing submission: %s", e, exc_info=True)
+            return jsonify({"error": "An internal error has occurred."}), 500
+
+        status_url = url_for('submission.get_submission_status', execution_id=execution_id)
+        return jsonify({
+            "execution_id": execution_id,
+            "quest_id": quest_id,
+            "user_id": user_id,
+            "status": SubmissionJob.QUEUED,
+            "status_url": status_url,
+            "stream_url": url_for('submission.stream_submission_status', execution_id=execution_id),
+        }), 202, {"Location": status_url}
+
+    # Judge now if fewer than ADMISSION_MAX_IN_FLIGHT submissions are being judged
+    rejected = acquire_slot(execution_id) if admission_enabled else None
+    if rejected:
+        return rejected
     try:
-        new_solution = QuestSolution(
-            quest_id=quest_id,
-            user_id=user_id,
-            code=code,
-            language=language,
-            tests_passed=successful_tests,
-            tests_failed=unsuccessful_tests,
-            is_solved=(successful_tests == MAX_TESTS)
-        )
-        db.session.add(new_solution)
-        db.session.commit()
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({"error": "Failed to store solution in the database"}), 500
-    
-    # Return the results of the submission
-    return jsonify({
-        "execution_id": execution_id,
-        "quest_id": quest_id,
-        "user_id": user_id,
-        "successful_tests": successful_tests,
-        "unsuccessful_tests": unsuccessful_tests,
-        "message": message,
-        "zero_tests": zero_tests[0],
-        "zero_tests_outputs": zero_tests_outputs[0],
-    }), 200
-    
+        result, status_code = judge_submission(quest, code, language, user_id, execution_id, mode=mode)
+    finally:
+        if admission_enabled:
+            release_slot(execution_id)
+    return jsonify(result), status_code
+
+# Get the status of a queued submission
+@quests_submissions_bp.route('/submit/status/<execution_id>', methods=['GET'])
+@token_required
+def get_submission_status(execution_id):
+    """Get the status of a queued submission.
+
+    Args:
+        execution_id (str): The execution ID returned when the submission was queued.
+
+    Returns:
+        JSON: Job status, per-test progress and the final result once judged.
+    """
+    job = db.session.get(SubmissionJob, execution_id)
+    if not job:
+        return jsonify({"error": "Submission not found"}), 404
+    return jsonify(job.to_dict()), 200
+
+# Stream the progress of a queued submission as Server-Sent Events
+@quests_submissions_bp.route('/submit/status/<execution_id>/stream', methods=['GET'])
+@token_required
+def stream_submission_status(execution_id):
+    """Stream the progress of a queued submission as Server-Sent Events.
+
+    Emits a ``test`` event per completed test, a ``status`` event on every
+    status change and a final ``result`` event with the submission result.
+
+    Args:
+        execution_id (str): The execution ID returned when the submission was queued.
+
+    Returns:
+        text/event-stream: Progress events of the submission.
+    """
+    if not db.session.get(SubmissionJob, execution_id):
+        return jsonify({"error": "Submission not found"}), 404
+
+    poll_interval = current_app.config["JUDGE_WORKER_POLL_INTERVAL"]
+    stream_timeout = current_app.config["JUDGE_SSE_TIMEOUT"]
+
+    def generate():
+        sent_tests = 0
+        status = None
+        deadline = time.monotonic() + stream_timeout
+        while time.monotonic() < deadline:
+            job = db.session.get(SubmissionJob, execution_id)
+            for progress in (job.progress or [])[sent_tests:]:
+                yield f"event: test\ndata: {json.dumps(progress)}\n\n"
+                sent_tests += 1
+            if job.status != status:
+                status = job.status
+                yield f"event: status\ndata: {json.dumps({'status': status})}\n\n"
+            if job.is_finished:
+                yield f"event: result\ndata: {json.dumps(job.to_dict())}\n\n"
+                return
+            # End the read transaction so the next poll sees new progress
+            db.session.rollback()
+            time.sleep(poll_interval)
+        yield "event: timeout\ndata: {}\n\n"
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def stream_solutions(where, params, include_code_default):
+    """Stream the solutions matching a condition, with or without their code.
+
+    The code is stored once per distinct content in code_blobs (see
+    code_store.py). It is only joined and decompressed when the
+    ``include_code`` query parameter (or ``include_code_default``) asks for it.
+
+    Args:
+        where (str): SQL condition on quest_solutions
+        params (dict): Bound parameters of the condition
+        include_code_default (bool): Whether the code is returned without include_code
+
+    Returns:
+        Response: The streaming response
+    """
+    include_code = request.args.get("include_code", str(include_code_default)).lower() == "true"
+    if not include_code:
+        return stream_rows(text(f"SELECT * FROM quest_solutions WHERE {where}"), params)
+
+    def serialize(row):
+        solution = dict(row._mapping)
+        solution["code"] = decode_blob(solution.pop("code_data"), solution.pop("code_compression"))
+        return solution
+
+    return stream_rows(
+        text(
+            "SELECT s.*, b.data AS code_data, b.compression AS code_compression "
+            f"FROM quest_solutions s JOIN code_blobs b ON b.hash = s.code_hash WHERE {where}"
+        ),
+        params,
+        serialize=serialize,
+    )
+
 # Get all solutions for a specific user
 @quests_submissions_bp.route('/solutions/<user_id>', methods=['GET'])
 @token_required
+@read_only
 def get_user_solutions(user_id):
     """Get all solutions submitted by a specific user.
     
+    The code of the solutions is only read with ``include_code=true``.
+
     Args:
         user_id (str): The ID of the user.
         
@@ -210,13 +209,7 @@ def get_user_solutions(user_id):
         500: If there is an error during the retrieval process.
     """
     try:
-        result = db.session.execute(
-            text("SELECT * FROM quest_solutions WHERE user_id = :user_id"),
-            {'user_id': user_id}
-        )
-        solutions = [dict(row._mapping) for row in result.fetchall()]
-        
-        return jsonify(solutions), 200
+        return stream_solutions("user_id = :user_id", {'user_id': user_id}, include_code_default=False)
     except Exception as e:
         logging.error("Error occurred while retrieving user solutions: %s", e, exc_info=True)
         return jsonify({"error": "An internal error has occurred."}), 500
@@ -224,6 +217,7 @@ def get_user_solutions(user_id):
 # Get all correct solutions by user_id
 @quests_submissions_bp.route('/correct_solutions/<user_id>', methods=['GET'])
 @token_required
+@read_only
 def get_quest_solutions(user_id):
     """Get all correct solutions for a specific quest by user_id.
     
@@ -232,19 +226,15 @@ def get_quest_solutions(user_id):
         user_id (str): The ID of the user.
         
     Returns:
-        JSON: List of correct solutions for the quest by the user.
+        JSON: List of correct solutions for the quest by the user, with
+        their code unless ``include_code=false``.
         
     Raises:
         500: If there is an error during the retrieval process.
     """
     try:
-        result = db.session.execute(
-            text("SELECT * FROM quest_solutions WHERE user_id = :user_id AND is_solved = true"),
-            {'user_id': user_id}
-        )
-        solutions = [dict(row._mapping) for row in result.fetchall()]
-        
-        return jsonify(solutions), 200
+        return stream_solutions("user_id = :user_id AND is_solved = true", {'user_id': user_id},
+                                include_code_default=True)
     except Exception as e:
         logging.error("Error occurred while retrieving correct solutions: %s", e, exc_info=True)
         return jsonify({"error": "An internal error has occurred."}), 500
\ No newline at end of file
@@ -0,0 +1,153 @@
+from extensions import db
+from models import QuestTestCase
+
+
+class TestCaseError(ValueError):
+    """Invalid test cases in request data."""
+
+
+def _legacy_positions(data):
+    """Positions of the input_<i>/output_<i> keys present in request data."""
+    positions = set()
+    for key in data:
+        prefix, _, index = key.partition("_")
+        if prefix in ("input", "output") and index.isdigit():
+            positions.add(int(index))
+    return sorted(positions)
+
+
+def _parse_weight(value):
+    """Weight of a test: a positive int, or a str of one."""
+    if isinstance(value, str) and value.strip().isdigit():
+        value = int(value)
+    if not isinstance(value, int) or isinstance(value, bool) or value < 1:
+        raise TestCaseError("Test weights must be positive integers")
+    return value
+
+
+def parse_test_cases(data):
+    """Read the test cases of a quest from request data.
+
+    Accepts either a ``tests`` list of ``{"input", "output", "weight",
+    "is_sample"}`` objects or the legacy ``input_<i>``/``output_<i>`` keys.
+    Like the judge, reading stops at the first test without input and
+    output. The null test (position 0) is a sample unless stated otherwise.
+
+    Args:
+        data (dict): Request data
+
+    Returns:
+        list: New ``QuestTestCase`` objects in test order
+
+    Raises:
+        TestCaseError: If a test is not an object or has an invalid weight
+    """
+    if data.get("tests") is not None:
+        raw_tests = data["tests"]
+    else:
+        positions = _legacy_positions(data)
+        count = positions[-1] + 1 if positions else 0
+        raw_tests = [
+            {"input": data.get(f"input_{i}", ""), "output": data.get(f"output_{i}", "")}
+            for i in range(count)
+        ]
+
+    test_cases = []
+    for position, test in enumerate(raw_tests):
+        if not isinstance(test, dict):
+            raise TestCaseError("Each test must be an object")
+        if not test.get("input") and not test.get("output"):
+            break
+        test_cases.append(QuestTestCase(
+            position=position,
+            input=test.get("input"),
+            output=test.get("output"),
+            weight=_parse_weight(test.get("weight", 1)),
+            is_sample=bool(test.get("is_sample", position == 0)),
+        ))
+    return test_cases
+
+
+def update_test_cases(quest, data):
+    """Apply the test case changes of an edit request to a quest.
+
+    A ``tests`` list replaces all test cases. Legacy ``input_<i>`` and
+    ``output_<i>`` keys update the test at position ``i``, adding it if needed;
+    a test can only be added right after the last one.
+
+    Args:
+        quest (Quest): Quest being edited
+        data (dict): Request data
+
+    Returns:
+        bool: True if any test case changed
+
+    Raises:
+        TestCaseError: If the tests are invalid or an added test leaves a gap
+    """
+    if data.get("tests") is not None:
+        # Delete the old tests first, their positions are unique per quest
+        quest.test_cases = []
+        db.session.flush()
+        quest.test_cases = parse_test_cases({"tests": data["tests"]})
+        return True
+
+    positions = _legacy_positions(data)
+    if not positions:
+        return False
+
+    by_position = {test_case.position: test_case for test_case in quest.test_cases}
+    for i in positions:
+        test_case = by_position.get(i)
+        if test_case is None:
+            if i > 0 and i - 1 not in by_position:
+                raise TestCaseError(f"Test {i} cannot be added before test {i - 1}")
+            test_case = by_position[i] = QuestTestCase(position=i, input="", output="", is_sample=i == 0)
+            quest.test_cases.append(test_case)
+        if f"input_{i}" in data:
+            test_case.input = data[f"input_{i}"]
+        if f"output_{i}" in data:
+            test_case.output = data[f"output_{i}"]
+    return True
+
+
+def legacy_test_fields(test_cases, minimum=10):
+    """Render test cases as the legacy input_<i>/output_<i> fields.
+
+    Args:
+        test_cases (list): ``QuestTestCase`` objects in test order
+        minimum (int): Number of fields always rendered, missing ones are empty
+
+    Returns:
+        dict: ``input_<i>`` and ``output_<i>`` values
+    """
+    by_position = {test_case.position: test_case for test_case in test_cases}
+    count = max([minimum] + [position + 1 for position in by_position])
+    fields = {}
+    for i in range(count):
+        test_case = by_position.get(i)
+        fields[f"input_{i}"] = test_case.input if test_case else ""
+    for i in range(count):
+        test_case = by_position.get(i)
+        fields[f"output_{i}"] = test_case.output if test_case else ""
+    return fields
+
+
+def judged_test_cases(quest):
+    """Test cases the judge runs, up to the first one without input and output.
+
+    A missing position counts as an empty test, like in the legacy format.
+
+    Args:
+        quest (Quest): The quest being solved
+
+    Returns:
+        list: ``QuestTestCase`` objects in test order
+    """
+    test_cases = []
+    for test_case in quest.test_cases:
+        if test_case.position != len(test_cases) or (not test_case.input and not test_case.output):
+            # If both input and output are empty, stop collecting tests
+            break
+        test_cases.append(test_case)
+    return test_cases
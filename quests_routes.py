@@ -1,36 +1,121 @@
 import app
-import os, requests, traceback
-from flask import Blueprint, request, jsonify, current_app
+import traceback
+from flask import Blueprint, Response, request, jsonify, current_app, url_for, stream_with_context
 from extensions import db
-from services import token_required
-from sqlalchemy import text
+from services import token_required, admin_required, resolve_usernames
+import judge_cache
+from sqlalchemy import select
 from models import Quest, ReportedQuest
+from quest_listing import ListingError, build_full_listing_query, fetch_page
+from quest_search import fetch_search_page
+from quest_tests import TestCaseError, legacy_test_fields, parse_test_cases, update_test_cases
+from catalog_cache import bump_catalog_version, cached_catalog_response
+from streaming import NDJSON_MIMETYPE, stream_rows, wants_ndjson
+from quest_bulk import export_lines, import_quests
+from db_routing import read_only
 from dotenv import load_dotenv
 
 load_dotenv()
 
-AUTH_SERVICE_URL = os.getenv("AUTH_SERVICE_URL")
-ADMIN_SERVICE_URL = os.getenv("ADMIN_SERVICE_URL")
-INTERNAL_SECRET = os.getenv("INTERNAL_SECRET")
 GENERIC_ERROR_MESSAGE = "An internal error has occurred."
 
 GENERIC_ERROR_MESSAGE = "An internal error has occurred."
 
 quests_bp = Blueprint('quests', __name__)
 
+def quest_listing_response(language=None):
+    """Build the response of a paginated quest listing.
+
+    The body is the list of quests of the page. The cursor of the next page
+    is returned in the X-Next-Cursor header and as a Link rel="next".
+    """
+    try:
+        quests, next_cursor = fetch_page(
+            db.session,
+            request.args,
+            language,
+            default_limit=current_app.config["QUESTS_PAGE_SIZE"],
+            max_limit=current_app.config["QUESTS_MAX_PAGE_SIZE"],
+        )
+    except ListingError as e:
+        return jsonify({"error": str(e)}), 400
+    return page_response(quests, next_cursor)
+
+def page_response(quests, next_cursor):
+    """Response of a page of quests, with the cursor of the next page in the headers."""
+    response = jsonify(quests)
+    if next_cursor:
+        args = request.args.to_dict()
+        args["cursor"] = next_cursor
+        response.headers["X-Next-Cursor"] = next_cursor
+        response.headers["Link"] = f'<{url_for(request.endpoint, **(request.view_args or {}), **args)}>; rel="next"'
+    return response, 200
+
+def quest_listing_stream(language=None):
+    """Stream the whole quest listing as NDJSON, with the fields and filters of a page."""
+    try:
+        query, fields = build_full_listing_query(request.args, language)
+    except ListingError as e:
+        return jsonify({"error": str(e)}), 400
+    return stream_rows(query, serialize=lambda row: {name: row._mapping[name] for name in fields}, ndjson=True)
+
 # Get all quests
 @quests_bp.route('/quests', methods=['GET'])
 @token_required
+@read_only
 def get_quests():
-    """Get all quests from the database.
+    """Get a page of quests from the database.
+
+    Query parameters:
+        limit: Page size (QUESTS_PAGE_SIZE by default)
+        cursor: Cursor of the next page from a previous response
+        fields: "summary" (default), "full" or a comma separated list of columns
+        difficulty, type, is_active: Filters
+        format: "ndjson" streams all matching quests instead of a page
+
+    Returns:
+        JSON: List of quests, next page cursor in the X-Next-Cursor header
+    """
+    try:
+        if wants_ndjson():
+            return quest_listing_stream()
+        return cached_catalog_response(quest_listing_response)
+    except Exception as e:
+        app.logger.error(traceback.format_exc())
+        return jsonify({"error": "An internal error has occurred."}), 500
+
+# Search quests
+@quests_bp.route('/quests/search', methods=['GET'])
+@token_required
+@read_only
+def search_quests():
+    """Full-text search of the quests by name and condition.
+
+    Query parameters:
+        q: Search string (on Postgres: quoted phrases, "or" and -word are supported)
+        limit: Page size (QUESTS_PAGE_SIZE by default)
+        cursor: Cursor of the next page from a previous response
+        language, difficulty, type, is_active: Filters
 
     Returns:
-        JSON: List of all quests
+        JSON: Summary fields and rank of the matching quests, best first,
+        next page cursor in the X-Next-Cursor header
     """
+
+    def build():
+        try:
+            quests, next_cursor = fetch_search_page(
+                db.session,
+                request.args,
+                default_limit=current_app.config["QUESTS_PAGE_SIZE"],
+                max_limit=current_app.config["QUESTS_MAX_PAGE_SIZE"],
+            )
+        except ListingError as e:
+            return jsonify({"error": str(e)}), 400
+        return page_response(quests, next_cursor)
+
     try:
-        result = db.session.execute(text("SELECT * FROM coding_quests"))
-        quests = [dict(row._mapping) for row in result.fetchall()]
-        return jsonify(quests), 200
+        return cached_catalog_response(build)
     except Exception as e:
         app.logger.error(traceback.format_exc())
         return jsonify({"error": "An internal error has occurred."}), 500
@@ -38,26 +123,30 @@ def get_quests():
 # Get all quests filtered by language
 @quests_bp.route('/quests/<language>', methods=['GET'])
 @token_required
+@read_only
 def get_quests_by_language(language):
-    """Get all quests filtered by language.
+    """Get a page of quests filtered by language.
+
+    Takes the same query parameters as get_quests.
 
     Args:
         language (str): Programming language
 
     Returns:
-        JSON: List of quests filtered by language
+        JSON: List of quests filtered by language, next page cursor in the X-Next-Cursor header
     """
 
     try:
-        result = db.session.execute(text("SELECT * FROM coding_quests WHERE language = :language"), {"language": language})
-        quests = [dict(row._mapping) for row in result.fetchall()]
-        return jsonify(quests)
+        if wants_ndjson():
+            return quest_listing_stream(language)
+        return cached_catalog_response(lambda: quest_listing_response(language))
     except Exception as e:
         return jsonify({"error": "An internal error has occurred."}), 500
 
 # Open a specific quest by its ID
 @quests_bp.route('/quest/<quest_id>', methods=['GET'])
 @token_required
+@read_only
 def open_quest(quest_id):
     """Get a specific quest by its ID.
 
@@ -68,8 +157,8 @@ def open_quest(quest_id):
         JSON: Quest details
     """
 
-    try:
-        result = db.session.execute(text("SELECT * FROM coding_quests WHERE id = :quest_id"), {'quest_id': quest_id})
+    def build():
+        result = db.session.execute(select(Quest.__table__).where(Quest.__table__.c.id == quest_id))
         quest = result.fetchone()
         if not quest:
             return jsonify({"error": "Quest not found"}), 404
@@ -87,29 +176,21 @@ def open_quest(quest_id):
             "xp": quest.xp,
             "type": quest.type
             })
+
+    try:
+        return cached_catalog_response(build)
     except Exception as e:
         return jsonify({"error": "An internal error has occurred."}), 500
 
 # Add a new quest (as Admin)
 @quests_bp.route('/quests', methods=['POST'])
 @token_required
+@admin_required
 def add_new_quest():
     """
     Add a new quest to the database after verifying admin privileges.
     """
     try:
-        token = request.headers.get('Authorization')
-        if not token:
-            return jsonify({"error": "Missing Authorization token"}), 401
-
-        admin_check = requests.get(
-            f"{ADMIN_SERVICE_URL}/admin/check",
-            headers={"Authorization": token}
-        )
-
-        if admin_check.status_code != 200 or admin_check.json().get("message") != "User is an admin":
-            return jsonify({"error": "Forbidden", "message": "Admin access required"}), 403
-
         data = request.get_json()
         if not data:
             return jsonify({"error": "No data provided"}), 400
@@ -118,13 +199,7 @@ def add_new_quest():
         if not user_id:
             return jsonify({"error": "Missing quest_author"}), 400
 
-        user_info = requests.get(
-            f"{AUTH_SERVICE_URL}/internal/users/usernames",
-            json={"user_ids": [user_id]},
-            headers={"INTERNAL-SECRET": INTERNAL_SECRET}
-        ).json()
-
-        quest_author_username = user_info.get(user_id)
+        quest_author_username = resolve_usernames([user_id], default=None)[user_id]
         if not quest_author_username:
             return jsonify({"error": "User lookup failed"}), 400
 
@@ -133,9 +208,11 @@ def add_new_quest():
         difficulty = data["difficulty"]
         xp = "30" if difficulty == "Easy" else "60" if difficulty == "Medium" else "100"
 
-        # Extract inputs and outputs (10 max)
-        inputs = {f"input_{i}": data.get(f"input_{i}", "") for i in range(10)}
-        outputs = {f"output_{i}": data.get(f"output_{i}", "") for i in range(10)}
+        # Extract the test cases ("tests" list or input_<i>/output_<i> fields)
+        try:
+            test_cases = parse_test_cases(data)
+        except TestCaseError as e:
+            return jsonify({"error": str(e)}), 400
         
         new_quest = Quest(
             language=data["language"],
@@ -149,12 +226,11 @@ def add_new_quest():
             type=data.get("type", "Basic"),
         )
 
-        # Assign each individual test case input/output
-        for i in range(10):
-            setattr(new_quest, f"input_{i}", inputs[f"input_{i}"])
-            setattr(new_quest, f"output_{i}", outputs[f"output_{i}"])
+        # Assign the test cases of the quest
+        new_quest.test_cases = test_cases
 
         db.session.add(new_quest)
+        bump_catalog_version()
         db.session.commit()
 
         return jsonify({
@@ -168,32 +244,77 @@ def add_new_quest():
         current_app.logger.exception(f"Failed to add quest: {e}")
         return jsonify({"error": GENERIC_ERROR_MESSAGE}), 500
 
+# Import quests in bulk (as Admin)
+@quests_bp.route('/quests/import', methods=['POST'])
+@token_required
+@admin_required
+def import_quests_bulk():
+    """Import quests from an NDJSON request body, one quest per line.
+
+    Each line takes the fields of add_new_quest. The body is read as a
+    stream and inserted in chunks of BULK_IMPORT_CHUNK_SIZE quests, one
+    transaction per chunk; invalid lines are skipped and reported.
+
+    Query parameters:
+        resolve_authors (str): "false" keeps quest_author as given instead of
+            resolving user IDs to usernames, e.g. for a file from /quests/export
+
+    Returns:
+        JSON: Imported and failed counts and the first errors with their line numbers
+    """
+    resolve_authors = request.args.get("resolve_authors", "true").lower() != "false"
+    try:
+        summary = import_quests(request.stream, resolve_authors=resolve_authors)
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.exception(f"Failed to import quests: {e}")
+        return jsonify({"error": GENERIC_ERROR_MESSAGE}), 500
+    return jsonify(summary), 200
+
+# Export all quests (as Admin)
+@quests_bp.route('/quests/export', methods=['GET'])
+@token_required
+@admin_required
+@read_only
+def export_quests_bulk():
+    """Export every quest with its test cases as NDJSON, one quest per line.
+
+    The output can be imported back with /quests/import?resolve_authors=false.
+
+    Returns:
+        Response: Streamed NDJSON
+    """
+    try:
+        lines, conn = export_lines()
+    except Exception as e:
+        current_app.logger.exception(f"Failed to export quests: {e}")
+        return jsonify({"error": GENERIC_ERROR_MESSAGE}), 500
+
+    def generate():
+        try:
+            yield from lines
+        except Exception as e:
+            # The status is already sent, the body ends early
+            current_app.logger.exception(f"Error while exporting quests: {e}")
+
+    response = Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
+    response.call_on_close(conn.close)
+    return response
+
 # Open a quest (as Admin)
 @quests_bp.route('/edit_quest/<quest_id>', methods=['GET'])
 @token_required
+@admin_required
 def open_edit_quest(quest_id):
     """Fetch a specific quest by its ID for editing."""
     try:
-        token = request.headers.get('Authorization')
-        if not token:
-            return jsonify({"error": "Missing Authorization token"}), 401
-
-        admin_check = requests.get(
-            f"{ADMIN_SERVICE_URL}/admin/check",
-            headers={"Authorization": token}
-        )
-
-        if admin_check.status_code != 200 or admin_check.json().get("message") != "User is an admin":
-            return jsonify({"error": "Forbidden", "message": "Admin access required"}), 403
-        
-        
         quest = Quest.query.filter_by(id=quest_id).first()
         if not quest:
             return jsonify({"error": "Quest not found"}), 404
 
         # Format test case input/output fields individually
-        input_fields = {f"input_{i}": getattr(quest, f"input_{i}", "") for i in range(10)}
-        output_fields = {f"output_{i}": getattr(quest, f"output_{i}", "") for i in range(10)}
+        test_cases = quest.test_cases
+        test_fields = legacy_test_fields(test_cases)
 
         response_data = {
             "quest_id": quest.id,
@@ -209,8 +330,8 @@ def open_edit_quest(quest_id):
             "example_solution": quest.example_solution,
             "xp": quest.xp,
             "type": quest.type,
-            **input_fields,
-            **output_fields
+            "tests": [test_case.to_dict() for test_case in test_cases],
+            **test_fields
         }
 
         return jsonify(response_data), 200
@@ -252,15 +373,18 @@ def edit_quest(quest_id):
         quest.type = data.get('type', quest.type)
         quest.last_modified = db.func.now()
 
-        # Update inputs and outputs (input_0 to input_9, output_0 to output_9)
-        for i in range(10):
-            input_key = f"input_{i}"
-            output_key = f"output_{i}"
-            if input_key in data:
-                setattr(quest, input_key, data[input_key])
-            if output_key in data:
-                setattr(quest, output_key, data[output_key])
+        # Update the test cases ("tests" list or input_<i>/output_<i> fields)
+        try:
+            tests_changed = update_test_cases(quest, data)
+        except TestCaseError as e:
+            db.session.rollback()
+            return jsonify({"error": str(e)}), 400
+
+        # Cached judge results of the old tests are no longer valid
+        if tests_changed:
+            judge_cache.invalidate_quest(quest_id)
 
+        bump_catalog_version()
         db.session.commit()
         return jsonify({"message": "Quest updated successfully"}), 200
     
@@ -1,8 +1,12 @@
-import requests, os
-from flask_jwt_extended import JWTManager, verify_jwt_in_request, get_jwt_identity
+import os
+import hashlib
+import time
+import http_client
+from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity, get_jwt
 from functools import wraps
 from flask import request, jsonify
-from dotenv import load_dotenv
+from cache_utils import BatchSingleFlight, LRUCache, SingleFlight
+from config import Config
 import logging
 import app
 
@@ -28,14 +32,151 @@ def token_required(f):
         return f(*args, **kwargs)
     return decorated
 
-def get_username_from_auth(user_id):
+# Admin status per JWT (identity, jti), see is_admin
+_admin_cache = LRUCache(Config.ADMIN_CACHE_SIZE)
+_admin_lookups = SingleFlight()
+
+
+def is_admin(token):
+    """Check with the admin service whether the current JWT belongs to an admin.
+
+    Results are cached per JWT identity and jti: positive answers for
+    ADMIN_CACHE_TTL and negative ones for ADMIN_CACHE_NEGATIVE_TTL seconds,
+    never beyond the expiry of the token. Concurrent lookups of the same
+    token share one admin service call. Must run after verify_jwt_in_request.
+
+    Args:
+        token (str): Value of the Authorization header
+
+    Returns:
+        bool: True if the admin service confirmed admin access
+    """
+    claims = get_jwt()
+    key = (get_jwt_identity(), claims.get("jti") or hashlib.sha256(token.encode()).hexdigest())
+
+    cached = _admin_cache.get(key)
+    if cached is not None:
+        return cached
+
+    def check():
+        response = http_client.get(
+            http_client.ADMIN,
+            f"{os.getenv('ADMIN_SERVICE_URL')}/admin/check",
+            headers={"Authorization": token}
+        )
+        result = response.status_code == 200 and response.json().get("message") == "User is an admin"
+
+        # Do not remember answers of a failing admin service
+        if response.status_code >= 500:
+            return result
+
+        ttl = Config.ADMIN_CACHE_TTL if result else Config.ADMIN_CACHE_NEGATIVE_TTL
+        if claims.get("exp"):
+            ttl = min(ttl, claims["exp"] - time.time())
+        if ttl > 0:
+            _admin_cache.set(key, result, ttl)
+        return result
+
+    return _admin_lookups.do(key, check)
+
+
+def admin_required(f):
+    """Decorator to check if the request comes from an admin.
+
+    Must be applied after token_required.
+
+    Args:
+        f (object): function to be decorated
+
+    Returns:
+        function object: function
+    """
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        token = request.headers.get('Authorization')
+        if not token:
+            return jsonify({"error": "Missing Authorization token"}), 401
+        try:
+            admin = is_admin(token)
+        except Exception as e:
+            app.logging.error(f"Admin check failed: {e}")
+            return jsonify({"error": "An internal error has occurred."}), 500
+        if not admin:
+            return jsonify({"error": "Forbidden", "message": "Admin access required"}), 403
+        return f(*args, **kwargs)
+    return decorated
+
+# Usernames by user ID, see resolve_usernames
+_username_cache = LRUCache(Config.USERNAME_CACHE_SIZE, ttl=Config.USERNAME_CACHE_TTL)
+_username_lookups = BatchSingleFlight()
+
+
+def _fetch_usernames(user_ids):
+    """Fetch usernames from the auth service in a single batched call.
+
+    Args:
+        user_ids (list): User IDs missing from the cache
+
+    Returns:
+        dict: Usernames of the users the auth service returned
+    """
     try:
-        response = requests.get(
-            f"{os.getenv("AUTH_SERVICE_URL")}/users/{user_id}",
-            headers={"Authorization": f"Bearer {os.getenv('INTERNAL_SECRET')}"}
+        response = http_client.post(
+            http_client.AUTH,
+            f"{os.getenv('AUTH_SERVICE_URL')}/internal/users/usernames",
+            json={"user_ids": user_ids},
+            headers={"INTERNAL-SECRET": os.getenv('INTERNAL_SECRET')},
+            idempotent=True,
+            timeout=(Config.HTTP_CONNECT_TIMEOUT, Config.USERNAME_LOOKUP_TIMEOUT)
         )
-        if response.status_code == 200:
-            return response.json().get("username", "Unknown")
+        if response.status_code != 200:
+            logging.error("Username lookup failed with status %s", response.status_code)
+            return {}
+        user_data = response.json()  # { user_id: username }
     except Exception as e:
-        return f"Error fetching username for user_id {user_id}: {e}"
-    return "Unknown"
\ No newline at end of file
+        logging.error("Username lookup failed: %s", e)
+        return {}
+
+    for user_id in user_ids:
+        username = user_data.get(user_id)
+        if username:
+            _username_cache.set(user_id, username)
+        else:
+            # Remember unknown users for a shorter time
+            _username_cache.set(user_id, None, Config.USERNAME_CACHE_NEGATIVE_TTL)
+    return {user_id: user_data.get(user_id) for user_id in user_ids}
+
+
+def resolve_usernames(user_ids, default="Unknown"):
+    """Resolve user IDs to usernames.
+
+    Cached usernames are served from an in-process LRU cache; only the
+    misses are fetched from the auth service, in one batched call, and
+    concurrent requests for the same IDs share that call. If the auth
+    service is slow or failing, unresolved users get ``default``.
+
+    Args:
+        user_ids (iterable): User IDs to resolve
+        default: Value for users that could not be resolved
+
+    Returns:
+        dict: Username (or ``default``) by user ID
+    """
+    usernames = {}
+    missing = []
+    for user_id in dict.fromkeys(user_ids):
+        username = _username_cache.get(user_id, default=_username_cache)
+        if username is _username_cache:
+            missing.append(user_id)
+        else:
+            usernames[user_id] = username or default
+
+    if missing:
+        fetched = _username_lookups.do(missing, _fetch_usernames, timeout=Config.USERNAME_LOOKUP_TIMEOUT)
+        for user_id in missing:
+            usernames[user_id] = fetched.get(user_id) or default
+    return usernames
+
+
+def get_username_from_auth(user_id):
+    return resolve_usernames([user_id])[user_id]
@@ -0,0 +1,162 @@
+import atexit
+import logging
+import threading
+from flask import current_app
+from sqlalchemy import event, func, update
+from sqlalchemy.orm import Session
+from extensions import db
+from models import Quest
+
+
+def increment_statement(quest_id, count=1):
+    """Atomic ``solved_times`` increment of a quest.
+
+    The addition happens in the database, so concurrent solves never lose an
+    update and the row lock is only held for the statement. ``last_modified``
+    is kept as is: solving a quest does not change its content, and the
+    judge cache keys depend on it.
+
+    Args:
+        quest_id (str): The ID of the quest
+        count (int): Number of solves to add
+
+    Returns:
+        Update: The UPDATE statement
+    """
+    return (
+        update(Quest.__table__)
+        .where(Quest.__table__.c.id == quest_id)
+        .values(
+            solved_times=func.coalesce(Quest.__table__.c.solved_times, 0) + count,
+            last_modified=Quest.__table__.c.last_modified,
+        )
+    )
+
+
+class SolvedTimesAggregator:
+    """Write-behind buffer of ``solved_times`` increments.
+
+    Increments are summed per quest in memory and written every
+    ``flush_interval`` seconds, one UPDATE per quest in a single transaction,
+    so a popular quest costs one row write per interval instead of one per
+    solve. Increments of a failed flush are put back and retried.
+
+    Durability: buffered increments are at most ``flush_interval`` seconds
+    old. They are flushed when the process exits normally, but are lost if
+    it is killed or crashes. The submissions themselves are not affected,
+    so ``solved_times`` can always be recounted from ``quest_solutions``.
+
+    Args:
+        app (Flask): The application whose database holds the quests
+        flush_interval (float): Seconds between two flushes
+    """
+
+    def __init__(self, app, flush_interval):
+        self.app = app
+        self.flush_interval = flush_interval
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="solved-times-flusher", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def add(self, quest_id, count=1):
+        """Buffer ``count`` solves of a quest."""
+        with self._lock:
+            self._pending[quest_id] = self._pending.get(quest_id, 0) + count
+
+    def pending(self):
+        """Number of buffered solves, all quests together."""
+        with self._lock:
+            return sum(self._pending.values())
+
+    def flush(self):
+        """Write the buffered increments to the database.
+
+        A flush already running in another thread is waited for, so every
+        solve buffered before the call is written (or put back on failure)
+        when it returns.
+
+        Returns:
+            int: Number of quests updated
+        """
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return 0
+
+            try:
+                with self.app.app_context(), db.engine.begin() as conn:
+                    # A fixed order keeps concurrent flushes of several processes from deadlocking
+                    for quest_id in sorted(pending):
+                        conn.execute(increment_statement(quest_id, pending[quest_id]))
+            except Exception as e:
+                logging.error("Error flushing solved_times increments: %s", e, exc_info=True)
+                for quest_id, count in pending.items():
+                    self.add(quest_id, count)
+                return 0
+            return len(pending)
+
+    def close(self):
+        """Stop the flusher thread and write what is left."""
+        self._stop.set()
+        self._thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+
+_aggregator = None
+_aggregator_lock = threading.Lock()
+
+
+def get_aggregator():
+    """The write-behind aggregator of this process, started on first use."""
+    global _aggregator
+    if _aggregator is None:
+        with _aggregator_lock:
+            if _aggregator is None:
+                _aggregator = SolvedTimesAggregator(
+                    current_app._get_current_object(),
+                    current_app.config["SOLVED_TIMES_FLUSH_INTERVAL"],
+                )
+    return _aggregator
+
+
+# Session.info key of the solves buffered once the transaction commits
+PENDING_SOLVES_KEY = "pending_solves"
+
+
+def record_solve(quest_id):
+    """Count a correct submission of a quest, in the current session's transaction.
+
+    With ``SOLVED_TIMES_FLUSH_INTERVAL`` set, the solve is handed to the
+    write-behind aggregator when the transaction commits, and dropped if it
+    rolls back. Otherwise ``solved_times`` is incremented in the database
+    right away, as part of the transaction.
+
+    Args:
+        quest_id (str): The ID of the solved quest
+    """
+    if current_app.config["SOLVED_TIMES_FLUSH_INTERVAL"] > 0:
+        db.session.info.setdefault(PENDING_SOLVES_KEY, []).append(quest_id)
+    else:
+        db.session.execute(increment_statement(quest_id))
+
+
+@event.listens_for(Session, "after_commit")
+def _buffer_committed_solves(session):
+    for quest_id in session.info.pop(PENDING_SOLVES_KEY, []):
+        get_aggregator().add(quest_id)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _drop_rolled_back_solves(session, previous_transaction):
+    # Savepoint rollbacks keep the solves of the enclosing transaction
+    if previous_transaction.parent is None:
+        session.info.pop(PENDING_SOLVES_KEY, None)
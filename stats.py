@@ -0,0 +1,240 @@
+import logging
+import random
+from datetime import datetime
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import BigInteger, case, cast, delete, func, insert, literal, select, text, update
+from extensions import db
+from db_utils import insert_ignore
+from models import LanguageStats, LanguageUserStats, QuestSolution, QuestStats, QuestUserStats
+
+# Counter columns of QuestStats and LanguageStats
+COUNTERS = ("attempts", "accepted", "tests_passed", "tests_failed", "attempters", "solvers")
+
+
+def is_counted(solution):
+    """Whether a stored solution counts towards the stats."""
+    return solution.mode != 'sample'
+
+
+def _mark_user(model, key, accepted, **extra):
+    """Record an attempt of a user in a per-user stats row.
+
+    Args:
+        model: QuestUserStats or LanguageUserStats
+        key (dict): Primary key of the row
+        accepted (bool): Whether the attempt was accepted
+        **extra: Column increments of an existing row
+
+    Returns:
+        tuple: (new attempter, new solver)
+    """
+    columns = model.__table__.c
+    if insert_ignore(model, {**key, "solved": accepted, **{name: 1 for name in extra}}, list(key)):
+        return True, accepted
+
+    where = [columns[name] == value for name, value in key.items()]
+    increments = {name: columns[name] + value for name, value in extra.items()}
+    if accepted:
+        # Only the first accepted attempt flips the flag, the row lock
+        # serializes concurrent attempts of the same user
+        if db.session.execute(
+            update(model).where(*where, columns.solved.is_(False)).values(solved=True, **increments)
+        ).rowcount:
+            return False, True
+    if increments:
+        db.session.execute(update(model).where(*where).values(**increments))
+    return False, False
+
+
+def _add_counters(model, key, deltas, now):
+    """Add ``deltas`` to a stats row, creating it if needed."""
+    columns = model.__table__.c
+    statement = (
+        update(model)
+        .where(*[columns[name] == value for name, value in key.items()])
+        .values(updated_at=now, **{name: columns[name] + delta for name, delta in deltas.items()})
+    )
+    if db.session.execute(statement).rowcount:
+        return
+    insert_ignore(model, {**key, **{name: 0 for name in COUNTERS}, "updated_at": now}, list(key))
+    db.session.execute(statement)
+
+
+def record_solution(solution):
+    """Add a stored solution to the stats, in the current session's transaction.
+
+    The counters of its quest and of its language are updated with the
+    solution, so reading them is a primary key lookup instead of an
+    aggregation over ``quest_solutions``. The per-user rows tell whether
+    the attempt comes from a new attempter or solver. Sample runs are not
+    counted, they never solve a quest.
+
+    The counters go to a random shard row of the quest and of the language
+    (STATS_COUNTER_SHARDS), so concurrent submissions of a popular quest or
+    language seldom wait for each other; ``get_stats`` sums the shards.
+
+    Call it after adding the solution to the session. The rows are always
+    locked in the same order, so concurrent submissions cannot deadlock.
+    The updates run in a savepoint: if they fail, the error is logged and
+    the solution is still committed (``flask rebuild-stats`` repairs it).
+
+    Args:
+        solution (QuestSolution): The new solution
+    """
+    if not current_app.config["STATS_ENABLED"] or not is_counted(solution):
+        return
+    accepted = bool(solution.is_solved)
+    now = datetime.now()
+    shard = random.randrange(current_app.config["STATS_COUNTER_SHARDS"])
+    try:
+        with db.session.begin_nested():
+            new_attempter, new_solver = _mark_user(
+                QuestUserStats, {"quest_id": solution.quest_id, "user_id": solution.user_id}, accepted, attempts=1
+            )
+            new_language_attempter, new_language_solver = _mark_user(
+                LanguageUserStats, {"language": solution.language, "user_id": solution.user_id}, accepted
+            )
+            deltas = {
+                "attempts": 1,
+                "accepted": int(accepted),
+                "tests_passed": solution.tests_passed or 0,
+                "tests_failed": solution.tests_failed or 0,
+            }
+            _add_counters(QuestStats, {"quest_id": solution.quest_id, "shard": shard},
+                          {**deltas, "attempters": int(new_attempter), "solvers": int(new_solver)}, now)
+            _add_counters(LanguageStats, {"language": solution.language, "shard": shard},
+                          {**deltas, "attempters": int(new_language_attempter),
+                           "solvers": int(new_language_solver)}, now)
+    except Exception as e:
+        logging.error("Failed to update the stats of solution %s: %s", solution.id, e, exc_info=True)
+
+
+def _counter_columns():
+    """Aggregates of ``quest_solutions`` in the order of ``COUNTERS``."""
+    solutions = QuestSolution.__table__.c
+    return [
+        func.count(),
+        func.coalesce(func.sum(case((solutions.is_solved, 1), else_=0)), 0),
+        func.coalesce(func.sum(solutions.tests_passed), 0),
+        func.coalesce(func.sum(solutions.tests_failed), 0),
+        func.count(solutions.user_id.distinct()),
+        func.count(case((solutions.is_solved, solutions.user_id)).distinct()),
+    ]
+
+
+def rebuild_stats():
+    """Recompute every stats row from ``quest_solutions``, in one transaction.
+
+    Repairs the drift left by failed updates or by solutions written
+    outside the judge.
+
+    The counters are written to shard 0.
+
+    On Postgres the stats tables are locked first: submissions committed
+    before are included, and the stats updates of the ones running
+    meanwhile wait for the rebuild and are then added on top of it.
+
+    Returns:
+        dict: Number of quest and language stats rows
+    """
+    solutions = QuestSolution.__table__.c
+    counted = solutions.mode != 'sample'
+    solved = func.max(case((solutions.is_solved, 1), else_=0)) > 0
+    now = literal(datetime.now())
+    tables = [QuestUserStats, LanguageUserStats, QuestStats, LanguageStats]
+    try:
+        if db.session.get_bind().dialect.name == 'postgresql':
+            names = ", ".join(model.__tablename__ for model in tables)
+            db.session.execute(text(f"LOCK TABLE {names} IN EXCLUSIVE MODE"))
+        for model in tables:
+            db.session.execute(delete(model))
+
+        db.session.execute(insert(QuestUserStats).from_select(
+            ["quest_id", "user_id", "attempts", "solved"],
+            select(solutions.quest_id, solutions.user_id, func.count(), solved)
+            .where(counted).group_by(solutions.quest_id, solutions.user_id),
+        ))
+        db.session.execute(insert(LanguageUserStats).from_select(
+            ["language", "user_id", "solved"],
+            select(solutions.language, solutions.user_id, solved)
+            .where(counted).group_by(solutions.language, solutions.user_id),
+        ))
+        quests = db.session.execute(insert(QuestStats).from_select(
+            ["quest_id", *COUNTERS, "updated_at"],
+            select(solutions.quest_id, *_counter_columns(), now)
+            .where(counted).group_by(solutions.quest_id),
+        )).rowcount
+        languages = db.session.execute(insert(LanguageStats).from_select(
+            ["language", *COUNTERS, "updated_at"],
+            select(solutions.language, *_counter_columns(), now)
+            .where(counted).group_by(solutions.language),
+        )).rowcount
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return {"quests": quests, "languages": languages}
+
+
+def _summed_counters(model):
+    """Counters of ``model`` summed over the shards, and the last update."""
+    columns = model.__table__.c
+    return [
+        *[func.coalesce(cast(func.sum(columns[name]), BigInteger), 0).label(name) for name in COUNTERS],
+        func.max(columns.updated_at).label("updated_at"),
+    ]
+
+
+def get_stats(model, **key):
+    """Counters of a quest or a language.
+
+    Args:
+        model: QuestStats or LanguageStats
+        **key: quest_id or language
+
+    Returns:
+        Row: Counters summed over the shards, None if nothing was counted yet
+    """
+    columns = model.__table__.c
+    row = db.session.execute(
+        select(*_summed_counters(model)).where(*[columns[name] == value for name, value in key.items()])
+    ).first()
+    return row if row.updated_at is not None else None
+
+
+def list_language_stats():
+    """Counters of every language with submissions, by language name."""
+    language = LanguageStats.__table__.c.language
+    return db.session.execute(
+        select(language, *_summed_counters(LanguageStats)).group_by(language).order_by(language)
+    ).all()
+
+
+def stats_to_dict(row):
+    """Stats of a quest or a language, with the derived rates.
+
+    Args:
+        row (Row): Counters from ``get_stats``, None if nothing was counted yet
+
+    Returns:
+        dict: Counters, acceptance rate and average tests per attempt
+    """
+    counters = {name: getattr(row, name) if row is not None else 0 for name in COUNTERS}
+    attempts = counters["attempts"]
+    return {
+        **counters,
+        "acceptance_rate": counters["accepted"] / attempts if attempts else 0.0,
+        "avg_tests_passed": counters["tests_passed"] / attempts if attempts else 0.0,
+        "avg_tests_failed": counters["tests_failed"] / attempts if attempts else 0.0,
+        "updated_at": row.updated_at.isoformat() if row is not None else None,
+    }
+
+
+@click.command('rebuild-stats')
+@with_appcontext
+def rebuild_stats_command():
+    """Recompute the quest and language stats from the stored solutions."""
+    counts = rebuild_stats()
+    click.echo(f"Rebuilt the stats of {counts['quests']} quests and {counts['languages']} languages")
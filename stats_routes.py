@@ -0,0 +1,72 @@
+import logging
+from flask import Blueprint, jsonify
+from sqlalchemy import select
+from extensions import db
+from services import token_required
+from models import LanguageStats, Quest, QuestStats
+from stats import get_stats, list_language_stats, stats_to_dict
+from db_routing import read_only
+
+stats_bp = Blueprint('stats', __name__)
+
+
+# Get the stats of a quest
+@stats_bp.route('/stats/quests/<quest_id>', methods=['GET'])
+@token_required
+@read_only
+def get_quest_stats(quest_id):
+    """Get the submission stats of a quest.
+
+    Args:
+        quest_id (str): Quest ID
+
+    Returns:
+        JSON: Attempts, accepted attempts, acceptance rate, average tests
+        passed and failed per attempt, distinct attempters and solvers
+    """
+    try:
+        row = get_stats(QuestStats, quest_id=quest_id)
+        if row is None and db.session.execute(select(Quest.id).where(Quest.id == quest_id)).first() is None:
+            return jsonify({"error": "Quest not found"}), 404
+        return jsonify({"quest_id": quest_id, **stats_to_dict(row)}), 200
+    except Exception as e:
+        logging.error("Error occurred while retrieving quest stats: %s", e, exc_info=True)
+        return jsonify({"error": "An internal error has occurred."}), 500
+
+# Get the stats of every language
+@stats_bp.route('/stats/languages', methods=['GET'])
+@token_required
+@read_only
+def get_all_language_stats():
+    """Get the submission stats of every language with submissions.
+
+    Returns:
+        JSON: List of language stats, see get_language_stats
+    """
+    try:
+        rows = list_language_stats()
+        return jsonify([{"language": row.language, **stats_to_dict(row)} for row in rows]), 200
+    except Exception as e:
+        logging.error("Error occurred while retrieving language stats: %s", e, exc_info=True)
+        return jsonify({"error": "An internal error has occurred."}), 500
+
+# Get the stats of a language
+@stats_bp.route('/stats/languages/<language>', methods=['GET'])
+@token_required
+@read_only
+def get_language_stats(language):
+    """Get the submission stats of a language.
+
+    Args:
+        language (str): Language of the submissions
+
+    Returns:
+        JSON: Attempts, accepted attempts, acceptance rate, average tests
+        passed and failed per attempt, distinct attempters and solvers
+    """
+    try:
+        row = get_stats(LanguageStats, language=language)
+        return jsonify({"language": language, **stats_to_dict(row)}), 200
+    except Exception as e:
+        logging.error("Error occurred while retrieving language stats: %s", e, exc_info=True)
+        return jsonify({"error": "An internal error has occurred."}), 500
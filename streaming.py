@@ -0,0 +1,88 @@
+import logging
+from flask import Response, current_app, request, stream_with_context
+from extensions import db
+from db_routing import read_engine
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+
+def wants_ndjson():
+    """Whether the client asked for NDJSON, with format=ndjson or the Accept header."""
+    return request.args.get("format") == "ndjson" or request.accept_mimetypes.best == NDJSON_MIMETYPE
+
+
+def open_stream(statement, params=None, chunk_size=500):
+    """Run a query whose rows are read through a server-side cursor.
+
+    The query runs on its own connection, so it outlives the request handler
+    while the response is streamed. In ``read_only`` views the connection is
+    taken from a read replica. The caller closes the connection.
+
+    Args:
+        statement: SQLAlchemy statement or ``text()`` query
+        params (dict): Bound parameters
+        chunk_size (int): Rows buffered per round trip
+
+    Returns:
+        tuple: (connection, result)
+    """
+    conn = read_engine(db).connect()
+    try:
+        result = conn.execution_options(stream_results=True, max_row_buffer=chunk_size).execute(statement, params or {})
+    except Exception:
+        conn.close()
+        raise
+    return conn, result
+
+
+def stream_rows(statement, params=None, serialize=None, ndjson=None, chunk_size=None):
+    """Stream the rows of a query as a JSON array or as NDJSON.
+
+    The body is written chunk by chunk while rows are read, so peak memory
+    does not depend on the size of the result and the first bytes are sent
+    as soon as the first chunk is read. The query runs before the response
+    starts, so its errors still become a 500. An error while streaming can
+    no longer change the status code: it is logged and the body ends early,
+    which clients see as truncated JSON.
+
+    Args:
+        statement: SQLAlchemy statement or ``text()`` query
+        params (dict): Bound parameters
+        serialize (callable): Turns a row into a JSON-serializable object,
+            its column mapping by default
+        ndjson (bool): One object per line instead of a JSON array,
+            ``wants_ndjson()`` by default
+        chunk_size (int): Rows per chunk, STREAM_CHUNK_SIZE by default
+
+    Returns:
+        Response: The streaming response
+    """
+    serialize = serialize or (lambda row: dict(row._mapping))
+    ndjson = wants_ndjson() if ndjson is None else ndjson
+    chunk_size = chunk_size or current_app.config["STREAM_CHUNK_SIZE"]
+    dumps = current_app.json.dumps
+
+    # The query runs before the response starts, so its errors still become a 500
+    conn, result = open_stream(statement, params, chunk_size)
+
+    def generate():
+        first = True
+        if not ndjson:
+            yield "["
+        try:
+            for chunk in result.partitions(chunk_size):
+                items = [dumps(serialize(row)) for row in chunk]
+                if ndjson:
+                    yield "".join(item + "\n" for item in items)
+                else:
+                    yield ("" if first else ",") + ",".join(items)
+                first = False
+        except Exception as e:
+            logging.error("Error while streaming %s: %s", request.path, e, exc_info=True)
+            return
+        if not ndjson:
+            yield "]\n"
+
+    response = Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE if ndjson else "application/json")
+    response.call_on_close(conn.close)
+    return response
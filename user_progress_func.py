@@ -1,30 +1,32 @@
 import os
-import requests
-from flask import jsonify
+import http_client
 
 
 
-def update_xp(user_id, quest_xp):
-    try:
-        response = requests.put(
-            f"{os.getenv("USERS_SERVICE_URL")}/users/{user_id}/xp",
-            headers={"INTERNAL-SECRET": os.getenv("INTERNAL_SECRET")},
-            json={"xp_points": quest_xp}
-        )
+def update_xp(user_id, xp_points, idempotency_key):
+    """Add XP to a user in the users service.
 
-        if response.status_code == 200:
-            return response.json()
-        else:
-            return jsonify({
-                "error": "Failed to update XP",
-                "status_code": response.status_code,
-                "message": response.text
-            }), response.status_code   
-    except Exception as e:
-        logger.exception("Error communicating with users service")
-        return jsonify({
-            "error": "Internal server error",
-            "message": "An internal error has occurred."
-        }), 500
+    Called by the XP dispatcher, never from a request. The idempotency key
+    lets the users service ignore a retried delivery it already applied.
 
+    Args:
+        user_id (str): UUID of the user
+        xp_points (int): XP to add
+        idempotency_key (str): Same key for every attempt of one delivery
 
+    Returns:
+        Response: Response of the users service
+
+    Raises:
+        requests.exceptions.RequestException: If the users service is unreachable
+    """
+    return http_client.put(
+        http_client.USERS,
+        f"{os.getenv('USERS_SERVICE_URL')}/users/{user_id}/xp",
+        headers={
+            "INTERNAL-SECRET": os.getenv("INTERNAL_SECRET"),
+            "Idempotency-Key": idempotency_key,
+        },
+        json={"xp_points": xp_points},
+        idempotent=True,
+    )
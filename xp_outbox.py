@@ -0,0 +1,224 @@
+import logging
+import threading
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import or_, select, update
+from extensions import db
+from db_utils import insert_ignore
+from models import XpGrant
+from user_progress_func import update_xp
+
+# Wakes up in-process dispatchers as soon as a grant is committed
+_wakeup = threading.Event()
+
+# Client errors worth retrying, any other 4xx fails the grant for good
+RETRY_STATUSES = (408, 429)
+
+
+def add_xp_grant(user_id, quest_id, xp):
+    """Write an XP grant to the outbox, in the current session's transaction.
+
+    A user earns the XP of a quest once, a second grant for the same quest
+    is ignored. Call ``notify_dispatcher`` after the commit.
+
+    Args:
+        user_id (str): UUID of the user
+        quest_id (str): The ID of the solved quest
+        xp (int): XP earned
+    """
+    values = dict(id=str(uuid.uuid4()), user_id=user_id, quest_id=quest_id, xp=int(xp),
+                  status=XpGrant.PENDING, attempts=0, next_attempt_at=datetime.now(),
+                  date_added=datetime.now())
+    insert_ignore(XpGrant, values, ['user_id', 'quest_id'])
+
+
+def notify_dispatcher():
+    """Wake up the in-process dispatcher after grants were committed."""
+    _wakeup.set()
+
+
+def assign_batches(limit):
+    """Group the new pending grants into one delivery per user.
+
+    Each delivery gets a batch key, sent as the idempotency key. It is stored
+    on the grants, so retries send the same total with the same key.
+
+    Args:
+        limit (int): Max number of grants to group
+
+    Returns:
+        int: Number of grants grouped
+    """
+    rows = db.session.execute(
+        select(XpGrant.id, XpGrant.user_id)
+        .where(XpGrant.status == XpGrant.PENDING, XpGrant.batch_key.is_(None))
+        .order_by(XpGrant.date_added)
+        .limit(limit)
+    ).all()
+
+    by_user = defaultdict(list)
+    for grant_id, user_id in rows:
+        by_user[user_id].append(grant_id)
+
+    assigned = 0
+    for grant_ids in by_user.values():
+        assigned += db.session.execute(
+            update(XpGrant)
+            .where(XpGrant.id.in_(grant_ids), XpGrant.batch_key.is_(None))
+            .values(batch_key=str(uuid.uuid4()))
+        ).rowcount
+    db.session.commit()
+    return assigned
+
+
+def claim_batch():
+    """Claim a due delivery.
+
+    The claim is a conditional UPDATE of a lease, so several dispatchers
+    (threads or processes) never deliver a batch at the same time. A
+    dispatcher that dies releases its batches when the lease expires.
+
+    Returns:
+        str: Batch key of the claimed delivery, or None if nothing is due
+    """
+    now = datetime.now()
+    available = or_(XpGrant.locked_until.is_(None), XpGrant.locked_until < now)
+    candidates = db.session.execute(
+        select(XpGrant.batch_key)
+        .where(XpGrant.status == XpGrant.PENDING, XpGrant.batch_key.is_not(None),
+               XpGrant.next_attempt_at <= now, available)
+        .group_by(XpGrant.batch_key)
+        .limit(10)
+    ).scalars().all()
+
+    lease = timedelta(seconds=current_app.config["XP_DELIVERY_LEASE"])
+    for batch_key in candidates:
+        claimed = db.session.execute(
+            update(XpGrant)
+            .where(XpGrant.batch_key == batch_key, XpGrant.status == XpGrant.PENDING, available)
+            .values(locked_until=now + lease)
+        ).rowcount
+        db.session.commit()
+        if claimed:
+            return batch_key
+    return None
+
+
+def deliver_batch(batch_key):
+    """Send the total XP of a claimed batch to the users service.
+
+    On success the grants are marked as delivered. Transient failures are
+    retried with exponential backoff, other client errors fail the grants.
+
+    Args:
+        batch_key (str): Batch key from ``claim_batch``
+
+    Returns:
+        bool: True if the batch was delivered
+    """
+    grants = db.session.query(XpGrant).filter_by(batch_key=batch_key, status=XpGrant.PENDING).all()
+    if not grants:
+        return False
+
+    user_id = grants[0].user_id
+    error = None
+    try:
+        response = update_xp(user_id, sum(grant.xp for grant in grants), batch_key)
+        if response.ok:
+            status = XpGrant.DELIVERED
+        else:
+            error = f"HTTP {response.status_code}: {response.text[:500]}"
+            retry = response.status_code >= 500 or response.status_code in RETRY_STATUSES
+            status = XpGrant.PENDING if retry else XpGrant.FAILED
+    except Exception as e:
+        error = str(e)
+        status = XpGrant.PENDING
+
+    attempts = grants[0].attempts + 1
+    backoff = min(
+        current_app.config["XP_RETRY_BACKOFF"] * 2 ** (attempts - 1),
+        current_app.config["XP_RETRY_MAX_BACKOFF"],
+    )
+    for grant in grants:
+        grant.status = status
+        grant.attempts = attempts
+        grant.last_error = error
+        grant.locked_until = None
+        if status == XpGrant.DELIVERED:
+            grant.date_delivered = datetime.now()
+        else:
+            grant.next_attempt_at = datetime.now() + timedelta(seconds=backoff)
+    db.session.commit()
+
+    if status == XpGrant.FAILED:
+        logging.error("XP delivery %s to user %s failed for good: %s", batch_key, user_id, error)
+    elif error:
+        logging.warning("XP delivery %s to user %s failed (attempt %d): %s", batch_key, user_id, attempts, error)
+    return status == XpGrant.DELIVERED
+
+
+def dispatch_pending():
+    """Deliver every due XP grant.
+
+    Returns:
+        int: Number of deliveries made
+    """
+    assign_batches(current_app.config["XP_DISPATCH_BATCH_SIZE"])
+    delivered = 0
+    while True:
+        batch_key = claim_batch()
+        if batch_key is None:
+            return delivered
+        delivered += deliver_batch(batch_key)
+
+
+def run_dispatcher(app, stop_event=None):
+    """Deliver XP grants until ``stop_event`` is set.
+
+    Args:
+        app (Flask): The application whose database holds the outbox
+        stop_event (threading.Event): Stops the loop when set
+    """
+    stop_event = stop_event or threading.Event()
+    interval = app.config["XP_DISPATCH_INTERVAL"]
+
+    while not stop_event.is_set():
+        with app.app_context():
+            try:
+                dispatch_pending()
+            except Exception as e:
+                db.session.rollback()
+                logging.error("XP dispatcher error: %s", e, exc_info=True)
+            finally:
+                db.session.remove()
+
+        _wakeup.wait(interval)
+        _wakeup.clear()
+
+
+def start_dispatcher(app, stop_event=None):
+    """Start the XP dispatcher as a daemon thread of this process.
+
+    Args:
+        app (Flask): The application whose database holds the outbox
+        stop_event (threading.Event): Stops the dispatcher when set
+
+    Returns:
+        Thread: The started thread
+    """
+    thread = threading.Thread(target=run_dispatcher, args=(app, stop_event), name="xp-dispatcher", daemon=True)
+    thread.start()
+    return thread
+
+
+@click.command('xp-dispatcher')
+@with_appcontext
+def xp_dispatcher_command():
+    """Run a dispatcher that delivers the XP outbox to the users service."""
+    app = current_app._get_current_object()
+    app.logger.info("Starting the XP dispatcher")
+    start_dispatcher(app).join()